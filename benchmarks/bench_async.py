@@ -0,0 +1,242 @@
+"""
+Một worker chịu được bao nhiêu request đồng thời khi upstream chậm: ASGI vs WSGI.
+
+Dựng một Audius giả trả lời sau --delay giây, một DB SQLite tạm có người dùng
+đã đăng nhập, rồi bắn GET /track/<id>/ (mỗi request một id khác nhau để không
+trúng cache) với --concurrency client đồng thời trong --seconds giây vào:
+
+    wsgi       1 process, 1 thread (như gunicorn worker sync mặc định)
+    wsgi-8     1 process, 8 thread (gunicorn gthread --threads 8)
+    asgi       1 worker uvicorn (gunicorn -c gunicorn.conf.py, SERVER_MODE=asgi)
+
+    python benchmarks/bench_async.py --delay 0.2 --concurrency 1 10 50 100 --seconds 5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = ("wsgi", "wsgi-8", "asgi")
+PLAYED = "Nâng cấp Premium".encode()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# =========================
+# Audius giả
+# =========================
+class SlowUpstream(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        body = json.dumps({"data": [{"title": "Bench track", "user": {"name": "Bench"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_upstream(port, delay):
+    server = ThreadingHTTPServer(("127.0.0.1", port), SlowUpstream)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.delay = delay
+    server.serve_forever()
+
+
+# =========================
+# Server WSGI (process con)
+# =========================
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class SingleThreadServer(WSGIServer):
+    request_queue_size = 1024
+
+
+class PooledServer(ThreadingMixIn, SingleThreadServer):
+    """
+    Tối đa số thread của pool request cùng lúc như gunicorn gthread; còn lại xếp hàng.
+    """
+    pool = None
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+
+def serve_wsgi(port, threads):
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "music_website.settings")
+    from django.core.wsgi import get_wsgi_application
+
+    server_class = SingleThreadServer
+    if threads > 1:
+        server_class = PooledServer
+        PooledServer.pool = ThreadPoolExecutor(threads)
+    server = make_server("127.0.0.1", port, get_wsgi_application(),
+                         server_class=server_class, handler_class=QuietHandler)
+    server.serve_forever()
+
+
+# =========================
+# Tải
+# =========================
+async def load(url, cookie, concurrency, seconds, ids):
+    timings, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=120, headers={"Cookie": cookie}) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(f"{url}/track/{next(ids)}/")
+                    # người dùng free -> trang quảng cáo; lỗi upstream -> error.html
+                    ok = response.status_code == 200 and PLAYED in response.content
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    timings.append((time.perf_counter() - started) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return timings, errors, elapsed
+
+
+def wait_ready(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server thoát sớm (mã {process.returncode})")
+        try:
+            httpx.get(f"{url}/login/", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("server không lên")
+
+
+def start_server(name, env):
+    port = free_port()
+    if name == "asgi":
+        cmd = [sys.executable, "-m", "uvicorn", "music_website.asgi:application",
+               "--port", str(port), "--workers", "1", "--no-access-log", "--log-level", "warning"]
+    else:
+        threads = "8" if name == "wsgi-8" else "1"
+        cmd = [sys.executable, __file__, "--serve-wsgi", str(port), "--threads", threads]
+    # settings chọn CONN_MAX_AGE theo SERVER_MODE
+    process = subprocess.Popen(cmd, cwd=ROOT, env={**env, "SERVER_MODE": "asgi" if name == "asgi" else "wsgi"})
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(url, process)
+    except Exception:
+        process.kill()
+        raise
+    return process, url
+
+
+def prepare():
+    """
+    Tạo DB tạm, người dùng và cookie phiên đăng nhập (server con dùng chung DB).
+    """
+    sys.path.insert(0, ROOT)
+    os.environ["DJANGO_SETTINGS_MODULE"] = "music_website.settings"
+    import django
+
+    django.setup()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+
+    call_command("migrate", verbosity=0)
+    client = Client()
+    client.force_login(User.objects.create_user(username="bench", password="bench-pass-123"))
+    return "; ".join(f"{c.key}={c.value}" for c in client.cookies.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=SERVERS, default=list(SERVERS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50, 100])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--delay", type=float, default=0.2, help="độ trễ của Audius giả (giây)")
+    parser.add_argument("--serve-wsgi", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--serve-upstream", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--threads", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_wsgi:
+        serve_wsgi(args.serve_wsgi, args.threads)
+        return
+    if args.serve_upstream:
+        serve_upstream(args.serve_upstream, args.delay)
+        return
+
+    # Audius giả chạy process riêng để không tranh GIL với bộ tạo tải
+    upstream_port = free_port()
+    upstream = subprocess.Popen([sys.executable, __file__, "--serve-upstream", str(upstream_port),
+                                 "--delay", str(args.delay)])
+
+    tmp = tempfile.mkdtemp(prefix="bench-async-")
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "music_website.settings",
+        "DB_ENGINE": "sqlite",
+        "SQLITE_PATH": os.path.join(tmp, "db.sqlite3"),
+        "RECOMMEND_TABLE_PATH": os.path.join(tmp, "recommend.npz"),
+        "AUDIUS_API_URL": f"http://127.0.0.1:{upstream_port}/v1",
+    }
+    env.pop("REDIS_URL", None)
+    os.environ.update(env)
+    cookie = prepare()
+    ids = itertools.count(1)
+
+    print(f"Audius giả trễ {args.delay * 1000:.0f} ms, {args.seconds:.0f}s mỗi mức, 1 worker")
+    print(f"{'server':<8}{'đồng thời':>10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'lỗi':>6}")
+    for name in args.servers:
+        process, url = start_server(name, env)
+        try:
+            for concurrency in args.concurrency:
+                timings, errors, elapsed = asyncio.run(load(url, cookie, concurrency, args.seconds, ids))
+                print(f"{name:<8}{concurrency:>10}{len(timings) / elapsed:>9.1f}"
+                      f"{percentile(timings, 50):>9.0f}{percentile(timings, 95):>9.0f}{errors:>6}")
+        finally:
+            process.terminate()
+            process.wait()
+    upstream.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark độ trễ tra cứu Audius (musicapp.audius.AudiusClient) với server giả lập.
+
+Server giả trả lời sau --delay ms; đo p50/p99 của lần phát đầu (đi upstream)
+và các lần phát lại (trúng cache).
+
+    python benchmarks/bench_audius.py --tracks 50 --repeats 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(USE_TZ=True)
+django.setup()
+
+from musicapp.audius import AudiusClient  # noqa: E402
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        body = json.dumps({"data": [{"title": "x", "user": {"name": "y"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    p = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))] * 1000  # noqa: E731
+    return f"p50 {p(0.5):8.3f} ms  p99 {p(0.99):8.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tracks", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=2000)
+    parser.add_argument("--delay", type=float, default=80, help="độ trễ upstream (ms)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    server.delay = args.delay / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.AUDIUS_API_URL = f"http://127.0.0.1:{server.server_port}/v1"
+
+    client = AudiusClient()
+    first = []
+    for track_id in range(args.tracks):
+        t0 = time.perf_counter()
+        client.get_track(track_id)
+        first.append(time.perf_counter() - t0)
+
+    rnd = random.Random(3)
+    repeat = []
+    for _ in range(args.repeats):
+        t0 = time.perf_counter()
+        client.get_track(rnd.randrange(args.tracks))
+        repeat.append(time.perf_counter() - t0)
+
+    print(f"lần đầu  ({len(first):>5}) | {percentiles(first)}")
+    print(f"phát lại ({len(repeat):>5}) | {percentiles(repeat)}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
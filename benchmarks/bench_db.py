@@ -0,0 +1,184 @@
+"""
+Benchmark cùng một tải view trên từng backend DB (settings.DB_ENGINE).
+
+Mỗi backend chạy trong một process riêng (settings đọc DB_ENGINE lúc khởi
+động): tạo DB test, sinh --songs bài hát / --users người dùng có yêu thích và
+playlist, rồi gọi mỗi view --requests lần qua test client (cache tắt để mọi
+request đều chạm DB) và in p50 / p95 / p99 (ms).
+
+    sqlite          SQLite file, PRAGMA của settings.SQLITE_PRAGMAS, giữ kết nối
+    sqlite-untuned  SQLite file, không PRAGMA, mở kết nối mới mỗi request
+    postgres        PostgreSQL theo POSTGRES_* (cần psycopg2 và quyền tạo DB test)
+
+    python benchmarks/bench_db.py --backends sqlite sqlite-untuned postgres --songs 5000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINES = {"sqlite": "sqlite", "sqlite-untuned": "sqlite", "postgres": "postgres"}
+GENRES = ["Pop", "Ballad", "Rock", "Rap", "Lofi", "EDM", "Jazz", "Indie"]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+# =========================
+# Process con: một backend
+# =========================
+def setup_django(backend):
+    sys.path.insert(0, ROOT)
+    os.environ["DJANGO_SETTINGS_MODULE"] = "music_website.settings"
+    import django
+    from django.conf import settings
+
+    settings.DEBUG = False
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+    settings.RECOMMEND_TABLE_PATH = os.path.join(tempfile.mkdtemp(prefix="bench-db-"), "recommend.npz")
+    db = settings.DATABASES["default"]
+    if db["ENGINE"].endswith("sqlite3"):
+        db["TEST"] = {"NAME": os.path.join(tempfile.mkdtemp(prefix="bench-db-"), "db.sqlite3")}
+    if backend == "sqlite-untuned":
+        settings.SQLITE_PRAGMAS = {}
+        db["CONN_MAX_AGE"] = 0
+    django.setup()
+
+
+def seed(songs, users):
+    from django.contrib.auth.models import User
+    from django.contrib.auth.hashers import make_password
+
+    from musicapp import facets, search
+    from musicapp.models import Artist, Favorite, Playlist, PlaylistItem, Song
+
+    rng = random.Random(0)
+    artists = Artist.objects.bulk_create([Artist(name=f"Nghệ sĩ {i}") for i in range(max(1, songs // 20))])
+    Song.objects.bulk_create([
+        Song(title=f"Bài hát {i}", artist=artists[i % len(artists)], genre=GENRES[i % len(GENRES)],
+             search_key=f"bai hat {i} nghe si {i % len(artists)}")
+        for i in range(songs)
+    ], batch_size=1000)
+    song_ids = list(Song.objects.values_list("id", flat=True))
+    password = make_password("bench-pass-123")
+    people = User.objects.bulk_create([User(username=f"user{i}", password=password) for i in range(users)])
+    people = list(User.objects.order_by("id"))
+    Favorite.objects.bulk_create([
+        Favorite(user=user, song_id=song_id)
+        for user in people for song_id in rng.sample(song_ids, 30)
+    ], batch_size=1000)
+    playlists = Playlist.objects.bulk_create([
+        Playlist(user=user, name=f"Playlist {n}") for user in people for n in range(3)
+    ])
+    playlists = list(Playlist.objects.order_by("id"))
+    PlaylistItem.objects.bulk_create([
+        PlaylistItem(playlist=playlist, song_id=song_id, position=pos)
+        for playlist in playlists for pos, song_id in enumerate(rng.sample(song_ids, 20))
+    ], batch_size=1000)
+    facets.recount()  # bulk_create không qua signal
+    search.reindex()
+    return song_ids, people, playlists
+
+
+def workload(song_ids, people, playlists):
+    from django.test import Client
+
+    from musicapp.models import Song
+
+    rng = random.Random(1)
+    anonymous = Client()
+    member = Client()
+    member.force_login(people[0])
+    own = [p for p in playlists if p.user_id == people[0].id]
+
+    def orm_get():
+        Song.objects.select_related("artist").get(pk=rng.choice(song_ids))
+
+    return [
+        ("Song.objects.get", orm_get),
+        ("home", lambda: anonymous.get("/")),
+        ("home ?genre", lambda: anonymous.get("/", {"genre": rng.choice(GENRES).lower()})),
+        ("home ?q", lambda: anonymous.get("/", {"q": f"bai hat {rng.randrange(len(song_ids))}"})),
+        ("home ?sort=popular", lambda: anonymous.get("/", {"sort": "popular"})),
+        ("home (đăng nhập)", lambda: member.get("/")),
+        ("favorite_list", lambda: member.get("/favorite/")),
+        ("playlist_list", lambda: member.get("/playlist/")),
+        ("playlist_songs", lambda: member.get(f"/playlist/{rng.choice(own).id}/songs/")),
+        ("chat_ai", lambda: member.get("/chat-ai/", {"mood": "tôi đang buồn"})),
+    ]
+
+
+def run_child(backend, songs, users, requests):
+    setup_django(backend)
+    from django.db import connection
+
+    try:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    except Exception as exc:  # không kết nối được / thiếu driver
+        print(json.dumps({"error": f"{type(exc).__name__}: {exc}"}))
+        return
+    try:
+        started = time.perf_counter()
+        data = seed(songs, users)
+        results = {"seed_seconds": time.perf_counter() - started, "views": {}}
+        for name, call in workload(*data):
+            call()  # làm nóng
+            timings = []
+            for _ in range(requests):
+                t = time.perf_counter()
+                response = call()
+                timings.append((time.perf_counter() - t) * 1000)
+                if response is not None and response.status_code != 200:
+                    raise RuntimeError(f"{name}: HTTP {response.status_code}")
+            results["views"][name] = [percentile(timings, p) for p in (50, 95, 99)]
+        print(json.dumps(results))
+    finally:
+        connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+
+# =========================
+# Process cha
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=sorted(ENGINES), default=["sqlite", "sqlite-untuned"])
+    parser.add_argument("--songs", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--child", choices=sorted(ENGINES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.songs, args.users, args.requests)
+        return
+
+    print(f"{args.songs} bài hát, {args.users} người dùng, {args.requests} request mỗi view (ms)")
+    for backend in args.backends:
+        # test client chạy như WSGI: giữ kết nối theo settings.DB_CONN_MAX_AGE của WSGI
+        env = {**os.environ, "DB_ENGINE": ENGINES[backend], "SERVER_MODE": "wsgi"}
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--songs", str(args.songs),
+             "--users", str(args.users), "--requests", str(args.requests)],
+            env=env, capture_output=True, text=True,
+        )
+        lines = out.stdout.strip().splitlines()
+        result = json.loads(lines[-1]) if out.returncode == 0 and lines else {"error": out.stderr.strip()[-300:]}
+        print(f"\n== {backend}")
+        if "error" in result:
+            print(f"   bỏ qua: {result['error']}")
+            continue
+        print(f"   sinh dữ liệu: {result['seed_seconds']:.1f}s")
+        print(f"   {'view':<22}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for name, (p50, p95, p99) in result["views"].items():
+            print(f"   {name:<22}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Xuất / nhập playlist và yêu thích (musicapp.library) với thư viện lớn.
+
+Dựng DB SQLite tạm có --songs bài hát, một người dùng có playlist và danh sách
+yêu thích chứa --tracks bài, rồi đo qua test client (đủ middleware):
+
+    xuất     GET export M3U8 / JSONL, đọc hết streaming_content: dòng/giây, MB/giây
+             và bộ nhớ đỉnh (tracemalloc, lần chạy riêng) so với cách nạp hết
+             rows rồi dựng cả file trong bộ nhớ (HttpResponse thường)
+    nhập     POST file JSONL vừa xuất vào playlist mới: dòng/giây, số query
+
+    python benchmarks/bench_export.py --songs 60000 --tracks 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GENRES = ["Pop", "Ballad", "Rock", "Rap", "Lofi", "EDM", "Jazz", "Indie"]
+
+
+def setup_django():
+    sys.path.insert(0, ROOT)
+    tmp = tempfile.mkdtemp(prefix="bench-export-")
+    os.environ.update({
+        "DJANGO_SETTINGS_MODULE": "music_website.settings",
+        "DB_ENGINE": "sqlite",
+        "SQLITE_PATH": os.path.join(tmp, "db.sqlite3"),
+        "RECOMMEND_TABLE_PATH": os.path.join(tmp, "recommend.npz"),
+        "PERF_ENABLED": "0",
+    })
+    os.environ.pop("REDIS_URL", None)
+    import django
+    from django.conf import settings
+
+    settings.DEBUG = False
+    django.setup()
+
+
+def seed(songs, tracks):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+
+    from musicapp.models import Artist, Favorite, Playlist, PlaylistItem, Song
+    from musicapp.text import song_search_key
+
+    call_command("migrate", verbosity=0)
+    artists = Artist.objects.bulk_create([Artist(name=f"Nghệ sĩ {i}") for i in range(max(1, songs // 20))])
+    Song.objects.bulk_create([
+        Song(title=f"Bài hát {i}", artist=artists[i % len(artists)], genre=GENRES[i % len(GENRES)],
+             duration=3 + i % 3, search_key=song_search_key(f"Bài hát {i}", artists[i % len(artists)].name))
+        for i in range(songs)
+    ], batch_size=2000)
+    user = User.objects.create_user(username="bench", password="bench-pass-123")
+    playlist = Playlist.objects.create(user=user, name="Thư viện lớn")
+    ids = list(Song.objects.order_by("id").values_list("id", flat=True)[:tracks])
+    PlaylistItem.objects.bulk_create([PlaylistItem(playlist=playlist, song_id=pk, position=i)
+                                      for i, pk in enumerate(ids)], batch_size=2000)
+    Favorite.objects.bulk_create([Favorite(user=user, song_id=pk) for pk in ids], batch_size=2000)
+    return user, playlist
+
+
+# =========================
+# Đo
+# =========================
+def consume(response):
+    size = 0
+    for chunk in response.streaming_content:
+        size += len(chunk)
+    return size
+
+
+def buffered(rows, fmt):
+    """
+    Cách không stream: nạp hết rows rồi dựng cả file trong bộ nhớ.
+    """
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+
+    from musicapp import library
+
+    header, render = library._renderer(RequestFactory().get("/"), fmt)
+    body = (header + "".join(render(row) for row in list(rows))).encode()
+    return len(HttpResponse(body).content)
+
+
+def peak(run):
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=60000)
+    parser.add_argument("--tracks", type=int, default=50000, help="số bài trong playlist / yêu thích")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    from musicapp import library
+
+    started = time.perf_counter()
+    user, playlist = seed(args.songs, args.tracks)
+    print(f"{args.songs} bài hát, {args.tracks} bài mỗi danh sách (dựng dữ liệu {time.perf_counter() - started:.1f}s)")
+    client = Client()
+    client.force_login(user)
+
+    targets = {
+        "playlist": (lambda fmt: reverse("export_playlist", args=[playlist.id, fmt]),
+                     lambda: library.playlist_rows(playlist)),
+        "yêu thích": (lambda fmt: reverse("export_favorites", args=[fmt]), lambda: library.favorite_rows(user)),
+    }
+    print(f"{'xuất':<20}{'giây':>8}{'dòng/giây':>12}{'MB/giây':>10}{'MB':>8}{'đỉnh stream':>14}{'đỉnh nạp hết':>14}")
+    exported = None
+    for name, (url, rows) in targets.items():
+        for fmt in library.FORMATS:
+            times = []
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                size = consume(client.get(url(fmt)))
+                times.append(time.perf_counter() - t)
+            elapsed = min(times)
+            streamed = peak(lambda: consume(client.get(url(fmt))))
+            whole = peak(lambda: buffered(rows(), fmt))
+            print(f"{name + ' ' + fmt:<20}{elapsed:>8.2f}{args.tracks / elapsed:>12.0f}"
+                  f"{size / elapsed / 2**20:>10.1f}{size / 2**20:>8.1f}"
+                  f"{streamed / 2**20:>12.1f}MB{whole / 2**20:>12.1f}MB")
+            if name == "playlist" and fmt == "jsonl":
+                exported = b"".join(client.get(url(fmt)).streaming_content)
+
+    with CaptureQueriesContext(connection) as queries:
+        t = time.perf_counter()
+        data = client.post(f"{reverse('import_playlist')}?name=nhap", data=exported,
+                           content_type="application/x-ndjson").json()
+        elapsed = time.perf_counter() - t
+    print(f"nhập JSONL: {data['matched']} khớp, {data['added']} đã thêm, {data['missing']} không khớp "
+          f"trong {elapsed:.2f}s ({args.tracks / elapsed:.0f} dòng/giây, {len(queries)} query)")
+
+
+if __name__ == "__main__":
+    main()
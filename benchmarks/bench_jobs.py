@@ -0,0 +1,109 @@
+"""
+Benchmark hàng đợi job trong DB (musicapp.jobs).
+
+Đo độ trễ enqueue (mỗi job một transaction, có / không idempotency key) và
+thông lượng (job/giây) khi --workers process cùng lấy job từ một DB SQLite
+(chế độ WAL) với task rỗng, nhận từng job hoặc theo lô (--batch).
+
+    python benchmarks/bench_jobs.py --enqueue 2000 --jobs 5000 --workers 1 2 4 --batch 1 20
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench-jobs-"), "jobs.sqlite3")
+settings.configure(
+    USE_TZ=True,
+    INSTALLED_APPS=["django.contrib.auth", "django.contrib.contenttypes", "musicapp"],
+    DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": DB_PATH,
+                           "OPTIONS": {"timeout": 30}}},
+    DEFAULT_AUTO_FIELD="django.db.models.BigAutoField",
+)
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+
+from musicapp import jobs  # noqa: E402
+from musicapp.models import Job  # noqa: E402
+
+
+@jobs.task(max_attempts=1)
+def noop(n):
+    return n
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def bench_enqueue(count, with_key):
+    timings = []
+    for i in range(count):
+        started = time.perf_counter()
+        jobs.enqueue(noop, key=f"bench:{i}" if with_key else None, n=i)
+        timings.append((time.perf_counter() - started) * 1000)
+    Job.objects.all().delete()
+    return timings
+
+
+def _worker(index, batch):
+    connections.close_all()
+    jobs.work(f"bench/{index}", burst=True, batch=batch)
+
+
+def bench_throughput(count, workers, batch):
+    Job.objects.bulk_create([Job(task=noop.task_name, kwargs={"n": i}, max_attempts=1)
+                             for i in range(count)], batch_size=1000)
+    connections.close_all()
+    ctx = multiprocessing.get_context("fork")
+    started = time.perf_counter()
+    processes = [ctx.Process(target=_worker, args=(i, batch)) for i in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    done = Job.objects.filter(status=Job.DONE).count()
+    Job.objects.all().delete()
+    return done, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--enqueue", type=int, default=2000, help="Số job khi đo độ trễ enqueue")
+    parser.add_argument("--jobs", type=int, default=5000, help="Số job khi đo thông lượng")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 20],
+                        help="Số job mỗi worker nhận một lần")
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode=WAL")
+
+    print(f"DB: SQLite {DB_PATH}")
+    for with_key in (False, True):
+        timings = bench_enqueue(args.enqueue, with_key)
+        label = "có idempotency key" if with_key else "không key"
+        print(f"enqueue ({label}): p50 {percentile(timings, 50):.3f} ms  "
+              f"p99 {percentile(timings, 99):.3f} ms  ({args.enqueue} job)")
+
+    for batch in args.batch:
+        for workers in args.workers:
+            done, elapsed = bench_throughput(args.jobs, workers, batch)
+            print(f"{workers} worker, batch {batch}: {done}/{args.jobs} job trong {elapsed:.2f}s "
+                  f"-> {done / elapsed:,.0f} job/giây")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark trang chủ có / không có cache trang và fragment (musicapp.pagecache).
+
+Chạy server WSGI nhiều luồng trong process trên DB SQLite tạm có --songs bài
+hát, rồi --clients luồng gửi liên tục GET / (kiểu ab -c) trong --seconds giây:
+khách chưa đăng nhập, người đã đăng nhập và trình duyệt gửi If-None-Match.
+"Không cache" thay cached_page / fragment bằng render trực tiếp như trước.
+
+    python benchmarks/bench_pagecache.py --songs 5000 --clients 8 --seconds 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "music_website.settings")
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3",
+                                  "NAME": os.path.join(tempfile.mkdtemp(prefix="bench-page-"), "db.sqlite3")}}
+settings.DEBUG = False
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from musicapp import facets, pagecache  # noqa: E402
+from musicapp.models import Artist, Favorite, Song  # noqa: E402
+
+GENRES = ["Pop", "Ballad", "Rock", "Rap", "Lofi", "EDM", "Jazz", "Indie"]
+
+
+class ThreadingServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def seed(songs):
+    artists = Artist.objects.bulk_create([Artist(name=f"Nghệ sĩ {i}") for i in range(max(1, songs // 20))])
+    Song.objects.bulk_create([
+        Song(title=f"Bài hát {i}", artist=artists[i % len(artists)], genre=GENRES[i % len(GENRES)],
+             search_key=f"bai hat {i} nghe si {i % len(artists)}")
+        for i in range(songs)
+    ], batch_size=1000)
+    user = User.objects.create_user(username="bench", password="bench-pass-123")
+    Favorite.objects.bulk_create([Favorite(user=user, song_id=i) for i in range(1, 40, 3)])
+    facets.recount()  # bulk_create không qua signal
+    return user
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def load(url, clients, seconds, headers):
+    timings, errors = [], []
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        while time.perf_counter() < deadline:
+            request = urllib.request.Request(url, headers=headers)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+            except urllib.error.HTTPError as exc:
+                if exc.code != 304:
+                    errors.append(exc.code)
+                    continue
+            timings.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    user = seed(args.songs)
+    client = Client()
+    client.force_login(user)
+    client.get("/")  # lấy cookie CSRF
+    cookie = "; ".join(f"{c.key}={c.value}" for c in client.cookies.values())
+
+    server = make_server("127.0.0.1", 0, get_wsgi_application(),
+                         server_class=ThreadingServer, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+
+    cached_page, fragment = pagecache.cached_page, pagecache.fragment
+    uncached = (lambda request, render, *a, **k: render(), lambda name, parts, build, *a, **k: build())
+
+    print(f"{args.songs} bài hát, {args.clients} client, {args.seconds:.0f}s mỗi kịch bản")
+    print(f"{'kịch bản':<34}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'lỗi':>6}")
+    for mode, (page_fn, fragment_fn) in (("không cache", uncached), ("cache", (cached_page, fragment))):
+        pagecache.cached_page, pagecache.fragment = page_fn, fragment_fn
+        cache.clear()
+        etag = urllib.request.urlopen(url).headers.get("ETag")
+        scenarios = [("khách", {}), ("đã đăng nhập", {"Cookie": cookie})]
+        if etag:
+            scenarios.append(("khách, If-None-Match", {"If-None-Match": etag}))
+        for name, headers in scenarios:
+            timings, errors = load(url, args.clients, args.seconds, headers)
+            print(f"{mode + ' / ' + name:<34}{len(timings) / args.seconds:>9.0f}"
+                  f"{percentile(timings, 50):>9.2f}{percentile(timings, 95):>9.2f}{len(errors):>6}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
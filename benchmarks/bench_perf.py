@@ -0,0 +1,188 @@
+"""
+Chi phí của đo hiệu năng (musicapp.perf, PerfMiddleware) trên trang chủ.
+
+Dựng DB SQLite tạm có --songs bài hát rồi chạy hai server WSGI (process con,
+1 thread như worker gunicorn sync) trên cùng DB:
+
+    tắt   PERF_ENABLED=0: không PerfMiddleware, cache LocMemCache gốc, không execute_wrapper
+    bật   PERF_ENABLED=1 (mặc định của settings)
+
+Client gửi GET / xen kẽ từng request sang hai server (đổi thứ tự mỗi lượt để
+hai bên chịu cùng nhiễu của máy), cho khách chưa đăng nhập (trúng cache trang)
+và người đã đăng nhập. Mỗi lần thử khởi động lại cặp server; chi phí là trung vị
+tỉ lệ thời gian trung bình (bật / tắt - 1) qua --trials lần thử. Thoát mã 1 nếu
+vượt --max-overhead %.
+
+    python benchmarks/bench_perf.py --songs 5000 --trials 5 --requests 1000
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GENRES = ["Pop", "Ballad", "Rock", "Rap", "Lofi", "EDM", "Jazz", "Indie"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# =========================
+# Server WSGI (process con)
+# =========================
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Server(WSGIServer):
+    request_queue_size = 128
+
+
+def serve(port):
+    sys.path.insert(0, ROOT)
+    from django.core.wsgi import get_wsgi_application
+
+    make_server("127.0.0.1", port, get_wsgi_application(),
+                server_class=Server, handler_class=QuietHandler).serve_forever()
+
+
+def start_server(enabled, env):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, __file__, "--serve", str(port)], cwd=ROOT,
+                               env={**env, "PERF_ENABLED": "1" if enabled else "0"})
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server thoát sớm (mã {process.returncode})")
+        try:
+            get(port, {})
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("server không lên")
+
+
+# =========================
+# Dữ liệu
+# =========================
+def prepare(songs):
+    """
+    Migrate + tạo dữ liệu trên DB tạm; trả về cookie phiên của người dùng đã đăng nhập.
+    """
+    sys.path.insert(0, ROOT)
+    import django
+
+    django.setup()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+
+    from musicapp import facets
+    from musicapp.models import Artist, Favorite, Song
+
+    call_command("migrate", verbosity=0)
+    artists = Artist.objects.bulk_create([Artist(name=f"Nghệ sĩ {i}") for i in range(max(1, songs // 20))])
+    Song.objects.bulk_create([
+        Song(title=f"Bài hát {i}", artist=artists[i % len(artists)], genre=GENRES[i % len(GENRES)],
+             search_key=f"bai hat {i} nghe si {i % len(artists)}")
+        for i in range(songs)
+    ], batch_size=1000)
+    user = User.objects.create_user(username="bench", password="bench-pass-123")
+    Favorite.objects.bulk_create([Favorite(user=user, song_id=i) for i in range(1, 40, 3)])
+    facets.recount()  # bulk_create không qua signal
+    client = Client()
+    client.force_login(user)
+    return "; ".join(f"{c.key}={c.value}" for c in client.cookies.values())
+
+
+# =========================
+# Đo
+# =========================
+def get(port, headers):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        connection.request("GET", "/", headers=headers)
+        response = connection.getresponse()
+        response.read()
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"GET / trả về {response.status}")
+
+
+def trial(env, headers, requests):
+    servers = {name: start_server(name == "bật", env) for name in ("tắt", "bật")}
+    timings = {name: [] for name in servers}
+    try:
+        for name, (_, port) in servers.items():
+            for _ in range(20):  # làm nóng cache trang, template, kết nối DB
+                get(port, headers)
+        order = list(servers.items())
+        for i in range(requests):
+            for name, (_, port) in (order if i % 2 == 0 else order[::-1]):
+                started = time.perf_counter()
+                get(port, headers)
+                timings[name].append(time.perf_counter() - started)
+    finally:
+        for process, _ in servers.values():
+            process.terminate()
+            process.wait()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=5000)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=1000, help="số request mỗi lần thử mỗi cấu hình")
+    parser.add_argument("--max-overhead", type=float, default=2.0, help="ngưỡng chi phí (%%)")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    tmp = tempfile.mkdtemp(prefix="bench-perf-")
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "music_website.settings",
+        "DB_ENGINE": "sqlite",
+        "SQLITE_PATH": os.path.join(tmp, "db.sqlite3"),
+        "RECOMMEND_TABLE_PATH": os.path.join(tmp, "recommend.npz"),
+    }
+    env.pop("REDIS_URL", None)
+    os.environ.update(env)
+    cookie = prepare(args.songs)
+
+    print(f"{args.songs} bài hát, {args.trials} lần thử x {args.requests} request mỗi cấu hình")
+    print(f"{'kịch bản':<16}{'tắt ms':>9}{'bật ms':>9}{'p50 tắt':>9}{'p50 bật':>9}{'chi phí':>10}")
+    worst = 0.0
+    for name, headers in (("khách", {}), ("đã đăng nhập", {"Cookie": cookie})):
+        results = [trial(env, headers, args.requests) for _ in range(args.trials)]
+        off = [t for r in results for t in r["tắt"]]
+        on = [t for r in results for t in r["bật"]]
+        overhead = statistics.median(statistics.fmean(r["bật"]) / statistics.fmean(r["tắt"]) - 1 for r in results)
+        worst = max(worst, overhead)
+        print(f"{name:<16}{statistics.fmean(off) * 1000:>9.3f}{statistics.fmean(on) * 1000:>9.3f}"
+              f"{statistics.median(off) * 1000:>9.3f}{statistics.median(on) * 1000:>9.3f}{overhead * 100:>9.2f}%")
+
+    if worst * 100 > args.max_overhead:
+        print(f"Chi phí {worst * 100:.2f}% vượt ngưỡng {args.max_overhead}%")
+        sys.exit(1)
+    print(f"Chi phí tối đa {worst * 100:.2f}% (ngưỡng {args.max_overhead}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark tính lại bảng gợi ý (musicapp.recommend.build_table) hằng đêm.
+
+Sinh --favorites lượt yêu thích giả: độ phổ biến bài hát theo phân phối
+Zipf, số bài mỗi người thích theo log-normal (vài người thích rất nhiều). Đo thời
+gian tính top-K cosine item-item, RAM đỉnh, kích thước file .npz và độ trễ
+tra cứu "vì bạn đã thích X" / gợi ý theo lịch sử.
+
+    python benchmarks/bench_recommend.py --favorites 1000000 --songs 200000 --users 100000
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from musicapp.recommend import TOP_K, NeighborTable, build_table  # noqa: E402
+
+
+def synthetic(favorites, songs, users, seed=1):
+    rng = np.random.default_rng(seed)
+    # số bài mỗi người thích: log-normal (đa số vài bài, số ít hàng nghìn)
+    activity = rng.lognormal(0, 1.2, users)
+    # độ phổ biến bài hát: Zipf (s=1) trên thứ hạng, xáo id để bài hot không dồn về đầu
+    popularity = 1 / np.arange(1, songs + 1)
+    count = int(favorites * 1.15)  # bù phần trùng bị loại
+    user_ids = rng.choice(users, count, p=activity / activity.sum()) + 1
+    song_ids = rng.permutation(songs)[rng.choice(songs, count, p=popularity / popularity.sum())] + 1
+    pairs = np.unique(np.stack([user_ids, song_ids], axis=1), axis=0)
+    pairs = pairs[rng.permutation(len(pairs))[:favorites]]
+    return pairs[:, 0], pairs[:, 1], np.ones(len(pairs), dtype=np.float32)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--favorites", type=int, default=1_000_000)
+    parser.add_argument("--songs", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--queries", type=int, default=10000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    user_ids, song_ids, weights = synthetic(args.favorites, args.songs, args.users)
+    print(f"Sinh {len(user_ids):,} lượt yêu thích ({len(np.unique(user_ids)):,} người, "
+          f"{len(np.unique(song_ids)):,} bài) trong {time.perf_counter() - started:.1f}s")
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    table = build_table(user_ids, song_ids, weights, k=args.top_k)
+    elapsed = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"Tính top-{args.top_k} cho {len(table):,} bài: {elapsed:.1f}s, "
+          f"RAM đỉnh +{(rss_after - rss_before) / 1024:.0f} MB")
+
+    path = os.path.join(tempfile.mkdtemp(), "recommend.npz")
+    table.save(path)
+    started = time.perf_counter()
+    table = NeighborTable.load(path)
+    print(f"File {os.path.getsize(path) / 1024 / 1024:.1f} MB, nạp lại {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    rng = np.random.default_rng(2)
+    probe = rng.choice(table.song_ids, args.queries)
+    timings = []
+    for song_id in probe:
+        t = time.perf_counter()
+        table.similar(int(song_id))
+        timings.append((time.perf_counter() - t) * 1e6)
+    print(f"Vì bạn đã thích X: p50 {percentile(timings, 50):.1f} µs  p99 {percentile(timings, 99):.1f} µs")
+
+    timings = []
+    for i in range(args.queries // 10):
+        history = rng.choice(table.song_ids, 50).tolist()
+        t = time.perf_counter()
+        table.for_history(history)
+        timings.append((time.perf_counter() - t) * 1e6)
+    print(f"Gợi ý từ 50 bài đã thích: p50 {percentile(timings, 50):.0f} µs  p99 {percentile(timings, 99):.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+File tĩnh trước / sau pipeline nén sẵn + tên có hash (musicapp.storage.StaticStorage).
+
+Mỗi phương án chạy trong process con riêng (STORAGES, MIDDLEWARE đọc lúc khởi động),
+collectstatic cây file tĩnh của dự án (admin + musicapp/static, như staticfiles/)
+vào thư mục tạm rồi tải lần lượt mọi file qua test client (đủ middleware) với
+"Accept-Encoding: br, gzip" và cookie đăng nhập, như trình duyệt khi mở trang:
+
+    trước   StaticFilesStorage (tên gốc, không nén), WhiteNoise cuối MIDDLEWARE
+            (session / auth / CSRF / messages chạy trước khi trả file)
+    sau     StaticStorage: tên có hash, bản .br / .gz nén lúc collectstatic,
+            WhiteNoise ngay sau SecurityMiddleware
+
+In thời gian collectstatic, p50 / p95 mỗi request, request/giây, tổng byte gửi
+đi và số file được cache vĩnh viễn (Cache-Control immutable, trình duyệt không
+hỏi lại server khi tải lại trang).
+
+    python benchmarks/bench_static.py --repeat 5
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VARIANTS = {
+    "trước": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    "sau": "musicapp.storage.StaticStorage",
+}
+WHITENOISE = "musicapp.middleware.AsyncWhiteNoiseMiddleware"
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+# =========================
+# Process con: một phương án
+# =========================
+def setup_django(variant, tmp):
+    sys.path.insert(0, ROOT)
+    os.environ.update({
+        "DJANGO_SETTINGS_MODULE": "music_website.settings",
+        "DB_ENGINE": "sqlite",
+        "SQLITE_PATH": os.path.join(tmp, "db.sqlite3"),
+        "RECOMMEND_TABLE_PATH": os.path.join(tmp, "recommend.npz"),
+        "STATICFILES_BACKEND": VARIANTS[variant],
+        "PERF_ENABLED": "0",
+    })
+    os.environ.pop("REDIS_URL", None)
+    import django
+    from django.conf import settings
+
+    settings.DEBUG = False
+    settings.STATIC_ROOT = os.path.join(tmp, "static")
+    if variant == "trước":
+        # thứ tự middleware cũ: WhiteNoise đứng cuối
+        settings.MIDDLEWARE = [name for name in settings.MIDDLEWARE if name != WHITENOISE] + [WHITENOISE]
+    django.setup()
+
+
+def run_variant(variant, repeat):
+    tmp = tempfile.mkdtemp(prefix="bench-static-")
+    setup_django(variant, tmp)
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.contrib.staticfiles import finders
+    from django.contrib.staticfiles.storage import staticfiles_storage
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+
+    call_command("migrate", verbosity=0)
+    started = time.perf_counter()
+    call_command("collectstatic", "--noinput", verbosity=0)
+    collect = time.perf_counter() - started
+    disk = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(settings.STATIC_ROOT) for f in files)
+
+    # URL như {% static %} sinh ra trong template
+    names = sorted({path for finder in finders.get_finders() for path, _ in finder.list(["CVS", ".*", "*~"])})
+    urls = [staticfiles_storage.url(name) for name in names]
+
+    client = Client(HTTP_ACCEPT_ENCODING="br, gzip")
+    client.force_login(User.objects.create_user(username="bench", password="bench-pass-123"))
+    count = [0]
+
+    def counter(execute, sql, params, many, context):
+        count[0] += 1
+        return execute(sql, params, many, context)
+
+    timings, sent, immutable, encoded = [], 0, 0, 0
+    for url in urls:  # làm nóng
+        client.get(url)
+    with connection.execute_wrapper(counter):
+        started = time.perf_counter()
+        for round_ in range(repeat):
+            for url in urls:
+                t = time.perf_counter()
+                response = client.get(url)
+                body = b"".join(response.streaming_content) if response.streaming else response.content
+                timings.append((time.perf_counter() - t) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url}: HTTP {response.status_code}")
+                if round_ == 0:
+                    sent += len(body)
+                    immutable += "immutable" in response.get("Cache-Control", "")
+                    encoded += response.has_header("Content-Encoding")
+        elapsed = time.perf_counter() - started
+        queries = count[0]
+    total = len(urls) * repeat
+    return {
+        "files": len(urls),
+        "collect_s": collect,
+        "disk_mb": disk / 2**20,
+        "p50": percentile(timings, 50),
+        "p95": percentile(timings, 95),
+        "rps": total / elapsed,
+        "queries": queries / total,
+        "sent_kb": sent / 1024,
+        "encoded": encoded,
+        "immutable": immutable,
+    }
+
+
+# =========================
+# Process cha
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="số lượt tải toàn bộ file")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.repeat)))
+        return
+
+    if importlib.util.find_spec("brotli") is None:
+        print("Chưa cài Brotli: chỉ có bản .gz")
+    results = {}
+    for variant in VARIANTS:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--variant", variant,
+                                 "--repeat", str(args.repeat)], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        results[variant] = json.loads(output.strip().splitlines()[-1])
+
+    files = results["sau"]["files"]
+    print(f"{files} file tĩnh, {args.repeat} lượt")
+    print(f"{'':<8}{'collect s':>10}{'đĩa MB':>8}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>8}"
+          f"{'query':>7}{'gửi KB':>9}{'nén':>6}{'immutable':>11}")
+    for variant, r in results.items():
+        print(f"{variant:<8}{r['collect_s']:>10.1f}{r['disk_mb']:>8.1f}{r['p50']:>9.3f}{r['p95']:>9.3f}"
+              f"{r['rps']:>8.0f}{r['queries']:>7.1f}{r['sent_kb']:>9.0f}{r['encoded']:>6}"
+              f"{r['immutable']:>7}/{r['files']}")
+    before, after = results["trước"], results["sau"]
+    print(f"Sau / trước: p50 x{before['p50'] / after['p50']:.1f} nhanh hơn, "
+          f"byte gửi đi {after['sent_kb'] / before['sent_kb'] * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
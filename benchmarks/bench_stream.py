@@ -0,0 +1,92 @@
+"""
+Benchmark stream audio có Range (musicapp.streaming.ranged_file_response).
+
+N client cùng tua đến vị trí ngẫu nhiên của một file MP3 4 MB, đọc 256 KB rồi
+dừng. Đo time-to-first-byte và RSS đỉnh, so với cách cũ đọc cả file vào bộ nhớ.
+
+    python benchmarks/bench_stream.py --clients 200
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(DEBUG=False, ALLOWED_HOSTS=["*"], USE_TZ=True)
+django.setup()
+
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from musicapp.streaming import ranged_file_response  # noqa: E402
+
+FILE_SIZE = 4 * 1024 * 1024
+READ_BYTES = 256 * 1024
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def stream_client(path, offset):
+    request = RequestFactory().get("/stream/1/", HTTP_RANGE=f"bytes={offset}-")
+    started = time.perf_counter()
+    response = ranged_file_response(request, open(path, "rb"), FILE_SIZE, '"bench"')
+    content = iter(response.streaming_content)
+    received = len(next(content))
+    ttfb = time.perf_counter() - started
+    for chunk in content:
+        received += len(chunk)
+        if received >= READ_BYTES:
+            break
+    response.close()
+    return ttfb
+
+
+def naive_client(path, offset):
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        data = f.read()
+    response = HttpResponse(data[offset:], content_type="audio/mpeg")
+    ttfb = time.perf_counter() - started
+    response.close()
+    return ttfb
+
+
+def run(name, client, path, clients):
+    rnd = random.Random(1)
+    offsets = [rnd.randrange(0, FILE_SIZE - READ_BYTES) for _ in range(clients)]
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        ttfbs = sorted(pool.map(lambda offset: client(path, offset), offsets))
+    elapsed = time.perf_counter() - started
+    p = lambda q: ttfbs[min(len(ttfbs) - 1, int(q * len(ttfbs)))] * 1000  # noqa: E731
+    print(f"{name:<12} | {clients} client trong {elapsed:5.2f}s | TTFB p50 {p(0.5):7.2f} ms "
+          f"p99 {p(0.99):7.2f} ms | RSS đỉnh +{peak_rss_mb() - rss_before:6.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "song.mp3")
+        with open(path, "wb") as f:
+            f.write(os.urandom(FILE_SIZE))
+        # chạy bản stream trước: RSS đỉnh chỉ tăng, bản đọc cả file chạy sau mới thấy chênh lệch
+        run("range", stream_client, path, args.clients)
+        run("đọc cả file", naive_client, path, args.clients)
+
+
+if __name__ == "__main__":
+    main()
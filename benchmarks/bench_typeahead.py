@@ -0,0 +1,97 @@
+"""
+Benchmark chỉ mục typeahead (musicapp.typeahead.PrefixIndex).
+
+Sinh tên bài hát giả, đo thời gian nạp, bộ nhớ (RSS tăng thêm khi nạp) và số
+truy vấn tiền tố mỗi giây.
+
+    python benchmarks/bench_typeahead.py --sizes 100000,1000000
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from musicapp.typeahead import PrefixIndex  # noqa: E402
+
+ONSETS = ("", "b", "c", "ch", "d", "g", "gi", "h", "k", "kh", "l", "m", "n", "ng",
+          "nh", "p", "ph", "qu", "r", "s", "t", "th", "tr", "v", "x")
+RHYMES = ("a", "ai", "an", "ang", "anh", "ao", "au", "ay", "e", "em", "en", "eo", "i",
+          "im", "in", "inh", "o", "oi", "on", "ong", "u", "ui", "un", "ung", "ua", "uong",
+          "ien", "ieu", "uoi", "uyen", "at", "ac", "ich")
+# tiếng Việt là ngôn ngữ đơn âm tiết: token của tên bài hát là âm tiết (đã bỏ dấu)
+SYLLABLES = sorted({onset + rhyme for onset in ONSETS for rhyme in RHYMES})
+# tần suất âm tiết theo phân bố Zipf
+CUM_WEIGHTS = list(accumulate(1 / (rank + 1) for rank in range(len(SYLLABLES))))
+
+
+def make_titles(count, seed=42):
+    rnd = random.Random(seed)
+    vocab = SYLLABLES[:]
+    rnd.shuffle(vocab)
+    for i in range(count):
+        words = rnd.choices(vocab, cum_weights=CUM_WEIGHTS, k=rnd.randint(2, 6))
+        yield i + 1, " ".join(words), rnd.paretovariate(1.2)
+
+
+def make_queries(titles, count, seed=7):
+    """
+    Mô phỏng người dùng đang gõ tên một bài hát có thật: vài âm tiết đầu,
+    âm tiết cuối mới gõ được một phần.
+    """
+    rnd = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rnd.choice(titles).split()[:rnd.randint(1, 3)]
+        words[-1] = words[-1][:rnd.randint(1, len(words[-1]))]
+        queries.append(" ".join(words))
+    return queries
+
+
+def peak_rss():
+    # ru_maxrss tính bằng KiB trên Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run(size, query_count, limit):
+    docs = list(make_titles(size))
+    queries = make_queries([text for _, text, _ in docs], query_count)
+
+    rss_before = peak_rss()
+    started = time.perf_counter()
+    index = PrefixIndex()
+    index.bulk_load(docs)
+    build = time.perf_counter() - started
+    memory = peak_rss() - rss_before
+
+    timings = []
+    for query in queries:
+        t0 = time.perf_counter()
+        index.search(query, limit)
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+    total = sum(timings)
+    p = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))] * 1000  # noqa: E731
+
+    print(f"{size:>9} bài | nạp {build:6.2f}s | bộ nhớ {memory / 2**20:7.1f} MiB | "
+          f"{len(index.tokens):>7} token | {len(timings) / total:9.0f} q/s | "
+          f"p50 {p(0.50):.3f} ms  p99 {p(0.99):.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="100000,1000000")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=8)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args.queries, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Tải mẫu trên dữ liệu giả lập: p50 / p95 / p99, số query mỗi request và
+throughput của từng view, so với baseline JSON để bắt hồi quy hiệu năng.
+
+Dựng DB SQLite (tạm, hoặc --db để dùng lại) bằng `manage.py generate_catalog`
+(yêu thích / playlist theo Zipf) và bảng gợi ý. Mỗi lần chạy làm việc trên một
+bản sao của DB đó (kịch bản có ghi) nên cùng --seed cho cùng chuỗi request và
+cùng số query. Từng kịch bản chạy --requests lần qua test client (đủ
+middleware, cache locmem như production):
+
+    home                 khách, trang chủ
+    home ?q              khách, tìm theo từ ngẫu nhiên
+    home ?genre          khách, lọc thể loại
+    home (đăng nhập)     người dùng ngẫu nhiên trong --members người
+    add_favorite         POST AJAX, bật / tắt yêu thích một bài (chọn theo Zipf)
+    playlist_list        trang playlist
+    create_and_add       POST AJAX create_and_add_playlist vào playlist có sẵn
+    chat_ai              gợi ý theo tâm trạng
+
+    python benchmarks/bench_workload.py --save benchmarks/baselines/workload.json
+    python benchmarks/bench_workload.py --baseline benchmarks/baselines/workload.json
+
+Với --baseline: thoát mã 1 nếu p50 / p95 của kịch bản nào chậm hơn baseline quá
+--tolerance (và quá --min-delta-ms, để bỏ qua dao động dưới mức mili giây) hoặc
+số query trung bình mỗi request tăng quá --query-slack. Thời gian phụ thuộc máy:
+baseline nên được lưu lại trên chính máy chạy so sánh; số query thì không.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOODS = ["tôi đang buồn", "hôm nay vui quá", "mệt mỏi", "thư giãn chút"]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def recommend_path(db_path):
+    return os.path.splitext(db_path)[0] + "-recommend.npz"
+
+
+def generate(db_path, args):
+    """
+    Sinh dữ liệu vào db_path (process con: settings đọc SQLITE_PATH lúc khởi động).
+    """
+    env = {**os.environ, "DB_ENGINE": "sqlite", "SQLITE_PATH": db_path,
+           "RECOMMEND_TABLE_PATH": recommend_path(db_path)}
+    env.pop("REDIS_URL", None)
+    manage = [sys.executable, os.path.join(ROOT, "manage.py")]
+    started = time.perf_counter()
+    for command in (["migrate", "-v0"],
+                    ["generate_catalog", "--songs", str(args.songs), "--users", str(args.users),
+                     "--seed", str(args.seed)],
+                    ["rebuild_recommendations"]):
+        subprocess.run(manage + command, env=env, cwd=ROOT, check=True)
+    print(f"Dựng dữ liệu trong {time.perf_counter() - started:.1f}s")
+
+
+def working_copy(source):
+    work = os.path.join(tempfile.mkdtemp(prefix="bench-workload-"), "db.sqlite3")
+    for suffix in ("", "-wal"):
+        if os.path.exists(source + suffix):
+            shutil.copyfile(source + suffix, work + suffix)
+    if os.path.exists(recommend_path(source)):
+        shutil.copyfile(recommend_path(source), recommend_path(work))
+    return work
+
+
+def setup_django(db_path):
+    sys.path.insert(0, ROOT)
+    os.environ.update({
+        "DJANGO_SETTINGS_MODULE": "music_website.settings",
+        "DB_ENGINE": "sqlite",
+        "SQLITE_PATH": db_path,
+        "RECOMMEND_TABLE_PATH": recommend_path(db_path),
+    })
+    os.environ.pop("REDIS_URL", None)
+    import django
+    from django.conf import settings
+
+    settings.DEBUG = False
+    django.setup()
+
+
+# =========================
+# Kịch bản
+# =========================
+def scenarios(args):
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    from musicapp.management.commands.generate_catalog import GENRES, WORDS, zipf_weights
+    from musicapp.models import Playlist, Song
+
+    rng = np.random.default_rng(args.seed)
+    song_ids = np.fromiter(Song.objects.order_by("id").values_list("id", flat=True), dtype=np.int64)
+    popular = rng.permutation(song_ids)
+    weights = zipf_weights(len(popular), 1.1)
+    people = list(User.objects.filter(username__startswith="synth").order_by("id")[:args.members])
+    if not people:
+        raise SystemExit("DB không có người dùng synth* (generate_catalog)")
+    members = []
+    for user in people:
+        client = Client()
+        client.force_login(user)
+        playlist = Playlist.objects.filter(user=user).values_list("id", flat=True).first()
+        if playlist is None:
+            playlist = Playlist.objects.create(user=user, name="Playlist 1").id
+        members.append((client, playlist))
+    anonymous = Client()
+
+    def member():
+        return members[rng.integers(len(members))]
+
+    def song():
+        return int(popular[rng.choice(len(popular), p=weights)])
+
+    def ajax(client, url, data):
+        return client.post(url, json.dumps(data), content_type="application/json",
+                           HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+
+    def create_and_add():
+        client, playlist = member()
+        return ajax(client, "/playlist/create-and-add/", {"song": song(), "playlist_id": playlist})
+
+    return {
+        "home": lambda: anonymous.get("/"),
+        "home ?q": lambda: anonymous.get("/", {"q": " ".join(rng.choice(WORDS, 2))}),
+        "home ?genre": lambda: anonymous.get("/", {"genre": rng.choice(GENRES).lower()}),
+        "home (đăng nhập)": lambda: member()[0].get("/"),
+        "add_favorite": lambda: ajax(member()[0], "/favorite/add/", {"song_id": song()}),
+        "playlist_list": lambda: member()[0].get("/playlist/"),
+        "create_and_add": create_and_add,
+        "chat_ai": lambda: member()[0].get("/chat-ai/", {"mood": rng.choice(MOODS)}),
+    }
+
+
+def measure(call, requests, warmup):
+    from django.db import connection
+
+    count = [0]
+
+    def counter(execute, sql, params, many, context):
+        count[0] += 1
+        return execute(sql, params, many, context)
+
+    for _ in range(warmup):
+        call()
+    timings, queries = [], []
+    with connection.execute_wrapper(counter):
+        started = time.perf_counter()
+        for _ in range(requests):
+            count[0] = 0
+            t = time.perf_counter()
+            response = call()
+            timings.append((time.perf_counter() - t) * 1000)
+            queries.append(count[0])
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+        elapsed = time.perf_counter() - started
+    stats = {
+        "p50": percentile(timings, 50),
+        "p95": percentile(timings, 95),
+        "p99": percentile(timings, 99),
+        "mean": sum(timings) / len(timings),
+        "queries": sum(queries) / len(queries),
+        "rps": requests / elapsed,
+    }
+    return {name: round(value, 3) for name, value in stats.items()}
+
+
+# =========================
+# Baseline
+# =========================
+def compare(result, baseline, args):
+    """
+    In chênh lệch so với baseline; trả về danh sách hồi quy.
+    """
+    regressions = []
+    if baseline["meta"]["songs"] != result["meta"]["songs"]:
+        print(f"Lưu ý: baseline có {baseline['meta']['songs']} bài hát, lần chạy này {result['meta']['songs']}")
+    print(f"\nSo với baseline ({baseline['meta']['created']}):")
+    print(f"{'kịch bản':<20}{'p50':>16}{'p95':>16}{'query':>14}")
+    for name, base in baseline["scenarios"].items():
+        current = result["scenarios"].get(name)
+        if current is None:
+            continue
+        cells = []
+        for metric in ("p50", "p95"):
+            change = current[metric] / base[metric] - 1 if base[metric] else 0
+            cells.append(f"{change * 100:+.0f}%")
+            if (current[metric] > base[metric] * (1 + args.tolerance)
+                    and current[metric] - base[metric] > args.min_delta_ms):
+                regressions.append(f"{name}: {metric} {base[metric]:.2f} -> {current[metric]:.2f} ms")
+        if current["queries"] > base["queries"] + args.query_slack:
+            regressions.append(f"{name}: query {base['queries']:.1f} -> {current['queries']:.1f}")
+        print(f"{name:<20}{cells[0]:>16}{cells[1]:>16}{current['queries'] - base['queries']:>+14.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="File SQLite dùng lại giữa các lần chạy, chưa có thì sinh mới "
+                                     "(mặc định: DB tạm mới)")
+    parser.add_argument("--songs", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=20, help="số người dùng đăng nhập luân phiên")
+    parser.add_argument("--requests", type=int, default=300, help="số request mỗi kịch bản")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="chỉ chạy các kịch bản này")
+    parser.add_argument("--save", help="ghi kết quả ra file JSON (làm baseline)")
+    parser.add_argument("--baseline", help="file JSON để so sánh")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="mức chậm hơn cho phép của p50 / p95 (0.3 = 30%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    parser.add_argument("--query-slack", type=float, default=0.0, help="số query / request tăng thêm cho phép")
+    args = parser.parse_args()
+
+    source = args.db or os.path.join(tempfile.mkdtemp(prefix="bench-workload-"), "source.sqlite3")
+    if not os.path.exists(source):
+        generate(source, args)
+    setup_django(working_copy(source))
+    import django
+    from django.contrib.auth.models import User
+
+    from musicapp.models import Song
+    result = {
+        "meta": {
+            "songs": Song.objects.count(),
+            "users": User.objects.count(),
+            "requests": args.requests,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "machine": f"{platform.machine()} x{os.cpu_count()}",
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "scenarios": {},
+    }
+    print(f"{result['meta']['songs']} bài hát, {result['meta']['users']} người dùng, "
+          f"{args.requests} request mỗi kịch bản")
+    print(f"{'kịch bản':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'query':>8}{'req/s':>9}")
+    total_requests, total_seconds = 0, 0.0
+    for name, call in scenarios(args).items():
+        if args.only and name not in args.only:
+            continue
+        stats = measure(call, args.requests, args.warmup)
+        result["scenarios"][name] = stats
+        total_requests += args.requests
+        total_seconds += args.requests / stats["rps"]
+        print(f"{name:<20}{stats['p50']:>9.2f}{stats['p95']:>9.2f}{stats['p99']:>9.2f}"
+              f"{stats['queries']:>8.1f}{stats['rps']:>9.0f}")
+    result["throughput"] = total_requests / total_seconds
+    print(f"Tổng: {result['throughput']:.0f} request/giây")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"Đã lưu {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args)
+        if regressions:
+            print("\nHồi quy hiệu năng:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("Không có hồi quy.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Cấu hình gunicorn cho production:  gunicorn -c gunicorn.conf.py
+
+SERVER_MODE=asgi (mặc định): worker uvicorn chạy music_website.asgi, các view
+async (play_track, yêu thích, playlist AJAX) chờ Audius / DB mà không chiếm
+thread nên một worker giữ được hàng trăm request cùng lúc.
+SERVER_MODE=wsgi: worker gthread chạy music_website.wsgi như trước (mỗi
+request một thread, tối đa WEB_THREADS request đồng thời mỗi worker).
+
+Không cần gunicorn (máy dev, container một process):
+    uvicorn music_website.asgi:application --host 0.0.0.0 --port 8000 --workers 2
+"""
+import multiprocessing
+import os
+
+MODE = os.environ.get("SERVER_MODE", "asgi")
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get("WEB_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+# tái tạo worker định kỳ để giới hạn rò rỉ bộ nhớ (lệch nhau để không restart cùng lúc)
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = "-"
+
+if MODE == "asgi":
+    wsgi_app = "music_website.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "music_website.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.environ.get("WEB_THREADS", 8))
@@ -3,6 +3,9 @@ ASGI config for music_website project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Chạy: ``uvicorn music_website.asgi:application --workers 2`` hoặc
+``gunicorn -c gunicorn.conf.py`` (worker uvicorn, xem gunicorn.conf.py).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +16,23 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'music_website.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from musicapp import audius  # noqa: E402  (cần app registry đã sẵn sàng)
+
+
+async def application(scope, receive, send):
+    """
+    Django không xử lý lifespan: trả lời startup / shutdown ở đây để đóng pool
+    kết nối httpx tới Audius khi worker dừng.
+    """
+    if scope["type"] != "lifespan":
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await audius.client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
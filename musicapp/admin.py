@@ -1,22 +1,49 @@
 from django.contrib import admin
-from .models import Song, Artist, Favorite, Playlist
+from django.utils import timezone
+
+from .facets import genre_key
+from .models import Song, Artist, Favorite, Genre, Job, Playlist, PlaylistItem, Rendition
 
 # =========================
 # ARTIST
 # =========================
 @admin.register(Artist)
 class ArtistAdmin(admin.ModelAdmin):
-    list_display = ('name', 'country')
+    list_display = ('name', 'country', 'song_count', 'favorite_count')
     search_fields = ('name',)
 
+# =========================
+# GENRE
+# =========================
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    list_display = ('name', 'key', 'song_count')
+    search_fields = ('name', 'key')
+    readonly_fields = ('key', 'song_count')
+
+    def save_model(self, request, obj, form, change):
+        obj.key = genre_key(obj.name)
+        super().save_model(request, obj, form, change)
+
 # =========================
 # SONG
 # =========================
+class RenditionInline(admin.TabularInline):
+    model = Rendition
+    extra = 0
+    can_delete = False
+    fields = ('bitrate', 'codecs', 'path', 'created_at')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Song)
 class SongAdmin(admin.ModelAdmin):
-    list_display = ('title', 'artist', 'genre', 'release_date')
+    list_display = ('title', 'artist', 'genre', 'release_date', 'duration_seconds', 'bitrate')
     search_fields = ('title', 'artist__name')
-    list_filter = ('genre', 'release_date')
+    list_filter = ('genre_ref', 'release_date')
+    inlines = [RenditionInline]
 
 # =========================
 # FAVORITE
@@ -30,9 +57,32 @@ class FavoriteAdmin(admin.ModelAdmin):
 # =========================
 # PLAYLIST
 # =========================
+class PlaylistItemInline(admin.TabularInline):
+    model = PlaylistItem
+    extra = 0
+    # raw_id để không phải render toàn bộ danh sách bài hát trong select
+    raw_id_fields = ('song',)
+
 @admin.register(Playlist)
 class PlaylistAdmin(admin.ModelAdmin):
     list_display = ('name', 'user', 'created_at')
     search_fields = ('name', 'user__username')
-    # Không dùng filter_horizontal vì songs là JSONField
     list_filter = ('created_at',)
+    inlines = [PlaylistItemInline]
+
+# =========================
+# JOB
+# =========================
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'priority', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'task')
+    search_fields = ('idempotency_key',)
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
+    actions = ['retry']
+
+    @admin.action(description="Chạy lại các job đã chọn")
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None)
+        self.message_user(request, f"Đã đưa {updated} job vào hàng đợi.")
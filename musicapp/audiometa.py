@@ -0,0 +1,318 @@
+import struct
+
+from . import facets, pagecache
+
+# =========================
+# Bảng tra header MPEG audio
+# =========================
+_BITRATES = {  # (version 1 | 2, layer) -> kbps theo chỉ số 1..14
+    (1, 1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    2.5: (11025, 12000, 8000),
+}
+_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+_LAYERS = {1: 3, 2: 2, 3: 1}
+
+_ID3_TEXT_FRAMES = {
+    "TIT2": "title", "TPE1": "artist", "TALB": "album", "TCON": "genre",
+    "TDRC": "year", "TYER": "year", "TT2": "title", "TP1": "artist",
+    "TAL": "album", "TCO": "genre", "TYE": "year",
+}
+_TEXT_ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+
+SCAN_WINDOW = 64 * 1024
+
+
+class AudioMetadataError(Exception):
+    """
+    Không tìm thấy frame MPEG audio hợp lệ trong file.
+    """
+
+
+def parse_frame_header(header):
+    """
+    Đọc 4 byte header frame MPEG; trả về dict hoặc None nếu không hợp lệ.
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = _VERSIONS.get((header[1] >> 3) & 0x3)
+    layer = _LAYERS.get((header[1] >> 1) & 0x3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x3
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_index - 1] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x1
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if layer == 2 or version == 1 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {
+        "version": version,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "samples": samples,
+        "length": length,
+        "mono": (header[3] >> 6) == 3,
+    }
+
+
+# =========================
+# ID3
+# =========================
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_text(data):
+    if not data:
+        return ""
+    encoding = _TEXT_ENCODINGS.get(data[0])
+    if encoding is None:
+        return ""
+    text = data[1:].decode(encoding, errors="replace")
+    return text.split("\x00")[0].strip()
+
+
+def _read_id3v2(f, tags):
+    """
+    Đọc các frame văn bản của ID3v2 ở đầu file; trả về số byte của tag.
+
+    Frame không phải văn bản (ảnh bìa APIC...) được bỏ qua bằng seek.
+    """
+    f.seek(0)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    major, flags = header[3], header[5]
+    tag_size = _syncsafe(header[6:10]) + 10 + (10 if flags & 0x10 else 0)
+
+    pos = 10
+    if flags & 0x40 and major >= 3:  # extended header
+        ext = f.read(4)
+        pos += (_syncsafe(ext) if major == 4 else struct.unpack(">I", ext)[0] + 4)
+
+    id_len, head_len = (3, 6) if major == 2 else (4, 10)
+    while pos + head_len <= tag_size:
+        f.seek(pos)
+        frame = f.read(head_len)
+        frame_id = frame[:id_len].decode("latin-1", errors="replace")
+        if not frame_id.strip("\x00"):
+            break  # phần đệm
+        if major == 2:
+            size = int.from_bytes(frame[3:6], "big")
+        elif major == 4:
+            size = _syncsafe(frame[4:8])
+        else:
+            size = struct.unpack(">I", frame[4:8])[0]
+        if size <= 0:
+            break
+        key = _ID3_TEXT_FRAMES.get(frame_id)
+        if key and key not in tags and size <= 4096:
+            tags[key] = _decode_text(f.read(size))
+        pos += head_len + size
+    return tag_size
+
+
+def _read_id3v1(f, size, tags):
+    """
+    Đọc ID3v1 ở cuối file (nếu có); trả về số byte của tag.
+    """
+    if size < 128:
+        return 0
+    f.seek(size - 128)
+    data = f.read(128)
+    if data[:3] != b"TAG":
+        return 0
+    for key, chunk in (("title", data[3:33]), ("artist", data[33:63]),
+                       ("album", data[63:93]), ("year", data[93:97])):
+        if key not in tags:
+            value = chunk.split(b"\x00")[0].decode("latin-1").strip()
+            if value:
+                tags[key] = value
+    return 128
+
+
+# =========================
+# Frame audio
+# =========================
+def _find_first_frame(f, start, end):
+    """
+    Tìm frame đầu tiên từ start; yêu cầu frame kế tiếp cũng hợp lệ để tránh nhận nhầm.
+    """
+    f.seek(start)
+    window = f.read(min(SCAN_WINDOW, end - start))
+    i = window.find(b"\xff")
+    while 0 <= i < len(window) - 3:
+        info = parse_frame_header(window[i:i + 4])
+        if info:
+            f.seek(start + i + info["length"])
+            if start + i + info["length"] >= end or parse_frame_header(f.read(4)):
+                return start + i, info
+        i = window.find(b"\xff", i + 1)
+    return None, None
+
+
+def _vbr_frame_count(f, pos, info):
+    """
+    Số frame ghi trong header Xing/Info hoặc VBRI của frame đầu (nếu có).
+    """
+    f.seek(pos)
+    frame = f.read(min(info["length"], 256))
+    if info["version"] == 1:
+        side = 17 if info["mono"] else 32
+    else:
+        side = 9 if info["mono"] else 17
+    xing = frame[4 + side:4 + side + 12]
+    if xing[:4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", xing[4:8])[0]
+        if flags & 0x1 and len(xing) >= 12:
+            return struct.unpack(">I", xing[8:12])[0]
+    vbri = frame[36:36 + 18]
+    if vbri[:4] == b"VBRI" and len(vbri) >= 18:
+        return struct.unpack(">I", vbri[14:18])[0]
+    return None
+
+
+def _iter_frames(f, pos, end):
+    """
+    Duyệt header từng frame (chỉ đọc 4 byte mỗi frame), trả về (vị trí, header).
+    """
+    while pos + 4 <= end:
+        f.seek(pos)
+        info = parse_frame_header(f.read(4))
+        if info is None:
+            # mất đồng bộ (rác giữa file) -> tìm frame kế tiếp
+            pos, info = _find_first_frame(f, pos + 1, end)
+            if pos is None:
+                break
+        if pos + info["length"] > end:
+            break  # frame cuối bị cắt
+        yield pos, info
+        pos += info["length"]
+
+
+def _count_frames(f, pos, end):
+    frames = samples = 0
+    for _, info in _iter_frames(f, pos, end):
+        frames += 1
+        samples += info["samples"]
+    return frames, samples
+
+
+def audio_frames(f, size):
+    """
+    Các frame audio (vị trí, header) của file MP3, bỏ tag ID3 và frame Xing/Info/VBRI.
+    """
+    start = _read_id3v2(f, {})
+    end = size - _read_id3v1(f, size, {})
+    pos, info = _find_first_frame(f, start, end)
+    if pos is None:
+        raise AudioMetadataError("Không tìm thấy frame MPEG audio")
+    if _vbr_frame_count(f, pos, info) is not None:
+        pos += info["length"]  # frame đầu chỉ chứa thông tin VBR, không có âm thanh
+    return _iter_frames(f, pos, end)
+
+
+def probe_file(f, size):
+    """
+    Đọc metadata của file MP3 đang mở (nhị phân) mà không nạp cả file vào bộ nhớ.
+
+    Trả về dict gồm duration (giây, tính chính xác từ số frame), bitrate
+    (bit/s trung bình), sample_rate và các tag ID3 tìm thấy (title,
+    artist, album, genre, year).
+    """
+    tags = {}
+    start = _read_id3v2(f, tags)
+    end = size - _read_id3v1(f, size, tags)
+
+    pos, info = _find_first_frame(f, start, end)
+    if pos is None:
+        raise AudioMetadataError("Không tìm thấy frame MPEG audio")
+
+    frames = _vbr_frame_count(f, pos, info)
+    if frames:
+        duration = frames * info["samples"] / info["sample_rate"]
+    else:
+        frames, samples = _count_frames(f, pos, end)
+        duration = samples / info["sample_rate"]
+
+    bitrate = round((end - pos) * 8 / duration) if duration else info["bitrate"]
+    return {
+        "duration": duration,
+        "bitrate": bitrate,
+        "sample_rate": info["sample_rate"],
+        "frames": frames,
+        "tags": tags,
+    }
+
+
+def probe_path(path):
+    """
+    probe_file cho đường dẫn trên đĩa (dùng trong process pool).
+    """
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        size = f.tell()
+        return probe_file(f, size)
+
+
+# =========================
+# Ghi vào Song
+# =========================
+def song_fields(meta, song=None):
+    """
+    Các field của Song cập nhật từ kết quả probe; không ghi đè dữ liệu đã nhập tay.
+    """
+    fields = {
+        "duration_seconds": round(meta["duration"], 3),
+        "bitrate": round(meta["bitrate"] / 1000),
+        "sample_rate": meta["sample_rate"],
+    }
+    if song is None or song.duration is None:
+        fields["duration"] = round(meta["duration"] / 60, 2)
+    genre = meta["tags"].get("genre")
+    if genre and (song is None or not song.genre):
+        fields["genre"] = genre[:50]
+        fields["genre_ref"] = facets.genre_for(genre[:50])
+    return fields
+
+
+def genre_added(fields):
+    """
+    Sau update(**song_fields(...)): bài chưa có thể loại vừa được gán -> cộng bộ đếm.
+    """
+    if fields.get("genre_ref") is not None:
+        facets.adjust(genres={fields["genre_ref"].pk: 1})
+
+
+def ingest_song(song):
+    """
+    Đọc header file nhạc của song và lưu thời lượng, bitrate, sample rate.
+    """
+    if not song.audio_file:
+        return None
+    storage = song.audio_file.storage
+    size = storage.size(song.audio_file.name)
+    with storage.open(song.audio_file.name, "rb") as f:
+        meta = probe_file(f, size)
+    fields = song_fields(meta, song)
+    type(song).objects.filter(pk=song.pk).update(**fields)
+    genre_added(fields)
+    pagecache.bump("song")
+    for name, value in fields.items():
+        setattr(song, name, value)
+    return meta
@@ -0,0 +1,212 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from requests.adapters import HTTPAdapter
+
+from . import perf
+
+DEFAULT_API_URL = "https://discoveryprovider.audius.co/v1"
+APP_NAME = "musicapp"
+
+
+class AudiusError(Exception):
+    """
+    Không lấy được dữ liệu từ Audius và không có bản cache cũ để dùng tạm.
+    """
+
+
+# =========================
+# Client Audius
+# =========================
+class AudiusClient:
+    """
+    Client Audius dùng chung trong process.
+
+    - một requests.Session với pool kết nối (keep-alive); view async dưới ASGI
+      dùng httpx.AsyncClient (mỗi event loop một client, worker uvicorn chỉ có
+      một loop; đóng khi worker dừng, xem aclose) để không chiếm thread khi chờ;
+    - cache TTL + LRU metadata theo track_id (cả kết quả "không tìm thấy");
+    - các request đồng thời cho cùng track_id chỉ gọi upstream một lần;
+    - upstream lỗi thì trả bản cache đã hết hạn nếu còn trong stale_ttl.
+    """
+
+    def __init__(self, ttl=300, stale_ttl=24 * 3600, max_entries=2048,
+                 timeout=(2, 5), pool_size=20):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._cache = OrderedDict()  # track_id -> (thời điểm lấy, data)
+        self._inflight = {}          # track_id -> threading.Event
+        self._ainflight = {}         # (event loop, track_id) -> asyncio.Task
+        self._lock = threading.Lock()
+        self._session = None
+        self._async_sessions = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+
+    @property
+    def base_url(self):
+        return getattr(settings, "AUDIUS_API_URL", DEFAULT_API_URL).rstrip("/")
+
+    @property
+    def session(self):
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    def async_session(self):
+        loop = asyncio.get_running_loop()
+        session = self._async_sessions.get(loop)
+        if session is None:
+            # không giới hạn số kết nối đồng thời (như requests), chỉ giữ pool_size kết nối keep-alive
+            limits = httpx.Limits(max_connections=None, max_keepalive_connections=self.pool_size)
+            session = self._async_sessions[loop] = httpx.AsyncClient(limits=limits)
+        return session
+
+    async def aclose(self):
+        """
+        Đóng client httpx của event loop hiện tại (music_website.asgi gọi khi worker dừng).
+        """
+        session = self._async_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.aclose()
+
+    def stream_url(self, track_id):
+        return f"{self.base_url}/tracks/{track_id}/stream"
+
+    # ---- cache ----
+    def _cached(self, track_id, max_age):
+        with self._lock:
+            entry = self._cache.get(track_id)
+            if entry is None or time.monotonic() - entry[0] > max_age:
+                return None
+            self._cache.move_to_end(track_id)
+            return entry
+
+    def _store(self, track_id, data):
+        with self._lock:
+            self._cache[track_id] = (time.monotonic(), data)
+            self._cache.move_to_end(track_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    # ---- upstream ----
+    def _fetch(self, track_id):
+        with perf.outbound():
+            resp = self.session.get(
+                f"{self.base_url}/tracks",
+                params={"id": track_id, "app_name": APP_NAME},
+                timeout=self.timeout,
+            )
+        resp.raise_for_status()
+        items = resp.json().get("data") or []
+        return items[0] if items else None
+
+    def get_track(self, track_id):
+        """
+        Metadata của track (dict của Audius) hoặc None nếu không tồn tại.
+        """
+        entry = self._cached(track_id, self.ttl)
+        if entry is not None:
+            return entry[1]
+
+        with self._lock:
+            event = self._inflight.get(track_id)
+            leader = event is None
+            if leader:
+                event = self._inflight[track_id] = threading.Event()
+
+        if not leader:
+            # đã có request khác đang lấy track này -> chờ kết quả của nó
+            event.wait(self.timeout[0] + self.timeout[1])
+            entry = self._cached(track_id, self.stale_ttl)
+            if entry is None:
+                raise AudiusError(f"Không lấy được track {track_id}")
+            return entry[1]
+
+        try:
+            data = self._fetch(track_id)
+        except (requests.RequestException, ValueError) as exc:
+            entry = self._cached(track_id, self.stale_ttl)
+            if entry is None:
+                raise AudiusError(f"Không lấy được track {track_id}: {exc}") from exc
+            return entry[1]
+        else:
+            self._store(track_id, data)
+            return data
+        finally:
+            with self._lock:
+                self._inflight.pop(track_id, None)
+            event.set()
+
+    async def _afetch(self, track_id):
+        with perf.outbound():
+            resp = await self.async_session().get(
+                f"{self.base_url}/tracks",
+                params={"id": track_id, "app_name": APP_NAME},
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+            )
+        resp.raise_for_status()
+        items = resp.json().get("data") or []
+        return items[0] if items else None
+
+    async def _aload(self, track_id):
+        try:
+            data = await self._afetch(track_id)
+        except (httpx.HTTPError, ValueError) as exc:
+            entry = self._cached(track_id, self.stale_ttl)
+            if entry is None:
+                raise AudiusError(f"Không lấy được track {track_id}: {exc}") from exc
+            return entry[1]
+        self._store(track_id, data)
+        return data
+
+    async def aget_track_for(self, request, track_id):
+        """
+        get_track cho view async, chọn theo handler của request.
+
+        Dưới WSGI view async chạy qua async_to_sync, mỗi request một event loop
+        mới: client httpx theo loop sẽ không bao giờ được dùng lại -> gọi bản
+        sync (pool của requests.Session) trong thread.
+        """
+        if isinstance(request, ASGIRequest):
+            return await self.aget_track(track_id)
+        return await sync_to_async(self.get_track)(track_id)
+
+    async def aget_track(self, track_id):
+        """
+        Bản async của get_track cho view ASGI: chờ upstream không chiếm thread.
+
+        Cùng cache với get_track; các request đồng thời cho cùng track_id trong
+        một event loop dùng chung một lần gọi upstream.
+        """
+        entry = self._cached(track_id, self.ttl)
+        if entry is not None:
+            return entry[1]
+
+        key = (asyncio.get_running_loop(), track_id)
+        task = self._ainflight.get(key)
+        if task is None:
+            task = self._ainflight[key] = asyncio.ensure_future(self._aload(track_id))
+            task.add_done_callback(lambda _: self._ainflight.pop(key, None))
+        # shield: một request bị hủy không hủy lần gọi các request khác đang chờ
+        return await asyncio.shield(task)
+
+
+client = AudiusClient()
@@ -0,0 +1,200 @@
+import os
+import re
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .models import PlaylistItem, Song
+from .streaming import CHUNK_SIZE
+
+# số lượt tải playlist cùng lúc của một người dùng (đếm trong cache: dùng chung
+# giữa các worker khi có Redis, locmem thì theo từng process)
+CONCURRENT_DOWNLOADS = 2
+# lượt bị kẹt (process chết giữa chừng) tự hết sau chừng này giây
+SLOT_TTL = 3 * 3600
+# ZIP không dùng ZIP64: offset / kích thước 32 bit, tối đa 65535 file
+MAX_ZIP_SIZE = 0xFFFFFFFF
+MAX_ZIP_ENTRIES = 0xFFFF
+
+# bit 3: CRC / kích thước nằm ở data descriptor sau dữ liệu; bit 11: tên file UTF-8
+_FLAGS = 0x0008 | 0x0800
+_LOCAL = struct.Struct("<IHHHHHIIIHH")
+_DESCRIPTOR = struct.Struct("<IIII")
+_CENTRAL = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END = struct.Struct("<IHHHHIIH")
+_UNSAFE = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+# name: tên trong ZIP (bytes UTF-8); path: tên file trong storage
+ZipEntry = namedtuple("ZipEntry", "name path size")
+
+
+class TooLarge(ValueError):
+    pass
+
+
+# =========================
+# Danh sách file
+# =========================
+def _safe(text):
+    return _UNSAFE.sub("_", text).strip(" .") or "_"
+
+
+def playlist_entries(playlist):
+    """
+    (storage, [ZipEntry]) các bài có file nhạc của playlist theo thứ tự phát.
+
+    Kích thước đọc từ storage ngay lúc này để tính trước Content-Length; bài
+    thiếu file bị bỏ qua.
+    """
+    storage = Song._meta.get_field("audio_file").storage
+    items = (PlaylistItem.objects.filter(playlist=playlist).exclude(song__audio_file="")
+             .exclude(song__audio_file__isnull=True).order_by("position", "id")
+             .values_list("song__title", "song__artist__name", "song__audio_file"))
+    entries = []
+    for title, artist, path in items:
+        try:
+            size = storage.size(path)
+        except OSError:
+            continue
+        ext = os.path.splitext(path)[1].lower() or ".mp3"
+        name = f"{len(entries) + 1:03d} - {_safe(artist)} - {_safe(title)}"[:200] + ext
+        entries.append(ZipEntry(name.encode(), path, size))
+    return storage, entries
+
+
+# =========================
+# ZIP lưu nguyên (stored) tạo trong lúc gửi
+# =========================
+def zip_size(entries):
+    """
+    Kích thước chính xác của file ZIP (Content-Length); TooLarge nếu vượt giới hạn không ZIP64.
+    """
+    if len(entries) > MAX_ZIP_ENTRIES:
+        raise TooLarge(f"quá {MAX_ZIP_ENTRIES} file")
+    size = _END.size
+    for entry in entries:
+        size += _LOCAL.size + len(entry.name) + entry.size + _DESCRIPTOR.size
+        size += _CENTRAL.size + len(entry.name)
+    if size > MAX_ZIP_SIZE:
+        raise TooLarge(f"{size} byte vượt giới hạn {MAX_ZIP_SIZE}")
+    return size
+
+
+def _dos_time(timestamp):
+    t = time.localtime(timestamp)
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+def zip_chunks(storage, entries, chunk_size=CHUNK_SIZE):
+    """
+    Generator các chunk của file ZIP: mỗi lúc chỉ giữ một chunk trong bộ nhớ.
+
+    Không nén (nhạc MP3 đã nén), CRC32 tính trong lúc đọc và ghi vào data
+    descriptor sau dữ liệu của từng file, nên không cần đọc file hai lần.
+    File đổi kích thước so với lúc tính Content-Length -> IOError (ngắt kết nối).
+    """
+    mtime, mdate = _dos_time(time.time())
+    offset = 0
+    central = []
+    for entry in entries:
+        header = _LOCAL.pack(0x04034B50, 20, _FLAGS, 0, mtime, mdate, 0, 0, 0, len(entry.name), 0)
+        yield header + entry.name
+        crc = 0
+        remaining = entry.size
+        with storage.open(entry.path, "rb") as file:
+            while remaining > 0:
+                data = file.read(min(chunk_size, remaining))
+                if not data:
+                    break
+                crc = zlib.crc32(data, crc)
+                remaining -= len(data)
+                yield data
+        if remaining:
+            raise IOError(f"{entry.path} ngắn hơn {entry.size} byte")
+        yield _DESCRIPTOR.pack(0x08074B50, crc, entry.size, entry.size)
+        central.append(_CENTRAL.pack(0x02014B50, 20, 20, _FLAGS, 0, mtime, mdate, crc, entry.size, entry.size,
+                                     len(entry.name), 0, 0, 0, 0, 0, offset) + entry.name)
+        offset += _LOCAL.size + len(entry.name) + entry.size + _DESCRIPTOR.size
+
+    directory = b"".join(central)
+    yield directory + _END.pack(0x06054B50, 0, 0, len(central), len(central), len(directory), offset, 0)
+
+
+# =========================
+# Giới hạn lượt tải đồng thời
+# =========================
+def _key(user_id):
+    return f"downloads:{user_id}"
+
+
+def acquire(user_id):
+    """
+    Giữ một lượt tải của user: trả về hàm trả lượt (gọi nhiều lần cũng chỉ trả
+    một lần), hoặc None nếu user đã có CONCURRENT_DOWNLOADS lượt đang chạy.
+    """
+    key = _key(user_id)
+    cache.add(key, 0, SLOT_TTL)
+    try:
+        count = cache.incr(key)
+    except ValueError:  # key vừa hết hạn
+        cache.set(key, 1, SLOT_TTL)
+        count = 1
+    if count > CONCURRENT_DOWNLOADS:
+        cache.decr(key)
+        return None
+
+    released = False
+
+    def release():
+        nonlocal released
+        if released:
+            return
+        released = True
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+
+    return release
+
+
+class _Releasing:
+    """
+    Nội dung StreamingHttpResponse gọi release() khi response đóng (gửi xong
+    hoặc client ngắt), kể cả khi chưa gửi chunk nào: Django gọi close() của
+    streaming_content trong response.close().
+    """
+
+    def __init__(self, chunks, release):
+        self._chunks = chunks
+        self._release = release
+
+    def close(self):
+        try:
+            close = getattr(self._chunks, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._release()
+
+
+class _SyncReleasing(_Releasing):
+    def __iter__(self):
+        return iter(self._chunks)
+
+
+class _AsyncReleasing(_Releasing):
+    def __aiter__(self):
+        return aiter(self._chunks)
+
+
+def releasing(chunks, release):
+    """
+    Bọc chunks (sync hoặc async, xem streaming.iter_for) để trả lượt tải khi response đóng.
+    """
+    cls = _AsyncReleasing if hasattr(chunks, "__aiter__") else _SyncReleasing
+    return cls(chunks, release)
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import cache
+
+from .models import Subscription
+
+FREE = "FREE"
+PREMIUM = "PREMIUM"
+# cache dùng chung: không có hạn (Free) thì giữ lâu, xóa khi Subscription đổi
+CACHE_TTL = 24 * 3600
+# bản trong process: process khác đổi Subscription thì bản này cũ tối đa chừng này giây
+LOCAL_TTL = 10
+LOCAL_MAX_ENTRIES = 10000
+
+# plan: FREE / PREMIUM; expires: unix timestamp hết Premium (None nếu Free)
+Entitlement = namedtuple("Entitlement", "plan expires")
+FREE_ENTITLEMENT = Entitlement(FREE, None)
+
+_local = OrderedDict()  # user_id -> (time.monotonic() lúc lưu, Entitlement)
+_lock = threading.Lock()
+
+
+def _key(user_id):
+    return f"entitlement:{user_id}"
+
+
+# =========================
+# Tính từ Subscription
+# =========================
+def from_subscription(sub):
+    """
+    Quyền hiệu lực của một Subscription (None = chưa đăng ký): Premium chỉ khi is_valid().
+    """
+    if sub is None or not sub.is_valid():
+        return FREE_ENTITLEMENT
+    return Entitlement(PREMIUM, sub.end_date.timestamp())
+
+
+def _effective(entitlement):
+    """
+    Premium đã qua end_date thì thành Free ngay lúc đọc, không cần chờ cache hết hạn.
+    """
+    if entitlement.expires is not None and entitlement.expires <= time.time():
+        return FREE_ENTITLEMENT
+    return entitlement
+
+
+def _ttl(entitlement):
+    if entitlement.expires is None:
+        return CACHE_TTL
+    return max(1, min(CACHE_TTL, int(entitlement.expires - time.time()) + 1))
+
+
+# =========================
+# Cache hai tầng: process -> cache dùng chung -> DB
+# =========================
+def _local_get(user_id):
+    with _lock:
+        entry = _local.get(user_id)
+        if entry is None or time.monotonic() - entry[0] > LOCAL_TTL:
+            return None
+        _local.move_to_end(user_id)
+        return entry[1]
+
+
+def _local_set(user_id, entitlement):
+    with _lock:
+        _local[user_id] = (time.monotonic(), entitlement)
+        _local.move_to_end(user_id)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+def _store(user_id, entitlement):
+    cache.set(_key(user_id), tuple(entitlement), _ttl(entitlement))
+    _local_set(user_id, entitlement)
+
+
+def _load(user_id):
+    return from_subscription(Subscription.objects.filter(user_id=user_id).first())
+
+
+def for_user(user):
+    """
+    Entitlement hiệu lực của user; chỉ đọc DB khi cả hai tầng cache đều trống.
+    """
+    if not user.is_authenticated:
+        return FREE_ENTITLEMENT
+    entitlement = _local_get(user.pk)
+    if entitlement is None:
+        cached = cache.get(_key(user.pk))
+        if cached is not None:
+            entitlement = Entitlement(*cached)
+            _local_set(user.pk, entitlement)
+        else:
+            entitlement = _load(user.pk)
+            _store(user.pk, entitlement)
+    return _effective(entitlement)
+
+
+async def afor_user(user):
+    """
+    Bản async của for_user cho view ASGI (trúng cache trong process thì không chờ gì).
+    """
+    if not user.is_authenticated:
+        return FREE_ENTITLEMENT
+    entitlement = _local_get(user.pk)
+    if entitlement is None:
+        cached = await cache.aget(_key(user.pk))
+        if cached is not None:
+            entitlement = Entitlement(*cached)
+            _local_set(user.pk, entitlement)
+        else:
+            entitlement = from_subscription(await Subscription.objects.filter(user_id=user.pk).afirst())
+            await cache.aset(_key(user.pk), tuple(entitlement), _ttl(entitlement))
+            _local_set(user.pk, entitlement)
+    return _effective(entitlement)
+
+
+def is_premium(user):
+    return for_user(user).plan == PREMIUM
+
+
+async def ais_premium(user):
+    return (await afor_user(user)).plan == PREMIUM
+
+
+def invalidate(user_id):
+    """
+    Xóa quyền đã cache của user (gọi từ musicapp.signals khi Subscription đổi
+    và khi tạo User, để id được dùng lại không nhận quyền cũ).
+    """
+    cache.delete(_key(user_id))
+    with _lock:
+        _local.pop(user_id, None)
+
+
+def clear_local():
+    with _lock:
+        _local.clear()
@@ -0,0 +1,168 @@
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import pagecache
+from .text import fold_text
+
+# số nghệ sĩ trả về trong facet
+ARTIST_LIMIT = 20
+# số yêu thích của nghệ sĩ đổi liên tục nhưng không bump phiên bản -> chỉ cache ngắn
+FACET_TTL = 60
+
+
+def genre_key(name):
+    return fold_text(name)[:50]
+
+
+def genre_for(name):
+    """
+    Genre ứng với chuỗi thể loại nhập tay (tạo mới nếu chưa có); None nếu trống.
+    """
+    from .models import Genre
+
+    key = genre_key(name)
+    if not key:
+        return None
+    genre = Genre.objects.filter(key=key).first()
+    if genre is None:
+        try:
+            with transaction.atomic():
+                genre = Genre.objects.create(key=key, name=name.strip()[:50])
+        except IntegrityError:  # process khác vừa tạo
+            genre = Genre.objects.get(key=key)
+    return genre
+
+
+# =========================
+# Bộ đếm phi chuẩn hóa
+# =========================
+def adjust(genres=None, songs=None, favorites=None):
+    """
+    Cộng delta vào bộ đếm: genres {genre_id: delta} -> Genre.song_count,
+    songs / favorites {artist_id: delta} -> Artist.song_count / favorite_count.
+
+    Cập nhật bằng F() (không đọc trước) và gộp các id cùng delta vào một UPDATE.
+    """
+    from .models import Artist, Genre
+
+    for model, field, deltas in ((Genre, "song_count", genres), (Artist, "song_count", songs),
+                                 (Artist, "favorite_count", favorites)):
+        by_delta = defaultdict(list)
+        for pk, delta in (deltas or {}).items():
+            if pk is not None and delta:
+                by_delta[delta].append(pk)
+        for delta, pks in by_delta.items():
+            model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def song_saved(song, created):
+    state = getattr(song, "_facet_state", {})
+    current = {f: getattr(song, f) for f in song.FACET_FIELDS}
+    if created:
+        state = {"artist_id": None, "genre_ref_id": None}
+    elif "artist_id" not in state or "genre_ref_id" not in state:
+        # bản ghi không nạp đủ field (vd. .only()) -> không biết giá trị cũ
+        song._facet_state = current
+        return
+    genres, songs = Counter(), Counter()
+    if state["genre_ref_id"] != current["genre_ref_id"]:
+        genres[state["genre_ref_id"]] -= 1
+        genres[current["genre_ref_id"]] += 1
+    if state["artist_id"] != current["artist_id"]:
+        songs[state["artist_id"]] -= 1
+        songs[current["artist_id"]] += 1
+    adjust(genres, songs)
+    song._facet_state = current
+
+
+def song_deleted(song):
+    adjust({song.genre_ref_id: -1}, {song.artist_id: -1})
+
+
+def favorite_changed(song_id, delta):
+    from .models import Artist, Song
+
+    artist = Song.objects.filter(pk=song_id).values("artist_id")
+    Artist.objects.filter(pk=Subquery(artist[:1])).update(favorite_count=F("favorite_count") + delta)
+
+
+def _count(queryset, group):
+    rows = queryset.order_by().values(group).annotate(n=Count("id")).values("n")[:1]
+    return Coalesce(Subquery(rows), 0)
+
+
+def recount():
+    """
+    Đếm lại toàn bộ (sửa sai lệch sau bulk_create / update() không qua signal).
+    """
+    from .models import Artist, Favorite, Genre, Song
+
+    with transaction.atomic():
+        missing = Song.objects.filter(genre_ref__isnull=True).exclude(genre__isnull=True).exclude(genre="")
+        for genre in set(missing.values_list("genre", flat=True)):
+            missing.filter(genre=genre).update(genre_ref=genre_for(genre))
+        Genre.objects.update(song_count=_count(Song.objects.filter(genre_ref=OuterRef("pk")), "genre_ref"))
+        Artist.objects.update(
+            song_count=_count(Song.objects.filter(artist=OuterRef("pk")), "artist"),
+            favorite_count=_count(Favorite.objects.filter(song__artist=OuterRef("pk")), "song__artist"),
+        )
+    pagecache.bump("song")
+    pagecache.bump("artist")
+
+
+# =========================
+# Facet cho bộ lọc
+# =========================
+def genre_counts(query=""):
+    """
+    [{key, name, count}] số bài mỗi thể loại trong kết quả của query.
+
+    Không có query: đọc thẳng Genre.song_count (theo index, không quét Song).
+    Có query: đếm theo genre_ref trên các bài khớp. Không áp bộ lọc thể loại
+    để người dùng thấy số bài của các thể loại khác.
+    """
+    from .models import Genre
+    from .search import filter_songs
+
+    if not fold_text(query):
+        rows = (Genre.objects.filter(song_count__gt=0).order_by("-song_count", "name")
+                .values_list("key", "name", "song_count"))
+    else:
+        # đếm theo genre_ref_id (không join), tên lấy từ bảng Genre nhỏ
+        counts = dict(filter_songs(query).filter(genre_ref__isnull=False).order_by()
+                      .values_list("genre_ref").annotate(n=Count("id")))
+        genres = Genre.objects.in_bulk(list(counts))
+        rows = sorted(((genres[pk].key, genres[pk].name, n) for pk, n in counts.items() if pk in genres),
+                      key=lambda row: (-row[2], row[1]))
+    return [{"key": key, "name": name, "count": count} for key, name, count in rows]
+
+
+def artist_counts(query="", genre="", limit=ARTIST_LIMIT):
+    """
+    [{id, name, count, favorites}] nghệ sĩ có nhiều bài nhất trong kết quả lọc.
+    """
+    from .models import Artist
+    from .search import filter_songs
+
+    if not fold_text(query) and not genre:
+        rows = (Artist.objects.filter(song_count__gt=0).order_by("-song_count", "id")
+                .values_list("id", "name", "song_count", "favorite_count")[:limit])
+    else:
+        rows = (filter_songs(query, genre).order_by()
+                .values_list("artist_id", "artist__name", "artist__favorite_count").annotate(n=Count("id"))
+                .order_by("-n", "artist_id")[:limit])
+        rows = [(pk, name, count, favorites) for pk, name, favorites, count in rows]
+    return [{"id": pk, "name": name, "count": count, "favorites": favorites}
+            for pk, name, count, favorites in rows]
+
+
+def cached_genres(query=""):
+    return pagecache.fragment("facet-genres", (fold_text(query),), lambda: genre_counts(query))
+
+
+def cached_artists(query="", genre=""):
+    return pagecache.fragment("facet-artists", (fold_text(query), genre_key(genre)),
+                              lambda: artist_counts(query, genre), ttl=FACET_TTL)
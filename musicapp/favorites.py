@@ -0,0 +1,60 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from . import pagecache
+from .models import Favorite
+
+CACHE_TTL = 24 * 3600
+
+
+def _key(user_id):
+    # theo phiên bản "favorite" của user (pagecache.bump trong musicapp.signals và
+    # musicapp.library): ghi Favorite đổi key thay vì sửa tập đã cache, nên không mất
+    # cập nhật khi hai request ghi cùng lúc và bản cũ do process khác ghi lại không còn được đọc
+    return f"favorites:{user_id}:{pagecache.versions(('favorite', user_id))}"
+
+
+# =========================
+# Danh sách yêu thích (cache)
+# =========================
+def favorite_ids(user):
+    """
+    Tập id bài hát yêu thích của user, đọc từ cache; chỉ truy vấn khi cache trống
+    hoặc yêu thích của user vừa đổi.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    key = _key(user.id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Favorite.objects.filter(user_id=user.id).values_list('song_id', flat=True))
+        cache.set(key, ids, CACHE_TTL)
+    return ids
+
+
+def toggle(user, song):
+    """
+    Thêm / bỏ yêu thích; trả về True nếu bài hát đang được yêu thích sau khi đổi.
+
+    Thử INSERT trước và dựa vào unique_together (user, song) để biết bản ghi đã
+    tồn tại, thay vì exists() rồi mới create()/delete().
+    """
+    try:
+        with transaction.atomic():
+            Favorite.objects.create(user=user, song=song)
+        return True
+    except IntegrityError:
+        Favorite.objects.filter(user=user, song=song).delete()
+        return False
+
+
+async def atoggle(user, song):
+    """
+    Bản async của toggle cho view ASGI.
+
+    Chạy toggle trong thread của ORM: INSERT nằm trong transaction.atomic() nên
+    hai request cùng lúc không thể cùng đọc "chưa có" rồi đảo ngược nhau như
+    khi đọc trước rồi mới xóa / thêm bằng ORM async.
+    """
+    return await sync_to_async(toggle)(user, song)
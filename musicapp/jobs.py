@@ -0,0 +1,242 @@
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+from importlib import import_module
+
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 3600
+# job "running" quá lâu (worker chết giữa chừng) được đưa lại vào hàng đợi
+LOCK_TIMEOUT = timedelta(minutes=30)
+# số nhóm ứng viên thử khi các worker SQLite tranh cùng job
+CLAIM_ROUNDS = 4
+
+_tasks = {}
+
+
+# =========================
+# Khai báo task
+# =========================
+def task(max_attempts=5, release_key=False):
+    """
+    Đăng ký hàm làm task chạy nền; tên task là "<module>.<tên hàm>".
+
+        @jobs.task(max_attempts=3)
+        def process_audio(song_id): ...
+
+        jobs.enqueue(process_audio, song_id=1, key="audio:1")
+
+    Mặc định idempotency key giữ tới khi purge (vd. "một lần mỗi phút");
+    release_key=True thì key chỉ chặn job trùng lúc job cũ còn chờ / đang chạy
+    và được nhả khi job kết thúc.
+    """
+    def decorator(func):
+        func.task_name = f"{func.__module__}.{func.__qualname__}"
+        func.max_attempts = max_attempts
+        func.release_key = release_key
+        _tasks[func.task_name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    if name not in _tasks:
+        # worker chưa import module chứa task
+        import_module(name.rpartition(".")[0])
+    return _tasks[name]
+
+
+# =========================
+# Đưa job vào hàng đợi
+# =========================
+def enqueue(func, priority=0, key=None, delay=None, **kwargs):
+    """
+    Tạo job cho task func với kwargs (phải serialize được JSON).
+
+    Job nằm trong cùng transaction với dữ liệu vừa lưu nên worker chỉ thấy
+    nó sau khi commit. Với key (idempotency key), job đã có cùng key thì
+    không tạo thêm và trả về job cũ.
+    """
+    from .models import Job
+
+    job = Job(task=func.task_name, kwargs=kwargs, priority=priority,
+              idempotency_key=key, max_attempts=func.max_attempts)
+    if delay:
+        job.run_at = timezone.now() + timedelta(seconds=delay)
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=key)
+    return job
+
+
+def enqueue_many(func, calls, priority=0):
+    """
+    Tạo nhiều job cho func bằng một bulk_create; calls là [(key, kwargs)].
+
+    Key đã có job thì bỏ qua (không trả về job cũ như enqueue).
+    """
+    from .models import Job
+
+    Job.objects.bulk_create([
+        Job(task=func.task_name, kwargs=kwargs, priority=priority,
+            idempotency_key=key, max_attempts=func.max_attempts)
+        for key, kwargs in calls
+    ], batch_size=500, ignore_conflicts=True)
+
+
+# =========================
+# Lấy và chạy job
+# =========================
+def _requeue_stale(now):
+    from .models import Job
+
+    Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - LOCK_TIMEOUT).update(
+        status=Job.QUEUED, locked_by="", locked_at=None)
+
+
+def claim_many(worker_id, limit=1):
+    """
+    Nhận tối đa limit job đến hạn, ưu tiên cao trước; list rỗng nếu hàng đợi trống.
+
+    PostgreSQL dùng SELECT ... FOR UPDATE SKIP LOCKED; SQLite (không khóa
+    dòng) nhận bằng một UPDATE có điều kiện status='queued' trên các ứng
+    viên, worker chậm chân chỉ nhận được phần còn lại.
+    """
+    from .models import Job
+
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by("-priority", "run_at", "id")
+    claimed = Job.objects.filter(status=Job.RUNNING, locked_by=worker_id, locked_at=now)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list("id", flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(
+                status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F("attempts") + 1)
+    else:
+        ids = list(due.values_list("id", flat=True)[:limit * CLAIM_ROUNDS])
+        # worker khác vừa nhận hết nhóm đầu -> thử nhóm kế, vẫn theo thứ tự ưu tiên
+        for offset in range(0, len(ids), limit):
+            if Job.objects.filter(id__in=ids[offset:offset + limit], status=Job.QUEUED).update(
+                    status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F("attempts") + 1):
+                break
+    if not ids:
+        return []
+    return list(claimed.filter(id__in=ids).order_by("-priority", "run_at", "id"))
+
+
+def claim(worker_id):
+    """
+    Nhận một job đến hạn có độ ưu tiên cao nhất; None nếu hàng đợi trống.
+    """
+    jobs = claim_many(worker_id, 1)
+    return jobs[0] if jobs else None
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.5)
+
+
+def run_job(job):
+    """
+    Chạy job đã nhận; lỗi thì hẹn chạy lại (backoff lũy thừa) tới max_attempts.
+    """
+    from .models import Job
+
+    func = get_task(job.task)
+    # job kết thúc: nhả idempotency key nếu task yêu cầu
+    released = {"idempotency_key": None} if func.release_key else {}
+    try:
+        func(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) lỗi lần %s", job.pk, job.task, job.attempts)
+        if job.attempts >= job.max_attempts:
+            fields = {"status": Job.FAILED, "finished_at": timezone.now(), **released}
+        else:
+            fields = {"status": Job.QUEUED,
+                      "run_at": timezone.now() + timedelta(seconds=retry_delay(job.attempts))}
+        Job.objects.filter(pk=job.pk).update(last_error=error, locked_by="", locked_at=None, **fields)
+        return False
+    Job.objects.filter(pk=job.pk).update(status=Job.DONE, finished_at=timezone.now(),
+                                         locked_by="", locked_at=None, **released)
+    return True
+
+
+def run_pending(worker_id="inline", limit=None):
+    """
+    Chạy các job đến hạn ngay trong process hiện tại; trả về số job đã chạy.
+    """
+    done = 0
+    while limit is None or done < limit:
+        job = claim(worker_id)
+        if job is None:
+            break
+        run_job(job)
+        done += 1
+    return done
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def work(worker_id=None, poll_interval=1.0, burst=False, batch=1, should_stop=lambda: False):
+    """
+    Vòng lặp của một worker: nhận và chạy job, ngủ poll_interval khi hàng đợi trống.
+
+    batch > 1 nhận nhiều job mỗi lần (ít truy vấn hơn cho job ngắn);
+    burst=True thì dừng khi hết job đến hạn.
+    """
+    worker_id = worker_id or default_worker_id()
+    _requeue_stale(timezone.now())
+    done = 0
+    while not should_stop():
+        close_old_connections()
+        claimed = claim_many(worker_id, batch)
+        if not claimed:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        for i, job in enumerate(claimed):
+            if i and should_stop():
+                _release(claimed[i:])
+                break
+            run_job(job)
+            done += 1
+    return done
+
+
+def _release(claimed):
+    # trả lại các job đã nhận nhưng chưa chạy khi worker dừng
+    from .models import Job
+
+    Job.objects.filter(id__in=[job.id for job in claimed], status=Job.RUNNING).update(
+        status=Job.QUEUED, locked_by="", locked_at=None, attempts=F("attempts") - 1)
+
+
+def purge(older_than=timedelta(days=7)):
+    """
+    Xóa job đã xong / lỗi hẳn cũ hơn older_than (giải phóng idempotency key).
+    """
+    from .models import Job
+
+    cutoff = timezone.now() - older_than
+    deleted, _ = Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__lt=cutoff).delete()
+    return deleted
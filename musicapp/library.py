@@ -0,0 +1,207 @@
+import json
+import os
+from collections import Counter
+from itertools import islice
+from urllib.parse import unquote
+
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import content_disposition_header
+
+from . import facets, pagecache, typeahead
+from .models import Favorite, PlaylistItem, Song
+from .streaming import iter_for
+from .text import song_search_key
+
+# số dòng mỗi lần đọc từ DB (iterator) và mỗi đoạn gửi xuống client
+EXPORT_CHUNK = 2000
+# số dòng nhập so khớp trong một truy vấn
+IMPORT_BATCH = 500
+IMPORT_MAX_ROWS = 100_000
+
+FORMATS = {
+    "m3u8": "audio/x-mpegurl; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+EXTENSIONS = {".m3u": "m3u8", ".m3u8": "m3u8", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl"}
+
+COLUMNS = ("song_id", "song__title", "song__artist__name", "song__duration_seconds", "song__duration")
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# =========================
+# Xuất (stream)
+# =========================
+def playlist_rows(playlist):
+    return (PlaylistItem.objects.filter(playlist=playlist).order_by("position", "id")
+            .values_list(*COLUMNS))
+
+
+def favorite_rows(user):
+    return Favorite.objects.filter(user=user).order_by("-added_at", "-id").values_list(*COLUMNS)
+
+
+def _seconds(row):
+    if row[3] is not None:
+        return round(row[3])
+    if row[4] is not None:  # Song.duration tính bằng phút
+        return round(row[4] * 60)
+    return -1
+
+
+def _renderer(request, fmt):
+    """
+    (header, hàm dựng một dòng từ tuple COLUMNS) của định dạng fmt.
+    """
+    if fmt == "jsonl":
+        def render(row):
+            seconds = _seconds(row)
+            return json.dumps({"id": row[0], "title": row[1], "artist": row[2],
+                               "duration": seconds if seconds >= 0 else None}, ensure_ascii=False) + "\n"
+        return "", render
+
+    # reverse() một lần cho cả file thay vì mỗi dòng
+    prefix, suffix = request.build_absolute_uri(reverse("stream_song", args=[0])).rsplit("0", 1)
+
+    def render(row):
+        return f"#EXTINF:{_seconds(row)},{row[2]} - {row[1]}\n{prefix}{row[0]}{suffix}\n"
+    return "#EXTM3U\n", render
+
+
+def _chunks(rows, header, render):
+    if header:
+        yield header.encode()
+    lines = []
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK):
+        lines.append(render(row))
+        if len(lines) >= EXPORT_CHUNK:
+            yield "".join(lines).encode()
+            lines = []
+    if lines:
+        yield "".join(lines).encode()
+
+
+def export_response(request, rows, fmt, filename):
+    """
+    StreamingHttpResponse xuất rows (playlist_rows / favorite_rows) dạng fmt.
+
+    Đọc DB theo từng EXPORT_CHUNK dòng nên bộ nhớ không tăng theo số bài (kể
+    cả dưới ASGI, xem streaming.iter_for).
+    """
+    header, render = _renderer(request, fmt)
+    response = StreamingHttpResponse(iter_for(request, _chunks(rows, header, render)), content_type=FORMATS[fmt])
+    response["Content-Disposition"] = content_disposition_header(True, f"{filename}.{fmt}")
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+
+# =========================
+# Nhập
+# =========================
+def import_format(filename, content_type=""):
+    """
+    Định dạng file nhập theo đuôi tên file, không có thì theo Content-Type (mặc định M3U).
+    """
+    fmt = EXTENSIONS.get(os.path.splitext(filename or "")[1].lower())
+    if fmt:
+        return fmt
+    return "jsonl" if "json" in (content_type or "") else "m3u8"
+
+
+def _pair(name):
+    artist, sep, title = name.partition(" - ")
+    return (title.strip(), artist.strip()) if sep else (name.strip(), "")
+
+
+def parse_lines(lines, fmt):
+    """
+    (title, artist) từ từng dòng file M3U / JSONL (generator; dòng hỏng bỏ qua).
+
+    M3U: lấy "Nghệ sĩ - Tên bài" từ #EXTINF, không có thì từ tên file của dòng đường dẫn.
+    """
+    pending = None
+    for raw in lines:
+        line = (raw.decode("utf-8", "replace") if isinstance(raw, bytes) else raw).strip().lstrip("\ufeff")
+        if not line:
+            continue
+        if fmt == "jsonl":
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(row, dict) and row.get("title"):
+                yield str(row["title"]).strip(), str(row.get("artist") or "").strip()
+        elif line.startswith("#EXTINF:"):
+            pending = line.partition(",")[2]
+        elif not line.startswith("#"):
+            name = pending or os.path.splitext(unquote(line.rstrip("/").rsplit("/", 1)[-1]))[0]
+            pending = None
+            yield _pair(name)
+
+
+def match_songs(pairs):
+    """
+    (id bài hát khớp theo thứ tự, bỏ trùng; số dòng không khớp).
+
+    So khớp theo search_key (tên bài + nghệ sĩ đã bỏ dấu, có index): mỗi lô
+    IMPORT_BATCH dòng một truy vấn. Nhiều bài cùng khóa thì lấy bài tạo trước.
+    """
+    matched, seen, missing = [], set(), 0
+    for batch in _batched(islice(pairs, IMPORT_MAX_ROWS), IMPORT_BATCH):
+        keys = [song_search_key(title, artist) for title, artist in batch]
+        found = dict(Song.objects.filter(search_key__in=set(keys)).order_by("-id")
+                     .values_list("search_key", "id"))
+        for key in keys:
+            pk = found.get(key)
+            if pk is None:
+                missing += 1
+            elif pk not in seen:
+                seen.add(pk)
+                matched.append(pk)
+    return matched, missing
+
+
+def append_to_playlist(playlist, song_ids):
+    """
+    Thêm các bài chưa có vào cuối playlist trong một transaction (bulk_create); trả về số bài đã thêm.
+    """
+    with transaction.atomic():
+        items = PlaylistItem.objects.filter(playlist=playlist)
+        existing = set(items.values_list("song_id", flat=True))
+        last = items.order_by("-position").values_list("position", flat=True).first()
+        start = 0 if last is None else last + 1
+        new = [pk for pk in song_ids if pk not in existing]
+        PlaylistItem.objects.bulk_create(
+            [PlaylistItem(playlist=playlist, song_id=pk, position=start + i) for i, pk in enumerate(new)],
+            ignore_conflicts=True,
+        )
+    if new:
+        pagecache.bump("playlist", playlist.user_id)
+    return len(new)
+
+
+def add_favorites(user, song_ids):
+    """
+    Yêu thích các bài chưa có trong một transaction (bulk_create); trả về số bài đã thêm.
+
+    bulk_create không qua signal nên tự cập nhật những gì musicapp.signals làm
+    cho từng Favorite: cache danh sách, bộ đếm nghệ sĩ, chỉ mục gợi ý, phiên bản trang.
+    """
+    with transaction.atomic():
+        existing = set(Favorite.objects.filter(user=user).values_list("song_id", flat=True))
+        new = [pk for pk in song_ids if pk not in existing]
+        Favorite.objects.bulk_create([Favorite(user=user, song_id=pk) for pk in new], ignore_conflicts=True)
+        artists = Counter()
+        for batch in _batched(new, IMPORT_BATCH):
+            artists.update(Song.objects.filter(pk__in=batch).values_list("artist_id", flat=True))
+        facets.adjust(favorites=artists)
+    if new:
+        typeahead.index.add_favorites(new, 1)
+        pagecache.bump("favorite", user.pk)
+    return len(new)
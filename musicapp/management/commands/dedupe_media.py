@@ -0,0 +1,118 @@
+import os
+import posixpath
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from musicapp import pagecache
+from musicapp.models import MediaBlob, Song
+from musicapp.storage import blob_name, content_storage, file_digest
+from musicapp.thumbnails import THUMB_DIR
+
+
+class Command(BaseCommand):
+    help = ("Gộp các file trùng nội dung trong media/ (audio, ảnh bìa) về tên theo hash, "
+            "cập nhật Song và đếm lại tham chiếu")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Chỉ báo cáo, không di chuyển / xóa file")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Số process băm file (mặc định: số CPU)")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        storage = content_storage
+        fields = {name: Song._meta.get_field(name).upload_to.strip("/") for name in Song.MEDIA_FIELDS}
+
+        # mọi file trong các thư mục upload (trừ ảnh thu nhỏ và file tạm đang ghi)
+        files = set()
+        for directory in fields.values():
+            root = storage.path(directory)
+            for dirpath, dirnames, filenames in os.walk(root):
+                rel = os.path.relpath(dirpath, storage.location).replace(os.sep, "/")
+                if rel == THUMB_DIR:
+                    dirnames.clear()
+                    continue
+                files.update(posixpath.join(rel, f) for f in filenames if not f.startswith(".upload-"))
+
+        songs = list(Song.objects.only("id", *Song.MEDIA_FIELDS))
+        referenced = {getattr(s, f).name for s in songs for f in fields if getattr(s, f).name}
+        names = sorted(n for n in files | referenced if storage.exists(n))
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            digests = dict(zip(names, pool.map(file_digest, [storage.path(n) for n in names], chunksize=16)))
+
+        def target(field, name):
+            return blob_name(fields[field], digests[name], os.path.splitext(name)[1])
+
+        # tên mới cho từng tham chiếu
+        renames = {}
+        changed = []
+        for song in songs:
+            dirty = False
+            for field in fields:
+                name = getattr(song, field).name
+                if name in digests:
+                    new = renames[name] = target(field, name)
+                    if new != name:
+                        getattr(song, field).name = new
+                        dirty = True
+            if dirty:
+                changed.append(song)
+
+        # file không được tham chiếu nhưng trùng nội dung một blob -> thừa
+        kept = set(renames.values())
+        used = {digests[name] for name in renames}
+        orphans = [n for n in names if n not in renames and n not in kept]
+        redundant = [n for n in orphans if digests[n] in used]
+
+        reclaimed = 0
+        moved = removed = 0
+        present = {n for n in names if n in kept}
+        for old, new in sorted(renames.items()):
+            if old == new:
+                continue
+            if new in present:
+                reclaimed += storage.size(old)
+                removed += 1
+                if not dry_run:
+                    os.remove(storage.path(old))
+            else:
+                present.add(new)
+                moved += 1
+                if not dry_run:
+                    path = storage.path(new)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(storage.path(old), path)
+        for name in redundant:
+            reclaimed += storage.size(name)
+            removed += 1
+            if not dry_run:
+                os.remove(storage.path(name))
+
+        # xóa thẳng trên đĩa ở trên; số tham chiếu được đếm lại toàn bộ tại đây
+        if not dry_run:
+            refs = Counter(getattr(s, f).name for s in songs for f in fields if getattr(s, f).name)
+            with transaction.atomic():
+                Song.objects.bulk_update(changed, list(fields), batch_size=500)
+                MediaBlob.objects.all().delete()
+                MediaBlob.objects.bulk_create([
+                    MediaBlob(name=name, size=storage.size(name), refs=count)
+                    for name, count in refs.items() if storage.exists(name)
+                ], batch_size=500)
+            pagecache.bump("song")
+
+        elapsed = time.perf_counter() - started
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Đã băm {len(names)} file trong {elapsed:.2f}s: {moved} file đổi tên theo hash, "
+            f"{removed} bản trùng bị xóa, {len(changed)} bài hát được cập nhật, "
+            f"{len(orphans) - len(redundant)} file không được dùng giữ nguyên. "
+            f"Giải phóng {reclaimed / 1024 / 1024:.2f} MB ({reclaimed} byte)."
+        ))
+
@@ -0,0 +1,205 @@
+import time
+from datetime import date, timedelta
+from itertools import islice
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from musicapp import facets, pagecache, search, typeahead
+from musicapp.models import Artist, Favorite, Playlist, PlaylistItem, Song, Subscription
+from musicapp.text import song_search_key
+
+GENRES = ["Pop", "Ballad", "Rock", "Rap", "Lofi", "EDM", "Jazz", "Indie", "Bolero", "R&B"]
+WORDS = ["anh", "em", "mưa", "nắng", "yêu", "nhớ", "đêm", "ngày", "xa", "về", "trôi", "lạc", "tình", "buồn",
+         "vui", "phố", "biển", "gió", "mùa", "thu", "đông", "hạ", "xuân", "trăng", "sao", "hoa", "giấc", "mơ",
+         "chiều", "sáng", "ánh", "đường", "nhà", "quê", "hương", "một", "mình", "bên", "nhau", "cuối", "cùng"]
+COUNTRIES = ["Việt Nam", "Hàn Quốc", "Mỹ", "Nhật Bản", "Anh"]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def zipf_weights(n, s):
+    """
+    Xác suất của hạng 1..n theo phân phối Zipf (hạng k tỉ lệ 1 / k^s).
+    """
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** s
+    return weights / weights.sum()
+
+
+class Command(BaseCommand):
+    help = ("Sinh dữ liệu giả lập (nghệ sĩ, bài hát, người dùng, yêu thích theo Zipf, playlist, gói Premium) "
+            "bằng bulk_create cho benchmark - từ 1 nghìn tới 1 triệu bài hát")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--songs", type=int, default=10000)
+        parser.add_argument("--artists", type=int, help="Mặc định: songs / 20")
+        parser.add_argument("--users", type=int, help="Mặc định: songs / 10")
+        parser.add_argument("--favorites", type=float, default=30,
+                            help="Số bài yêu thích trung bình mỗi người (phân phối hình học)")
+        parser.add_argument("--zipf", type=float, default=1.1, help="Số mũ Zipf: độ tập trung vào bài nổi tiếng")
+        parser.add_argument("--playlists", type=int, default=3, help="Số playlist mỗi người")
+        parser.add_argument("--playlist-size", type=int, default=20)
+        parser.add_argument("--premium", type=float, default=0.1, help="Tỉ lệ người dùng có Premium còn hạn")
+        parser.add_argument("--prefix", default="synth", help="Tiền tố tên đăng nhập: <prefix><số>")
+        parser.add_argument("--password", default="synth-pass-123", help="Mật khẩu chung của người dùng sinh ra")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        songs = options["songs"]
+        if songs < 1:
+            raise CommandError("--songs phải lớn hơn 0")
+        artists = options["artists"] or max(1, songs // 20)
+        users = options["users"] if options["users"] is not None else max(1, songs // 10)
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Đã có người dùng {prefix}*: dùng --prefix khác")
+
+        self.rng = np.random.default_rng(options["seed"])
+        self.batch_size = options["batch_size"]
+        started = time.perf_counter()
+
+        artist_ids = self.create_artists(artists)
+        song_ids = self.create_songs(songs, artist_ids)
+        user_ids = self.create_users(users, prefix, options["password"])
+        # hạng Zipf -> bài hát: bài nổi tiếng rải ngẫu nhiên, không phải các id nhỏ nhất
+        popular = self.rng.permutation(song_ids)
+        weights = zipf_weights(len(popular), options["zipf"])
+        favorites = self.create_favorites(user_ids, popular, weights, options["favorites"])
+        items = self.create_playlists(user_ids, popular, weights, options["playlists"], options["playlist_size"])
+        premium = self.create_subscriptions(user_ids, options["premium"])
+
+        # bulk_create không qua signal: đếm lại bộ đếm, đổi phiên bản cache, dựng lại chỉ mục gợi ý
+        # (từ khóa tìm kiếm đã ghi trong create_songs)
+        facets.recount()
+        pagecache.bump("song")
+        pagecache.bump("artist")
+        typeahead.bump_generation()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã sinh {len(artist_ids)} nghệ sĩ, {len(song_ids)} bài hát, {len(user_ids)} người dùng "
+            f"({premium} Premium), {favorites} yêu thích, {items} bài trong playlist trong {elapsed:.1f}s"
+        ))
+
+    # ---- từng bảng ----
+    def bulk(self, model, objects):
+        with transaction.atomic():
+            for batch in batched(objects, self.batch_size):
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+
+    def new_ids(self, model, after):
+        return np.fromiter(model.objects.filter(pk__gt=after).order_by("pk").values_list("pk", flat=True)
+                           .iterator(chunk_size=50000), dtype=np.int64)
+
+    def last_id(self, model):
+        return model.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+    def create_artists(self, count):
+        after = self.last_id(Artist)
+        countries = self.rng.integers(len(COUNTRIES), size=count)
+        self.bulk(Artist, (Artist(name=f"Nghệ sĩ {i}", country=COUNTRIES[c]) for i, c in enumerate(countries)))
+        ids = self.new_ids(Artist, after)
+        self.artist_names = dict(Artist.objects.filter(pk__gt=after).values_list("pk", "name")
+                                 .iterator(chunk_size=50000))
+        self.stdout.write(f"  {len(ids)} nghệ sĩ")
+        return ids
+
+    def create_songs(self, count, artist_ids):
+        after = self.last_id(Song)
+        genres = {name: facets.genre_for(name) for name in GENRES}
+        # số bài mỗi nghệ sĩ cũng lệch: vài nghệ sĩ có rất nhiều bài
+        owners = self.rng.permutation(artist_ids)[self.rng.choice(len(artist_ids), size=count,
+                                                                  p=zipf_weights(len(artist_ids), 0.8))]
+        genre_index = self.rng.integers(len(GENRES), size=count)
+        lengths = self.rng.integers(2, 5, size=count)
+        durations = self.rng.uniform(2.5, 6.0, size=count).round(2)
+        released = self.rng.integers(0, 15 * 365, size=count)
+        words = self.rng.integers(len(WORDS), size=(count, 4))
+        today = date.today()
+
+        def build():
+            for i in range(count):
+                title = " ".join(WORDS[w] for w in words[i, :lengths[i]]).capitalize() + f" {i}"
+                artist_id = int(owners[i])
+                genre = GENRES[genre_index[i]]
+                yield Song(title=title, artist_id=artist_id, genre=genre, genre_ref=genres[genre],
+                           duration=float(durations[i]), release_date=today - timedelta(days=int(released[i])),
+                           search_key=song_search_key(title, self.artist_names[artist_id]))
+
+        self.bulk(Song, build())
+        ids = self.new_ids(Song, after)
+        search.index_songs(Song.objects.filter(pk__gt=after).order_by("pk").values_list("pk", "search_key")
+                           .iterator(chunk_size=50000))
+        self.stdout.write(f"  {len(ids)} bài hát")
+        return ids
+
+    def create_users(self, count, prefix, password):
+        after = self.last_id(User)
+        password = make_password(password)  # băm một lần cho tất cả
+        self.bulk(User, (User(username=f"{prefix}{i}", password=password) for i in range(count)))
+        ids = self.new_ids(User, after)
+        self.stdout.write(f"  {len(ids)} người dùng")
+        return ids
+
+    def sample(self, popular, weights, sizes):
+        """
+        Mỗi phần tử của sizes -> mảng id bài hát không trùng, chọn theo Zipf.
+        """
+        picks = popular[self.rng.choice(len(popular), size=int(sizes.sum()), p=weights)]
+        for chunk in np.split(picks, np.cumsum(sizes)[:-1]):
+            yield np.unique(chunk)
+
+    def create_favorites(self, user_ids, popular, weights, mean):
+        if mean <= 0 or not len(user_ids):
+            return 0
+        sizes = np.minimum(self.rng.geometric(1 / max(mean, 1), size=len(user_ids)), len(popular))
+        total = 0
+
+        def build():
+            nonlocal total
+            for user_id, song_ids in zip(user_ids, self.sample(popular, weights, sizes)):
+                total += len(song_ids)
+                for song_id in song_ids:
+                    yield Favorite(user_id=int(user_id), song_id=int(song_id))
+
+        self.bulk(Favorite, build())
+        self.stdout.write(f"  {total} yêu thích")
+        return total
+
+    def create_playlists(self, user_ids, popular, weights, per_user, size):
+        if per_user <= 0 or not len(user_ids):
+            return 0
+        after = self.last_id(Playlist)
+        self.bulk(Playlist, (Playlist(user_id=int(user_id), name=f"Playlist {n + 1}")
+                             for user_id in user_ids for n in range(per_user)))
+        playlist_ids = self.new_ids(Playlist, after)
+        sizes = np.full(len(playlist_ids), min(size, len(popular)))
+        total = 0
+
+        def build():
+            nonlocal total
+            for playlist_id, song_ids in zip(playlist_ids, self.sample(popular, weights, sizes)):
+                total += len(song_ids)
+                for position, song_id in enumerate(self.rng.permutation(song_ids)):
+                    yield PlaylistItem(playlist_id=int(playlist_id), song_id=int(song_id), position=position)
+
+        self.bulk(PlaylistItem, build())
+        self.stdout.write(f"  {len(playlist_ids)} playlist, {total} bài trong playlist")
+        return total
+
+    def create_subscriptions(self, user_ids, ratio):
+        chosen = user_ids[self.rng.random(len(user_ids)) < ratio]
+        now = timezone.now()
+        self.bulk(Subscription, (Subscription(user_id=int(user_id), plan="PREMIUM", is_active=True,
+                                              start_date=now, end_date=now + timedelta(days=30))
+                                 for user_id in chosen))
+        return len(chosen)
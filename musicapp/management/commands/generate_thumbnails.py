@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from musicapp import pagecache
+from musicapp.models import Song
+from musicapp.thumbnails import build_derivatives, save_derivatives
+
+
+def _read(song):
+    with song.cover_image.open("rb") as f:
+        return f.read()
+
+
+class Command(BaseCommand):
+    help = "Tạo ảnh thu nhỏ WebP/JPEG cho ảnh bìa bài hát (chạy song song trên mọi CPU)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Tạo lại cả các bài đã có ảnh thu nhỏ")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Số process (mặc định: số CPU)")
+
+    def handle(self, *args, **options):
+        songs = Song.objects.exclude(cover_image="").exclude(cover_image__isnull=True)
+        if not options["all"]:
+            songs = songs.filter(cover_hash="")
+        songs = list(songs.only("id", "cover_image"))
+        if not songs:
+            self.stdout.write("Không có ảnh bìa cần xử lý.")
+            return
+
+        started = time.perf_counter()
+        done = failed = 0
+        batch_size = options["workers"] * 8  # giới hạn số ảnh gốc nằm trong bộ nhớ cùng lúc
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            for i in range(0, len(songs), batch_size):
+                futures = {}
+                for song in songs[i:i + batch_size]:
+                    try:
+                        futures[song] = pool.submit(build_derivatives, _read(song))
+                    except OSError as exc:
+                        failed += 1
+                        self.stderr.write(f"#{song.id} {song.cover_image.name}: {exc}")
+
+                for song, future in futures.items():
+                    try:
+                        cover_hash, files = future.result()
+                    except Exception as exc:  # ảnh hỏng / định dạng lạ
+                        failed += 1
+                        self.stderr.write(f"#{song.id} {song.cover_image.name}: {exc}")
+                        continue
+                    save_derivatives(default_storage, files)
+                    Song.objects.filter(pk=song.pk).update(cover_hash=cover_hash)
+                    done += 1
+        if done:
+            pagecache.bump("song")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xử lý {done} ảnh bìa ({failed} lỗi) trong {elapsed:.2f}s "
+            f"- {done / elapsed:.1f} ảnh/giây với {options['workers']} process"
+        ))
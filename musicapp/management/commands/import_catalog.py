@@ -0,0 +1,226 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from musicapp import facets, pagecache, search, tasks, typeahead
+from musicapp.models import Artist, Song
+from musicapp.storage import content_storage
+from musicapp.text import song_search_key
+
+# cột của manifest -> trường file của Song
+FILE_COLUMNS = {"audio": "audio_file", "cover": "cover_image"}
+
+
+def read_manifest(path, fmt):
+    """
+    Đọc manifest từng dòng (generator): (số thứ tự bản ghi, dict hoặc None nếu hỏng).
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            yield from enumerate(csv.DictReader(f), 1)
+            return
+        number = 0
+        for line in f:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class RowError(ValueError):
+    pass
+
+
+def parse_row(row, media_dir):
+    if row is None:
+        raise RowError("không đọc được dòng")
+    title = str(row.get("title") or "").strip()
+    artist = str(row.get("artist") or "").strip()
+    if not title or not artist:
+        raise RowError("thiếu title hoặc artist")
+    try:
+        duration = float(row["duration"]) if row.get("duration") not in (None, "") else None
+        released = date.fromisoformat(str(row["release_date"])) if row.get("release_date") else None
+    except ValueError as exc:
+        raise RowError(str(exc)) from exc
+    files = {}
+    for column, field in FILE_COLUMNS.items():
+        if row.get(column):
+            path = os.path.join(media_dir, str(row[column]))
+            if not os.path.isfile(path):
+                raise RowError(f"không thấy file {path}")
+            files[field] = path
+    return {
+        "title": title[:200],
+        "artist": artist[:100],
+        "genre": str(row.get("genre") or "").strip()[:50] or None,
+        "duration": duration,
+        "release_date": released,
+        "files": files,
+    }
+
+
+class Command(BaseCommand):
+    help = ("Nhập catalog bài hát từ manifest CSV / JSONL (title, artist, genre, duration, "
+            "release_date, audio, cover): bulk_create theo lô, chép file song song, chạy tiếp được")
+
+    def add_arguments(self, parser):
+        parser.add_argument("manifest", help="File .csv hoặc .jsonl")
+        parser.add_argument("--format", choices=["csv", "jsonl"],
+                            help="Mặc định theo đuôi file")
+        parser.add_argument("--media-dir",
+                            help="Thư mục gốc của đường dẫn audio / cover (mặc định: thư mục của manifest)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=8, help="Số thread chép file")
+        parser.add_argument("--checkpoint",
+                            help="File lưu vị trí đã nhập (mặc định: <manifest>.checkpoint)")
+        parser.add_argument("--restart", action="store_true", help="Bỏ qua checkpoint, đọc lại từ đầu")
+        parser.add_argument("--no-process", action="store_true",
+                            help="Không tạo job ảnh thu nhỏ / metadata / HLS cho bài mới")
+
+    def handle(self, *args, **options):
+        manifest = os.path.abspath(options["manifest"])
+        if not os.path.isfile(manifest):
+            raise CommandError(f"Không thấy manifest {manifest}")
+        fmt = options["format"] or ("jsonl" if manifest.endswith((".jsonl", ".ndjson")) else "csv")
+        self.media_dir = os.path.abspath(options["media_dir"] or os.path.dirname(manifest))
+        self.process = not options["no_process"]
+        checkpoint = options["checkpoint"] or f"{manifest}.checkpoint"
+
+        start_after = 0
+        if not options["restart"] and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                state = json.load(f)
+            if state.get("manifest") == manifest:
+                start_after = state["row"]
+                self.stdout.write(f"Tiếp tục sau bản ghi {start_after} (checkpoint {checkpoint})")
+
+        # tên nghệ sĩ -> id; tên trùng thì lấy nghệ sĩ tạo trước
+        self.artists = dict(Artist.objects.order_by("-id").values_list("name", "id").iterator(chunk_size=5000))
+        self.genres = {}  # chuỗi thể loại -> Genre
+        self.stats = dict.fromkeys(("rows", "created", "existing", "artists", "files", "errors"), 0)
+        rows = ((n, row) for n, row in read_manifest(manifest, fmt) if n > start_after)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for batch in batched(rows, options["batch_size"]):
+                self.import_batch(batch, pool)
+                self.save_checkpoint(checkpoint, manifest, batch[-1][0])
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"  bản ghi {batch[-1][0]}: {self.stats['created']} bài mới, "
+                                  f"{self.stats['rows'] / elapsed:.0f} dòng/giây")
+
+        if self.stats["created"]:
+            pagecache.bump("song")
+            typeahead.bump_generation()
+        if self.stats["artists"]:
+            pagecache.bump("artist")
+        # đã nhập hết -> lần chạy sau đọc lại từ đầu (bài đã có được bỏ qua)
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        elapsed = time.perf_counter() - started
+        s = self.stats
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã đọc {s['rows']} dòng trong {elapsed:.2f}s ({s['rows'] / max(elapsed, 1e-9):.0f} dòng/giây): "
+            f"{s['created']} bài mới, {s['existing']} bài đã có, {s['artists']} nghệ sĩ mới, "
+            f"{s['files']} file đã chép, {s['errors']} dòng lỗi"
+        ))
+
+    def save_checkpoint(self, path, manifest, row):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"manifest": manifest, "row": row}, f)
+        os.replace(tmp, path)
+
+    def import_batch(self, batch, pool):
+        self.stats["rows"] += len(batch)
+        records = {}
+        for number, row in batch:
+            try:
+                record = parse_row(row, self.media_dir)
+            except RowError as exc:
+                self.stats["errors"] += 1
+                self.stderr.write(f"Bản ghi {number}: {exc}")
+                continue
+            # (nghệ sĩ, tên bài) là khóa tự nhiên: chạy lại không tạo bản trùng
+            records.setdefault((record["artist"], record["title"]), record)
+
+        known = {self.artists[a] for a, _ in records if a in self.artists}
+        existing = set(Song.objects.filter(artist_id__in=known, title__in={t for _, t in records})
+                       .values_list("artist_id", "title"))
+        new = [r for (a, t), r in records.items() if (self.artists.get(a), t) not in existing]
+        self.stats["existing"] += len(records) - len(new)
+        if not new:
+            return
+
+        # chép file (I/O) song song, chưa đụng DB
+        copies = [(r, field, path) for r in new for field, path in r["files"].items()]
+        directories = {f: Song._meta.get_field(f).upload_to.strip("/") for f in FILE_COLUMNS.values()}
+        futures = [pool.submit(content_storage.copy_file, path, directories[field]) for _, field, path in copies]
+        failed = set()
+        sizes = {}
+        sources = {}
+        for (record, field, path), future in zip(copies, futures):
+            try:
+                name, size = future.result()
+            except OSError as exc:
+                failed.add(id(record))
+                self.stderr.write(f"{path}: {exc}")
+                continue
+            record[field] = name
+            sizes[name] = size
+            sources[name] = (path, directories[field])
+            self.stats["files"] += 1
+        new = [r for r in new if id(r) not in failed]
+        self.stats["errors"] += len(failed)
+
+        names = {r["artist"] for r in new if r["artist"] not in self.artists}
+        for genre in {r["genre"] for r in new} - set(self.genres):
+            self.genres[genre] = facets.genre_for(genre)
+        with transaction.atomic():
+            created_artists = Artist.objects.bulk_create([Artist(name=name) for name in sorted(names)])
+            artist_ids = {**self.artists, **{a.name: a.pk for a in created_artists}}
+            songs = [
+                Song(title=r["title"], artist_id=artist_ids[r["artist"]], genre=r["genre"],
+                     genre_ref=self.genres[r["genre"]],
+                     duration=r["duration"], release_date=r["release_date"],
+                     audio_file=r.get("audio_file"), cover_image=r.get("cover_image"),
+                     search_key=song_search_key(r["title"], r["artist"]))
+                for r in new
+            ]
+            Song.objects.bulk_create(songs, batch_size=500)
+            search.index_songs((song.pk, song.search_key) for song in songs)
+            refs = Counter(getattr(song, f).name for song in songs for f in FILE_COLUMNS.values()
+                           if getattr(song, f).name)
+            content_storage.add_refs({name: (sizes[name], count) for name, count in refs.items()})
+            # bulk_create không gửi post_save -> tự cộng bộ đếm của thể loại / nghệ sĩ
+            facets.adjust(genres=Counter(s.genre_ref_id for s in songs),
+                          songs=Counter(s.artist_id for s in songs))
+            if self.process:
+                tasks.enqueue_imported(songs)
+        # blob bị delete() đồng thời xóa sau khi chép (file đã có nên không ghi) -> chép lại
+        for name in refs:
+            if not content_storage.exists(name):
+                content_storage.copy_file(*sources[name])
+        self.artists = artist_ids
+        self.stats["artists"] += len(created_artists)
+        self.stats["created"] += len(songs)
@@ -0,0 +1,68 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from musicapp import pagecache
+from musicapp.audiometa import genre_added, ingest_song, probe_path, song_fields
+from musicapp.models import Song
+
+
+class Command(BaseCommand):
+    help = "Đọc thời lượng / bitrate / sample rate từ file nhạc của các bài hát (chạy song song)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Đọc lại cả các bài đã có thời lượng")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Số process (mặc định: số CPU)")
+
+    def handle(self, *args, **options):
+        songs = Song.objects.exclude(audio_file="").exclude(audio_file__isnull=True)
+        if not options["all"]:
+            songs = songs.filter(duration_seconds__isnull=True)
+        songs = list(songs.only("id", "audio_file", "duration", "genre"))
+        if not songs:
+            self.stdout.write("Không có file nhạc cần xử lý.")
+            return
+
+        # file trên đĩa -> xử lý trong process pool; storage khác -> đọc tuần tự qua storage
+        local, remote = {}, []
+        for song in songs:
+            try:
+                local[song] = song.audio_file.path
+            except NotImplementedError:
+                remote.append(song)
+
+        started = time.perf_counter()
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = {song: pool.submit(probe_path, path) for song, path in local.items()}
+            for song, future in futures.items():
+                try:
+                    meta = future.result()
+                except Exception as exc:  # file hỏng / không phải MP3
+                    failed += 1
+                    self.stderr.write(f"#{song.id} {song.audio_file.name}: {exc}")
+                    continue
+                fields = song_fields(meta, song)
+                Song.objects.filter(pk=song.pk).update(**fields)
+                genre_added(fields)
+                done += 1
+
+        for song in remote:
+            try:
+                ingest_song(song)
+                done += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"#{song.id} {song.audio_file.name}: {exc}")
+        if done:
+            pagecache.bump("song")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã đọc {done} file ({failed} lỗi) trong {elapsed:.2f}s "
+            f"- {done / elapsed:.1f} file/giây với {options['workers']} process"
+        ))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from musicapp import facets
+from musicapp.models import Artist, Genre
+
+
+class Command(BaseCommand):
+    help = "Đếm lại số bài theo thể loại, số bài / lượt yêu thích theo nghệ sĩ (sửa sai lệch bộ đếm)"
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        facets.recount()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã đếm lại {Genre.objects.count()} thể loại, {Artist.objects.count()} nghệ sĩ trong {elapsed:.2f}s"
+        ))
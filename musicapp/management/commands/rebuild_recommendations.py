@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from musicapp import jobs, recommend, tasks
+
+
+class Command(BaseCommand):
+    help = "Tính lại bảng bài hát tương tự (gợi ý) từ yêu thích và playlist - chạy hằng đêm"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=recommend.TOP_K,
+                            help="Số bài tương tự giữ cho mỗi bài")
+        parser.add_argument("--enqueue", action="store_true",
+                            help="Đưa vào hàng đợi job (run_workers) thay vì chạy ngay; mỗi ngày một lần")
+
+    def handle(self, *args, **options):
+        if options["enqueue"]:
+            job = jobs.enqueue(tasks.rebuild_recommendations, priority=-10,
+                               key=f"recommend:{timezone.localdate().isoformat()}")
+            self.stdout.write(f"Job #{job.pk} ({job.status}).")
+            return
+
+        started = time.perf_counter()
+        table = recommend.rebuild(k=options["top_k"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã tính top {options['top_k']} bài tương tự cho {len(table)} bài hát "
+            f"trong {elapsed:.2f}s -> {recommend.table_path()}"
+        ))
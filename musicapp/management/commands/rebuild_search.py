@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from musicapp import search
+
+
+class Command(BaseCommand):
+    help = "Dựng lại chỉ mục từ khóa tìm kiếm (SongToken) từ tên bài hát / nghệ sĩ"
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = search.reindex()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(f"Đã dựng lại từ khóa của {count} bài hát trong {elapsed:.2f}s"))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from musicapp import typeahead
+
+
+class Command(BaseCommand):
+    help = "Nạp lại chỉ mục gợi ý tìm kiếm (typeahead) từ database"
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        typeahead.index.rebuild()
+        typeahead.bump_generation()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã nạp {len(typeahead.index.songs)} bài hát, "
+            f"{len(typeahead.index.artists)} nghệ sĩ trong {elapsed:.2f}s"
+        ))
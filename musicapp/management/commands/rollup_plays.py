@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from musicapp import jobs, plays, tasks
+
+
+class Command(BaseCommand):
+    help = "Cộng dồn lượt nghe mới vào bộ đếm SongStats (thịnh hành / nghe nhiều) - chạy mỗi phút"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=plays.ROLLUP_BATCH,
+                            help="Số lượt nghe xử lý trong một transaction")
+        parser.add_argument("--enqueue", action="store_true",
+                            help="Đưa vào hàng đợi job (run_workers) thay vì chạy ngay; mỗi phút một lần")
+
+    def handle(self, *args, **options):
+        if options["enqueue"]:
+            minute = timezone.now().strftime("%Y%m%d%H%M")
+            job = jobs.enqueue(tasks.rollup_plays, priority=1, key=f"plays:{minute}")
+            self.stdout.write(f"Job #{job.pk} ({job.status}).")
+            return
+
+        started = time.perf_counter()
+        total = plays.rollup(batch=options["batch"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Đã cộng dồn {total} lượt nghe trong {elapsed:.2f}s."))
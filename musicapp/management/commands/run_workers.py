@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _worker_main(index, poll_interval, burst, batch):
+    # process con (spawn trên Windows) phải tự khởi tạo Django
+    import django
+    django.setup()
+    from musicapp import jobs
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+    worker_id = f"{jobs.default_worker_id()}/{index}"
+    jobs.work(worker_id, poll_interval=poll_interval, burst=burst, batch=batch,
+              should_stop=lambda: bool(stopping))
+
+
+class Command(BaseCommand):
+    help = "Chạy N process worker xử lý hàng đợi job trong DB (musicapp.jobs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Số process worker (mặc định: số CPU)")
+        parser.add_argument("--poll", type=float, default=1.0,
+                            help="Số giây chờ khi hàng đợi trống")
+        parser.add_argument("--batch", type=int, default=1,
+                            help="Số job mỗi worker nhận một lần (tăng cho job ngắn)")
+        parser.add_argument("--burst", action="store_true",
+                            help="Dừng khi đã chạy hết job đến hạn")
+        parser.add_argument("--purge-days", type=int, default=7,
+                            help="Xóa job xong / lỗi cũ hơn số ngày này khi khởi động (0: không xóa)")
+
+    def handle(self, *args, **options):
+        from musicapp import jobs
+
+        if options["purge_days"]:
+            purged = jobs.purge(timedelta(days=options["purge_days"]))
+            if purged:
+                self.stdout.write(f"Đã xóa {purged} job cũ.")
+
+        # không để process con dùng chung kết nối DB của process cha
+        connections.close_all()
+        started = time.perf_counter()
+        workers = [
+            multiprocessing.Process(target=_worker_main, args=(i, options["poll"], options["burst"], options["batch"]),
+                                    name=f"musicapp-worker-{i}")
+            for i in range(options["workers"])
+        ]
+        for process in workers:
+            process.start()
+        self.stdout.write(f"Đã khởi động {len(workers)} worker (Ctrl+C để dừng sau job đang chạy).")
+
+        try:
+            for process in workers:
+                process.join()
+        except KeyboardInterrupt:
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()  # SIGTERM: worker dừng sau job hiện tại
+            for process in workers:
+                process.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Các worker đã dừng sau {time.perf_counter() - started:.1f}s."))
@@ -0,0 +1,57 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from musicapp.models import Song
+from musicapp.transcode import ffmpeg_binary, rendition_dir, save_renditions, transcode_file
+
+
+class Command(BaseCommand):
+    help = "Tạo bản HLS nhiều bitrate cho các bài hát (chạy song song)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Tạo lại cả các bài đã có bản HLS")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Số process (mặc định: số CPU)")
+
+    def handle(self, *args, **options):
+        songs = Song.objects.exclude(audio_file="").exclude(audio_file__isnull=True)
+        if not options["all"]:
+            songs = songs.filter(renditions__isnull=True)
+        songs = list(songs.only("id", "audio_file", "bitrate"))
+        if not songs:
+            self.stdout.write("Không có bài hát cần tạo bản HLS.")
+            return
+
+        ffmpeg = ffmpeg_binary()
+        if not ffmpeg:
+            self.stdout.write(self.style.WARNING(
+                "Không tìm thấy ffmpeg: chỉ cắt file MP3 gốc thành segment (một bậc bitrate)."))
+
+        started = time.perf_counter()
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = {}
+            for song in songs:
+                path = rendition_dir(song)
+                futures[song, path] = pool.submit(
+                    transcode_file, song.audio_file.path, default_storage.path(path), song.bitrate, ffmpeg)
+            for (song, path), future in futures.items():
+                try:
+                    results = future.result()
+                except Exception as exc:  # file hỏng / ffmpeg lỗi
+                    failed += 1
+                    self.stderr.write(f"#{song.id} {song.audio_file.name}: {exc}")
+                    continue
+                save_renditions(song, path, results)
+                done += 1
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã tạo bản HLS cho {done} bài hát ({failed} lỗi) trong {elapsed:.2f}s "
+            f"với {options['workers']} process"
+        ))
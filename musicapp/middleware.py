@@ -0,0 +1,92 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import perf
+
+
+# =========================
+# WhiteNoise chạy được cả WSGI lẫn ASGI
+# =========================
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware khai báo được gọi từ event loop.
+
+    Middleware gốc chỉ sync: dưới ASGI, Django phải bọc mọi view async phía
+    sau nó vào thread (thread_sensitive, một thread cho cả process) nên các
+    view async lại chạy tuần tự. Tra file tĩnh chỉ là đọc dict trong bộ nhớ
+    nên làm thẳng trên event loop được.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # DEBUG: tìm file trên đĩa
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+# =========================
+# Đo thời gian / query / cache / HTTP ra ngoài theo view
+# =========================
+class PerfMiddleware:
+    """
+    Ghi số liệu từng request vào musicapp.perf.registry (xem /metrics, /perf/).
+
+    Đặt đầu MIDDLEWARE để tính cả thời gian của các middleware khác. Không dùng
+    process_view: dưới ASGI Django sẽ bọc nó vào sync_to_async; tên view đọc từ
+    request.resolver_match sau khi có response.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PERF_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, "PERF_SLOW_REQUEST_MS", 500)
+        self.slow_queries = getattr(settings, "PERF_SLOW_QUERY_COUNT", 50)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = perf.RequestStats()
+        token = perf.current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            perf.current.reset(token)
+        perf.finish(request, response, stats, self.slow_ms, self.slow_queries)
+        return response
+
+    async def __acall__(self, request):
+        stats = perf.RequestStats()
+        token = perf.current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            perf.current.reset(token)
+        perf.finish(request, response, stats, self.slow_ms, self.slow_queries)
+        return response
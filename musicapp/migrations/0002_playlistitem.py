@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaylistItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='musicapp.playlist')),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='musicapp.song')),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+                'indexes': [models.Index(fields=['playlist', 'position'], name='playlist_item_position_idx')],
+                'constraints': [models.UniqueConstraint(fields=('playlist', 'song'), name='unique_playlist_song')],
+            },
+        ),
+    ]
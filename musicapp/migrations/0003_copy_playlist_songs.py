@@ -0,0 +1,53 @@
+from django.db import migrations
+
+
+def entry_song_id(entry):
+    # create_and_add_playlist lưu ID dạng số, add_to_playlist lưu dict {"id": ...}
+    if isinstance(entry, dict):
+        entry = entry.get('id')
+    try:
+        return int(entry)
+    except (TypeError, ValueError):
+        return None
+
+
+def copy_playlist_songs(apps, schema_editor):
+    Playlist = apps.get_model('musicapp', 'Playlist')
+    PlaylistItem = apps.get_model('musicapp', 'PlaylistItem')
+    Song = apps.get_model('musicapp', 'Song')
+
+    existing_ids = set(Song.objects.values_list('id', flat=True))
+    for playlist in Playlist.objects.all().iterator():
+        items = []
+        seen = set()
+        for entry in playlist.songs or []:
+            song_id = entry_song_id(entry)
+            if song_id is None or song_id in seen or song_id not in existing_ids:
+                continue
+            seen.add(song_id)
+            items.append(PlaylistItem(playlist_id=playlist.id, song_id=song_id, position=len(items)))
+        PlaylistItem.objects.bulk_create(items, batch_size=1000)
+
+
+def copy_items_back(apps, schema_editor):
+    Playlist = apps.get_model('musicapp', 'Playlist')
+    PlaylistItem = apps.get_model('musicapp', 'PlaylistItem')
+
+    for playlist in Playlist.objects.all().iterator():
+        playlist.songs = list(
+            PlaylistItem.objects.filter(playlist_id=playlist.id)
+            .order_by('position', 'id')
+            .values_list('song_id', flat=True)
+        )
+        playlist.save(update_fields=['songs'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0002_playlistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_playlist_songs, copy_items_back),
+    ]
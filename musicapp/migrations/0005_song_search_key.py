@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+from musicapp.text import song_search_key
+
+
+def fill_search_key(apps, schema_editor):
+    Song = apps.get_model('musicapp', 'Song')
+    songs = []
+    for song in Song.objects.select_related('artist').iterator(chunk_size=1000):
+        song.search_key = song_search_key(song.title, song.artist.name)
+        songs.append(song)
+        if len(songs) >= 1000:
+            Song.objects.bulk_update(songs, ['search_key'])
+            songs = []
+    Song.objects.bulk_update(songs, ['search_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0004_remove_playlist_songs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='search_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=400),
+        ),
+        migrations.RunPython(fill_search_key, migrations.RunPython.noop),
+    ]
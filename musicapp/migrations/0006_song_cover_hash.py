@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0005_song_search_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='cover_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+    ]
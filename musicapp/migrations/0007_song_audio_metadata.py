@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0006_song_cover_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='bitrate',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='kbps', null=True),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='sample_rate',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Hz', null=True),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+from collections import Counter
+
+import musicapp.storage
+from django.db import migrations, models
+
+
+def track_existing_files(apps, schema_editor):
+    """
+    MediaBlob cho các file bài hát đã có, refs = số tham chiếu hiện tại: nếu
+    không, xóa / thay file của một bài sẽ xóa luôn file mà bài khác đang dùng.
+    """
+    Song = apps.get_model('musicapp', 'Song')
+    MediaBlob = apps.get_model('musicapp', 'MediaBlob')
+    storage = musicapp.storage.content_storage
+    refs = Counter()
+    for names in Song.objects.values_list('audio_file', 'cover_image').iterator(chunk_size=2000):
+        refs.update(name for name in names if name)
+    blobs = []
+    for name, count in refs.items():
+        try:
+            size = storage.size(name)
+        except OSError:
+            size = 0
+        blobs.append(MediaBlob(name=name, size=size, refs=count))
+    MediaBlob.objects.bulk_create(blobs, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0007_song_audio_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('refs', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='song',
+            name='audio_file',
+            field=models.FileField(blank=True, help_text='Tải lên file MP3 của bài hát', null=True, storage=musicapp.storage.get_content_storage, upload_to='audio/'),
+        ),
+        migrations.AlterField(
+            model_name='song',
+            name='cover_image',
+            field=models.ImageField(blank=True, help_text='Ảnh bìa bài hát', null=True, storage=musicapp.storage.get_content_storage, upload_to='song_covers/'),
+        ),
+        migrations.RunPython(track_existing_files, migrations.RunPython.noop),
+    ]
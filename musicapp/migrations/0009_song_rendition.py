@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0008_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bitrate', models.PositiveIntegerField(help_text='kbps')),
+                ('codecs', models.CharField(max_length=50)),
+                ('segment_ext', models.CharField(max_length=4)),
+                ('path', models.CharField(max_length=255)),
+                ('durations', models.JSONField(default=list, help_text='Độ dài từng segment (giây)')),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='musicapp.song')),
+            ],
+            options={
+                'ordering': ['song', 'bitrate'],
+                'constraints': [models.UniqueConstraint(fields=('song', 'bitrate'), name='unique_song_rendition')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:56
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0011_play_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='song',
+            name='title',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-added_at'], name='favorite_user_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playlist',
+            index=models.Index(fields=['user', 'created_at'], name='playlist_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(django.db.models.functions.text.Lower('genre'), name='song_genre_lower_idx'),
+        ),
+    ]
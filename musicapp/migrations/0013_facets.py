@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+from musicapp.text import fold_text
+
+
+def fill_facets(apps, schema_editor):
+    Artist = apps.get_model('musicapp', 'Artist')
+    Favorite = apps.get_model('musicapp', 'Favorite')
+    Genre = apps.get_model('musicapp', 'Genre')
+    Song = apps.get_model('musicapp', 'Song')
+
+    # tên viết đầu tiên (theo id bài hát) làm tên hiển thị của thể loại
+    genres = {}
+    for name in Song.objects.exclude(genre__isnull=True).exclude(genre='').order_by('id') \
+            .values_list('genre', flat=True).iterator(chunk_size=2000):
+        genres.setdefault(fold_text(name)[:50], name.strip()[:50])
+    Genre.objects.bulk_create([Genre(key=key, name=name) for key, name in genres.items() if key])
+    ids = dict(Genre.objects.values_list('key', 'id'))
+    for name in set(Song.objects.exclude(genre__isnull=True).values_list('genre', flat=True)):
+        if fold_text(name)[:50] in ids:
+            Song.objects.filter(genre=name).update(genre_ref_id=ids[fold_text(name)[:50]])
+
+    for genre_id, n in Song.objects.filter(genre_ref__isnull=False).values_list('genre_ref').annotate(n=Count('id')):
+        Genre.objects.filter(pk=genre_id).update(song_count=n)
+    for artist_id, n in Song.objects.values_list('artist').annotate(n=Count('id')):
+        Artist.objects.filter(pk=artist_id).update(song_count=n)
+    for artist_id, n in Favorite.objects.values_list('song__artist').annotate(n=Count('id')):
+        Artist.objects.filter(pk=artist_id).update(favorite_count=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0012_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('song_count', models.IntegerField(db_index=True, default=0, editable=False)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='song',
+            name='song_genre_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='favorite_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='song_count',
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='genre_ref',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='songs', to='musicapp.genre'),
+        ),
+        migrations.RunPython(fill_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from musicapp.text import search_tokens
+
+
+def fill_tokens(apps, schema_editor):
+    Song = apps.get_model('musicapp', 'Song')
+    SongToken = apps.get_model('musicapp', 'SongToken')
+    tokens = []
+    for pk, key in Song.objects.order_by('id').values_list('id', 'search_key').iterator(chunk_size=2000):
+        tokens.extend(SongToken(song_id=pk, token=token) for token in search_tokens(key))
+        if len(tokens) >= 5000:
+            SongToken.objects.bulk_create(tokens)
+            tokens = []
+    SongToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0013_facets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SongToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=50)),
+                ('song', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='musicapp.song')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'song'], name='songtoken_token_song_idx')],
+                'constraints': [models.UniqueConstraint(fields=('song', 'token'), name='unique_song_token')],
+            },
+        ),
+        migrations.RunPython(fill_tokens, migrations.RunPython.noop),
+    ]
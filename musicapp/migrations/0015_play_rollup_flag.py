@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def carry_over(apps, schema_editor):
+    PlayEvent = apps.get_model('musicapp', 'PlayEvent')
+    PlayRollup = apps.get_model('musicapp', 'PlayRollup')
+    Song = apps.get_model('musicapp', 'Song')
+    SongStats = apps.get_model('musicapp', 'SongStats')
+
+    # các lượt đã cộng theo mốc id cũ
+    state = PlayRollup.objects.filter(pk=1).first()
+    if state is not None:
+        PlayEvent.objects.filter(id__lte=state.last_event_id).update(rolled_up=True)
+    songs = [Song(id=song_id, play_count=plays)
+             for song_id, plays in SongStats.objects.filter(plays__gt=0).values_list('song_id', 'plays')]
+    Song.objects.bulk_update(songs, ['play_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musicapp', '0014_song_tokens'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playevent',
+            name='rolled_up',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='play_count',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(carry_over, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='playrollup',
+            name='last_event_id',
+        ),
+        migrations.AddIndex(
+            model_name='playevent',
+            index=models.Index(condition=models.Q(('rolled_up', False)), fields=['id'], name='playevent_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['-play_count', 'id'], name='song_popular_idx'),
+        ),
+    ]
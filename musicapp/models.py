@@ -2,12 +2,57 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from .storage import get_content_storage
+from .text import song_search_key
+
 # =========================
 # ARTIST
 # =========================
 class Artist(models.Model):
     name = models.CharField(max_length=100)
     country = models.CharField(max_length=50, blank=True, null=True)
+    # bộ đếm phi chuẩn hóa, cập nhật dần qua signal (musicapp.facets)
+    song_count = models.IntegerField(default=0, db_index=True, editable=False)
+    favorite_count = models.IntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # tên lúc nạp -> save() chỉ ghi lại search_key của bài hát khi tên đổi
+        instance._loaded_name = instance.__dict__.get('name')
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if adding or (update_fields is not None and 'name' not in update_fields):
+            return
+        if getattr(self, '_loaded_name', None) == self.name:
+            return
+        self._loaded_name = self.name
+        # Tên nghệ sĩ nằm trong search_key của bài hát -> cập nhật lại
+        songs = list(self.song_set.only('id', 'title'))
+        for song in songs:
+            song.search_key = song_search_key(song.title, self.name)
+        Song.objects.bulk_update(songs, ['search_key'], batch_size=500)
+        from .search import index_songs
+        index_songs((song.id, song.search_key) for song in songs)
+
+# =========================
+# GENRE
+# =========================
+class Genre(models.Model):
+    """
+    Thể loại đã chuẩn hóa: Song.genre (nhập tay, viết hoa / có dấu tùy ý) trỏ về
+    một dòng theo key = fold_text(genre). Xem musicapp.facets.
+    """
+    name = models.CharField(max_length=50)
+    key = models.CharField(max_length=50, unique=True)
+    song_count = models.IntegerField(default=0, db_index=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -17,27 +62,121 @@ class Artist(models.Model):
 # =========================
 class Song(models.Model):
     id = models.AutoField(primary_key=True)
-    title = models.CharField(max_length=200)
+    title = models.CharField(max_length=200, db_index=True)
     artist = models.ForeignKey(Artist, on_delete=models.CASCADE)
     genre = models.CharField(max_length=50, blank=True, null=True)
+    genre_ref = models.ForeignKey(Genre, on_delete=models.SET_NULL, blank=True, null=True,
+                                  related_name='songs', editable=False)
     duration = models.FloatField(help_text="Độ dài (phút)", blank=True, null=True)
     release_date = models.DateField(blank=True, null=True)
     audio_file = models.FileField(
         upload_to='audio/',
+        storage=get_content_storage,
         blank=True,
         null=True,
         help_text="Tải lên file MP3 của bài hát"
     )
     cover_image = models.ImageField(
         upload_to='song_covers/',
+        storage=get_content_storage,
         blank=True,
         null=True,
         help_text="Ảnh bìa bài hát"
     )
+    # Tên bài hát + nghệ sĩ đã bỏ dấu, dùng cho tìm kiếm (xem musicapp.search)
+    search_key = models.CharField(max_length=400, blank=True, default='', db_index=True, editable=False)
+    # Đọc từ header file MP3 khi tải lên (xem musicapp.audiometa)
+    duration_seconds = models.FloatField(blank=True, null=True, db_index=True, editable=False)
+    bitrate = models.PositiveIntegerField(help_text="kbps", blank=True, null=True, editable=False)
+    sample_rate = models.PositiveIntegerField(help_text="Hz", blank=True, null=True, editable=False)
+    # Hash nội dung ảnh bìa, dùng đặt tên ảnh thu nhỏ (xem musicapp.thumbnails)
+    cover_hash = models.CharField(max_length=32, blank=True, default='', editable=False)
+    # bản sao SongStats.plays để sắp "phổ biến" theo index, không qua LEFT JOIN (job
+    # cộng dồn ghi giá trị tuyệt đối nên lần save() ghi đè giá trị cũ sẽ được sửa ở lượt sau)
+    play_count = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-play_count', 'id'], name='song_popular_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    MEDIA_FIELDS = ('audio_file', 'cover_image')
+    FACET_FIELDS = ('artist_id', 'genre', 'genre_ref_id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # tên file lúc nạp từ DB -> biết blob cũ cần bỏ tham chiếu khi đổi file
+        instance._media_names = {
+            name: getattr(instance, name).name
+            for name in cls.MEDIA_FIELDS if name in instance.__dict__
+        }
+        # nghệ sĩ / thể loại lúc nạp -> signal biết bộ đếm nào cần trừ (musicapp.facets)
+        instance._facet_state = {f: instance.__dict__[f] for f in cls.FACET_FIELDS if f in instance.__dict__}
+        # search_key lúc nạp -> signal chỉ ghi lại SongToken khi khóa đổi (musicapp.search)
+        instance._indexed_key = instance.__dict__.get('search_key')
+        return instance
+
+    def release_media(self, names):
+        """
+        Bỏ tham chiếu tới các blob (musicapp.storage); file chỉ bị xóa khi không còn ai dùng.
+        """
+        for field, name in names.items():
+            if name:
+                self._meta.get_field(field).storage.delete(name)
+
+    def save(self, *args, **kwargs):
+        self.search_key = song_search_key(self.title, self.artist.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'search_key' not in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'search_key'}
+        if update_fields is None or 'genre' in update_fields:
+            loaded = getattr(self, '_facet_state', {})
+            if 'genre' not in loaded or loaded['genre'] != self.genre:
+                from .facets import genre_for
+                self.genre_ref = genre_for(self.genre)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'genre_ref'}
+        # ảnh bìa mới tải lên (chưa ghi vào storage) -> ảnh thu nhỏ cũ không còn đúng
+        self.cover_changed = bool(self.cover_image) and not self.cover_image._committed
+        if self.cover_changed or not self.cover_image:
+            self.cover_hash = ''
+        self.audio_changed = bool(self.audio_file) and not self.audio_file._committed
+        super().save(*args, **kwargs)
+
+        loaded = getattr(self, '_media_names', {})
+        replaced = {
+            field: name for field, name in loaded.items()
+            if name and getattr(self, field).name != name
+        }
+        self._media_names = {**loaded, **{f: getattr(self, f).name for f in self.MEDIA_FIELDS}}
+        self.release_media(replaced)
+
+# =========================
+# SONG TOKEN (tìm kiếm)
+# =========================
+class SongToken(models.Model):
+    """
+    Một từ của Song.search_key. Tìm theo tiền tố từng từ quét một khoảng của
+    index (token, song) thay vì LIKE '%...%' trên cả bảng (xem musicapp.search).
+    """
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='tokens', db_index=False)
+    token = models.CharField(max_length=50)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['song', 'token'], name='unique_song_token'),
+        ]
+        indexes = [
+            models.Index(fields=['token', 'song'], name='songtoken_token_song_idx'),
+        ]
+
+    def __str__(self):
+        return self.token
+
 # =========================
 # FAVORITE
 # =========================
@@ -48,6 +187,9 @@ class Favorite(models.Model):
 
     class Meta:
         unique_together = ('user', 'song')
+        indexes = [
+            models.Index(fields=['user', '-added_at'], name='favorite_user_added_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} ❤️ {self.song.title}"
@@ -59,12 +201,40 @@ class Playlist(models.Model):
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
-    songs = models.JSONField(default=list)  # danh sách bài hát lưu dạng JSON
     created_at = models.DateTimeField(default=timezone.now)  # thêm field created_at
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='playlist_user_created_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+# =========================
+# PLAYLIST ITEM
+# =========================
+class PlaylistItem(models.Model):
+    """
+    Một bài hát trong playlist; thứ tự phát theo position.
+    """
+    playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, related_name='items')
+    song = models.ForeignKey(Song, on_delete=models.CASCADE)
+    position = models.PositiveIntegerField()
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['position', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['playlist', 'song'], name='unique_playlist_song'),
+        ]
+        indexes = [
+            models.Index(fields=['playlist', 'position'], name='playlist_item_position_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.playlist.name} #{self.position}: {self.song.title}"
+
 # =========================
 # SUBSCRIPTION
 # =========================
@@ -88,3 +258,150 @@ class Subscription(models.Model):
         Kiểm tra xem gói Premium còn hiệu lực hay không.
         """
         return self.is_active and self.end_date and self.end_date > timezone.now()
+
+# =========================
+# MEDIA BLOB
+# =========================
+class MediaBlob(models.Model):
+    """
+    Một file trong storage theo hash nội dung (musicapp.storage) và số bản ghi đang dùng nó.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    refs = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.refs})"
+
+# =========================
+# RENDITION (HLS)
+# =========================
+class Rendition(models.Model):
+    """
+    Một bậc bitrate HLS của bài hát: các segment nằm trong MEDIA_ROOT/<path>/.
+    """
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='renditions')
+    bitrate = models.PositiveIntegerField(help_text="kbps")
+    codecs = models.CharField(max_length=50)
+    segment_ext = models.CharField(max_length=4)
+    path = models.CharField(max_length=255)
+    durations = models.JSONField(default=list, help_text="Độ dài từng segment (giây)")
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['song', 'bitrate']
+        constraints = [
+            models.UniqueConstraint(fields=['song', 'bitrate'], name='unique_song_rendition'),
+        ]
+
+    def __str__(self):
+        return f"{self.song.title} @ {self.bitrate} kbps"
+
+    def segment_path(self, index):
+        return f"{self.path}/{index:05d}.{self.segment_ext}"
+
+    def preview_durations(self, max_seconds):
+        """
+        Các segment bắt đầu trước max_seconds (phần được nghe thử).
+        """
+        durations, start = [], 0.0
+        for duration in self.durations:
+            if start >= max_seconds:
+                break
+            durations.append(duration)
+            start += duration
+        return durations
+
+# =========================
+# JOB (hàng đợi nền)
+# =========================
+class Job(models.Model):
+    """
+    Một việc chạy nền (musicapp.jobs) do lệnh run_workers lấy ra và thực hiện.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Đang chờ'),
+        (RUNNING, 'Đang chạy'),
+        (DONE, 'Xong'),
+        (FAILED, 'Lỗi'),
+    ]
+
+    task = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0, help_text="Lớn hơn chạy trước")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+# =========================
+# LƯỢT NGHE
+# =========================
+class PlayEvent(models.Model):
+    """
+    Một lượt nghe; được ghi theo lô (musicapp.plays) và cộng dồn vào SongStats.
+
+    Bảng log ghi nhiều nên không đặt ràng buộc khóa ngoại ở DB; bài đã xóa
+    được bỏ qua khi cộng dồn.
+    """
+    SOURCE_CHOICES = [
+        ('player', 'Trình phát'),
+        ('audius', 'Audius'),
+    ]
+
+    song = models.ForeignKey(Song, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False,
+                             null=True, blank=True, related_name='+')
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='player')
+    played_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # đã cộng vào SongStats chưa: id không theo thứ tự commit nên không dùng mốc id
+    rolled_up = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(rolled_up=False), name='playevent_pending_idx'),
+        ]
+
+
+class SongStats(models.Model):
+    """
+    Bộ đếm lượt nghe của bài hát, cập nhật dần bởi job cộng dồn.
+
+    trend_24h / trend_7d là tổng exp((t - mốc) / τ) của các lượt nghe (mốc
+    lưu ở PlayRollup): so sánh được giữa các bài mà không phải giảm dần mọi
+    dòng theo thời gian; plays.decayed() đổi ra số lượt nghe hiện tại.
+    """
+    song = models.OneToOneField(Song, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    plays = models.BigIntegerField(default=0, db_index=True)
+    trend_24h = models.FloatField(default=0, db_index=True)
+    trend_7d = models.FloatField(default=0, db_index=True)
+    last_played_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.song_id}: {self.plays}"
+
+
+class PlayRollup(models.Model):
+    """
+    Trạng thái job cộng dồn (một dòng): mốc thời gian của trend; khóa dòng này
+    để hai job không cộng trùng.
+    """
+    epoch = models.DateTimeField(default=timezone.now)
@@ -0,0 +1,111 @@
+import hashlib
+import time
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+PAGE_TTL = 10 * 60
+FRAGMENT_TTL = 60 * 60
+
+# phiên bản dùng chung: cả danh mục đổi khi Song / Artist / bộ đếm lượt nghe đổi
+CATALOG = (("song", None), ("artist", None), ("stats", None))
+
+
+# =========================
+# Phiên bản theo model
+# =========================
+def _version_key(name, scope=None):
+    return f"cachever:{name}" if scope is None else f"cachever:{name}:{scope}"
+
+
+def bump(name, scope=None):
+    """
+    Đổi phiên bản của name (theo scope, vd. user id) -> mọi key dựng từ nó hết hiệu lực.
+
+    Gọi từ musicapp.signals và những chỗ ghi thẳng bằng update() (không có signal).
+    """
+    cache.set(_version_key(name, scope), time.time_ns(), None)
+
+
+def versions(*specs):
+    """
+    Chuỗi ghép phiên bản hiện tại của các (name, scope); một lần get_many.
+    """
+    keys = [_version_key(name, scope) for name, scope in specs]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    for key, value in missing.items():
+        # tiến trình khác có thể vừa khởi tạo -> đọc lại giá trị thắng
+        if not cache.add(key, value, None):
+            missing[key] = cache.get(key, value)
+    found.update(missing)
+    return ".".join(str(found[key]) for key in keys)
+
+
+def user_scopes(user, *names):
+    return tuple((name, user.pk) for name in names) if user.is_authenticated else ()
+
+
+def _digest(*parts):
+    return hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()
+
+
+# =========================
+# Fragment
+# =========================
+def fragment(name, parts, build, specs=CATALOG, ttl=FRAGMENT_TTL):
+    """
+    Giá trị build() cache theo name + parts + phiên bản của specs.
+    """
+    key = f"fragment:{name}:{_digest(versions(*specs), *parts)}"
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, ttl)
+    return value
+
+
+# =========================
+# Cả trang + ETag
+# =========================
+def cached_page(request, render, specs=CATALOG, shared=None):
+    """
+    Trả response của render() kèm ETag tính từ phiên bản dữ liệu của trang.
+
+    Trình duyệt gửi lại If-None-Match trùng -> 304, không render. Người dùng
+    chưa đăng nhập dùng chung một bản HTML trong cache (shared); người đã đăng
+    nhập chỉ cache theo ETag, có tính cả CSRF secret vì trang chứa token.
+    Trang còn flash message chưa hiển thị thì luôn render mới.
+    """
+    if request.method not in ("GET", "HEAD") or len(get_messages(request)):
+        return render()
+
+    user = request.user
+    if shared is None:
+        shared = not user.is_authenticated
+    version = versions(*specs)
+
+    def make_etag():
+        # lần đầu chưa có cookie CSRF thì render sẽ tạo -> đọc lại sau khi render
+        csrf = "" if shared else request.META.get("CSRF_COOKIE", "")
+        return f'"{_digest(request.get_full_path(), user.pk, csrf, version)}"'
+
+    etag = make_etag()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        key = f"page:{etag}"
+        content = cache.get(key) if shared else None
+        if content is not None:
+            response = HttpResponse(content)
+        else:
+            response = render()
+            if response.status_code != 200 or response.streaming:
+                return response
+            if shared:
+                cache.set(key, response.content, PAGE_TTL)
+        response["ETag"] = make_etag()
+    # luôn hỏi lại server, nhưng được dùng 304 nếu không đổi
+    patch_cache_control(response, no_cache=True, **({"public": True} if shared else {"private": True}))
+    return response
@@ -0,0 +1,368 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache.backends import locmem, redis
+
+logger = logging.getLogger(__name__)
+
+# cận trên các bucket (giây / số query), như client Prometheus
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SLOW_SAMPLES = 50
+# số request chờ gộp vào histogram trước khi gộp ngay trên request
+FLUSH_AT = 1000
+# số query giữ lại mỗi request để lấy mẫu request chậm
+MAX_RECORDED_QUERIES = 1000
+
+# RequestStats của request đang chạy (PerfMiddleware đặt); theo context nên đúng cả
+# với view async và code sync chạy qua sync_to_async
+current = ContextVar("perf_request", default=None)
+
+
+# =========================
+# Số liệu của một request
+# =========================
+class RequestStats:
+    __slots__ = ("started", "queries", "query_count", "db_time", "cache_hits", "cache_misses", "http_time",
+                 "http_calls")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []  # [(sql, params, giây)], tối đa MAX_RECORDED_QUERIES, chỉ để lấy mẫu
+        self.query_count = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.http_time = 0.0
+        self.http_calls = 0
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """
+    execute_wrapper gắn vào mọi kết nối DB (musicapp.signals): đo query của request hiện tại.
+    """
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.db_time += elapsed
+        stats.query_count += 1
+        if len(stats.queries) < MAX_RECORDED_QUERIES:
+            stats.queries.append((sql, params, elapsed))
+
+
+def install_db_wrapper(connection):
+    if db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_wrapper)
+
+
+@contextmanager
+def outbound():
+    """
+    Bọc một lần gọi HTTP ra ngoài (vd. Audius) để tính vào thời gian upstream của request.
+    """
+    stats = current.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.http_time += time.perf_counter() - started
+        stats.http_calls += 1
+
+
+# =========================
+# Cache có đếm hit / miss
+# =========================
+_MISSING = object()
+
+
+class CacheStatsMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        stats = current.get()
+        if value is _MISSING:
+            if stats is not None:
+                stats.cache_misses += 1
+            return default
+        if stats is not None:
+            stats.cache_hits += 1
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self._get_many(keys, version)
+        stats = current.get()
+        if stats is not None:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
+
+
+class LocMemCache(CacheStatsMixin, locmem.LocMemCache):
+    def _get_many(self, keys, version):
+        # như BaseCache.get_many nhưng gọi thẳng get gốc (không đếm từng khóa hai lần)
+        found = {}
+        for key in keys:
+            value = locmem.LocMemCache.get(self, key, _MISSING, version)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+
+class RedisCache(CacheStatsMixin, redis.RedisCache):
+    def _get_many(self, keys, version):
+        return redis.RedisCache.get_many(self, keys, version)
+
+
+# =========================
+# Histogram trong bộ nhớ
+# =========================
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # ô cuối: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Ước lượng phân vị (cận trên của bucket chứa nó).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.duration = Histogram(TIME_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.http_time = Histogram(TIME_BUCKETS)
+        self.db_time = 0.0
+        self.statuses = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.http_calls = 0
+
+
+class Registry:
+    """
+    Số liệu theo view của process này (mỗi worker gunicorn / uvicorn có bộ riêng,
+    Prometheus scrape từng worker hoặc cộng theo label instance).
+
+    Request chỉ append một tuple số liệu vào hàng chờ (deque, an toàn giữa các
+    thread); việc gộp vào histogram làm theo lô khi đọc số liệu hoặc khi hàng
+    chờ đầy, để giữ chi phí trên mỗi request nhỏ. Hàng chờ không giữ
+    RequestStats (danh sách query tới MAX_RECORDED_QUERIES mỗi request).
+    """
+
+    def __init__(self, slow_samples=SLOW_SAMPLES, flush_at=FLUSH_AT):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.pending = deque()
+        self.flush_at = flush_at
+        self.slow = deque(maxlen=slow_samples)
+
+    def record(self, view, status, duration, stats):
+        pending = self.pending
+        pending.append((view, status, duration, stats.query_count, stats.db_time, stats.cache_hits,
+                        stats.cache_misses, stats.http_time, stats.http_calls))
+        if len(pending) >= self.flush_at:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, views = self.pending, self.views
+            while pending:
+                (view, status, duration, queries, db_time, cache_hits, cache_misses,
+                 http_time, http_calls) = pending.popleft()
+                metrics = views.get(view)
+                if metrics is None:
+                    metrics = views[view] = ViewMetrics()
+                metrics.duration.observe(duration)
+                metrics.queries.observe(queries)
+                metrics.db_time += db_time
+                metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+                metrics.cache_hits += cache_hits
+                metrics.cache_misses += cache_misses
+                if http_calls:
+                    metrics.http_time.observe(http_time)
+                    metrics.http_calls += http_calls
+
+    def add_slow(self, sample):
+        with self.lock:
+            self.slow.appendleft(sample)
+
+    def reset(self):
+        with self.lock:
+            self.pending.clear()
+            self.views = {}
+            self.slow.clear()
+
+    def summary(self):
+        """
+        Một dòng mỗi view cho trang /perf/ (sắp theo tổng thời gian giảm dần).
+        """
+        self.flush()
+        with self.lock:
+            rows = []
+            for view, m in self.views.items():
+                n = m.duration.count
+                lookups = m.cache_hits + m.cache_misses
+                rows.append({
+                    "view": view,
+                    "count": n,
+                    "errors": sum(c for s, c in m.statuses.items() if s >= 500),
+                    "avg_ms": m.duration.sum / n * 1000,
+                    "p50_ms": m.duration.quantile(0.5) * 1000,
+                    "p95_ms": m.duration.quantile(0.95) * 1000,
+                    "p99_ms": m.duration.quantile(0.99) * 1000,
+                    "avg_queries": m.queries.sum / n,
+                    "avg_db_ms": m.db_time / n * 1000,
+                    "cache_hit_ratio": m.cache_hits / lookups if lookups else None,
+                    "http_calls": m.http_calls,
+                    "avg_http_ms": m.http_time.sum / m.http_time.count * 1000 if m.http_time.count else None,
+                    "total_s": m.duration.sum,
+                })
+            slow = list(self.slow)
+        rows.sort(key=lambda r: -r["total_s"])
+        return rows, slow
+
+    def prometheus(self):
+        """
+        Số liệu dạng text exposition của Prometheus.
+        """
+        lines = []
+
+        def histogram(name, help_text, attr):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for view, m in sorted(self.views.items()):
+                h = getattr(m, attr)
+                label = _label(view)
+                cumulative = 0
+                for bound, n in zip(h.buckets + ("+Inf",), h.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{view="{label}"}} {h.sum}')
+                lines.append(f'{name}_count{{view="{label}"}} {h.count}')
+
+        self.flush()
+        with self.lock:
+            histogram("musicapp_request_duration_seconds", "Thời gian xử lý request theo view", "duration")
+            histogram("musicapp_db_queries", "Số query DB mỗi request", "queries")
+            histogram("musicapp_outbound_http_duration_seconds",
+                      "Tổng thời gian gọi HTTP ra ngoài mỗi request (chỉ request có gọi)", "http_time")
+            lines.append("# HELP musicapp_db_duration_seconds_total Tổng thời gian query DB")
+            lines.append("# TYPE musicapp_db_duration_seconds_total counter")
+            for view, m in sorted(self.views.items()):
+                lines.append(f'musicapp_db_duration_seconds_total{{view="{_label(view)}"}} {m.db_time}')
+            lines.append("# HELP musicapp_responses_total Số response theo view và mã trạng thái")
+            lines.append("# TYPE musicapp_responses_total counter")
+            for view, m in sorted(self.views.items()):
+                for status, n in sorted(m.statuses.items()):
+                    lines.append(f'musicapp_responses_total{{view="{_label(view)}",status="{status}"}} {n}')
+            lines.append("# HELP musicapp_cache_lookups_total Số lần đọc cache theo kết quả")
+            lines.append("# TYPE musicapp_cache_lookups_total counter")
+            for view, m in sorted(self.views.items()):
+                lines.append(f'musicapp_cache_lookups_total{{view="{_label(view)}",result="hit"}} {m.cache_hits}')
+                lines.append(f'musicapp_cache_lookups_total{{view="{_label(view)}",result="miss"}} {m.cache_misses}')
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+registry = Registry()
+
+
+# =========================
+# Lấy mẫu request chậm
+# =========================
+_NUMBERS = re.compile(r"\b\d+\b")
+_IN_LISTS = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+
+
+def fingerprint(sql):
+    """
+    SQL bỏ tham số: IN (%s, %s, ...) gộp thành IN (...), số thành ?.
+    """
+    return _NUMBERS.sub("?", _IN_LISTS.sub("(...)", sql))
+
+
+def slow_sample(method, path, view, status, duration, stats):
+    """
+    Tóm tắt request chậm: query theo fingerprint (nhiều lần nhất trước) và query trùng hệt.
+    """
+    groups = {}
+    exact = Counter()
+    for sql, params, elapsed in stats.queries:
+        group = groups.setdefault(fingerprint(sql), [0, 0.0])
+        group[0] += 1
+        group[1] += elapsed
+        try:
+            exact[(sql, repr(params))] += 1
+        except Exception:  # repr của tham số lạ
+            pass
+    top = sorted(groups.items(), key=lambda item: (-item[1][0], -item[1][1]))[:10]
+    return {
+        "at": time.time(),
+        "method": method,
+        "path": path,
+        "view": view,
+        "status": status,
+        "duration_ms": duration * 1000,
+        "queries": max(stats.query_count, len(stats.queries)),
+        "db_ms": stats.db_time * 1000,
+        "http_ms": stats.http_time * 1000,
+        "fingerprints": [{"sql": sql, "count": n, "ms": t * 1000} for sql, (n, t) in top],
+        "duplicates": sum(n - 1 for n in exact.values() if n > 1),
+    }
+
+
+# =========================
+# Kết thúc đo một request
+# =========================
+def finish(request, response, stats, slow_ms, slow_queries):
+    """
+    Ghi số liệu của request vào registry, lấy mẫu nếu chậm.
+    """
+    duration = time.perf_counter() - stats.started
+    match = request.resolver_match
+    view = (match.view_name or match._func_path) if match else "-"
+    status = response.status_code
+    registry.record(view, status, duration, stats)
+    if duration * 1000 >= slow_ms or stats.query_count >= slow_queries:
+        sample = slow_sample(request.method, request.get_full_path(), view, status, duration, stats)
+        registry.add_slow(sample)
+        logger.warning(
+            "Request chậm %s %s (%s) %.0f ms, %d query (%.0f ms DB), %d query trùng; nhiều nhất: %s",
+            request.method, sample["path"], view, sample["duration_ms"], sample["queries"], sample["db_ms"],
+            sample["duplicates"],
+            "; ".join(f'{f["count"]}x {f["sql"][:200]}' for f in sample["fingerprints"][:3]),
+        )
@@ -0,0 +1,122 @@
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .models import PlaylistItem
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# =========================
+# Thêm / xóa bài hát
+# =========================
+def add_song(playlist, song):
+    """
+    Thêm bài hát vào cuối playlist. Trả về False nếu bài hát đã có trong playlist.
+
+    Chỉ chèn một dòng PlaylistItem; việc trùng lặp do ràng buộc
+    unique (playlist, song) quyết định thay vì quét danh sách.
+    """
+    last = (PlaylistItem.objects.filter(playlist=playlist)
+            .order_by('-position').values_list('position', flat=True).first())
+    position = 0 if last is None else last + 1
+    try:
+        with transaction.atomic():
+            PlaylistItem.objects.create(playlist=playlist, song=song, position=position)
+    except IntegrityError:
+        return False
+    return True
+
+
+def remove_song(playlist, song_id):
+    """
+    Xóa bài hát khỏi playlist. Trả về False nếu bài hát không có trong playlist.
+    """
+    deleted, _ = PlaylistItem.objects.filter(playlist=playlist, song_id=song_id).delete()
+    return deleted > 0
+
+
+async def aadd_song(playlist, song):
+    """
+    Bản async của add_song (view ASGI).
+
+    Chạy add_song trong thread của ORM để INSERT nằm trong transaction.atomic()
+    và trùng lặp vẫn do ràng buộc unique quyết định, thay vì kiểm tra trước
+    (thêm hai lượt truy vấn và vẫn có khe hở giữa kiểm tra và INSERT).
+    """
+    return await sync_to_async(add_song)(playlist, song)
+
+
+async def aremove_song(playlist, song_id):
+    deleted, _ = await PlaylistItem.objects.filter(playlist=playlist, song_id=song_id).adelete()
+    return deleted > 0
+
+
+# =========================
+# Gắn Song thật vào playlist
+# =========================
+def resolve_playlists(playlists, limit=PAGE_SIZE):
+    """
+    Gán cho từng playlist: songs (trang đầu, tối đa limit bài theo thứ tự),
+    song_count và next_after (con trỏ trang kế cho playlist_page / view
+    playlist_songs, None nếu đã đủ).
+
+    Đếm bằng một truy vấn, trang đầu của tất cả playlist bằng một truy vấn
+    (ROW_NUMBER theo playlist) nên playlist lớn không bị đọc hết vào bộ nhớ.
+    """
+    playlists = list(playlists.annotate(song_count=Count('items')))
+    by_id = {playlist.id: playlist for playlist in playlists}
+    for playlist in playlists:
+        playlist.songs = []
+        playlist.next_after = None
+
+    if by_id:
+        row = Window(RowNumber(), partition_by=F('playlist_id'), order_by=[F('position').asc(), F('id').asc()])
+        items = (PlaylistItem.objects.filter(playlist_id__in=by_id)
+                 .annotate(row=row).filter(row__lte=limit)
+                 .select_related('song__artist')
+                 .order_by('playlist_id', 'position', 'id'))
+        for item in items:
+            playlist = by_id[item.playlist_id]
+            playlist.songs.append(item.song)
+            if len(playlist.songs) == limit and playlist.song_count > limit:
+                playlist.next_after = item.position
+
+    return playlists
+
+
+# =========================
+# Phân trang playlist lớn
+# =========================
+def _page_items(playlist, after, limit):
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    items = PlaylistItem.objects.filter(playlist=playlist).select_related('song__artist')
+    if after is not None:
+        items = items.filter(position__gt=after)
+    return items.order_by('position', 'id')[:limit + 1], limit
+
+
+def _split_page(items, limit):
+    next_after = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_after = items[-1].position
+    return items, next_after
+
+
+def playlist_page(playlist, after=None, limit=PAGE_SIZE):
+    """
+    Lấy một trang bài hát của playlist theo con trỏ position (keyset).
+
+    Trả về (items, next_after); next_after là None khi đã hết. Truy vấn dùng
+    index (playlist, position) nên không phải đọc cả playlist.
+    """
+    items, limit = _page_items(playlist, after, limit)
+    return _split_page(list(items), limit)
+
+
+async def aplaylist_page(playlist, after=None, limit=PAGE_SIZE):
+    items, limit = _page_items(playlist, after, limit)
+    return _split_page([item async for item in items], limit)
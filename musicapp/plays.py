@@ -0,0 +1,271 @@
+import atexit
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import pagecache
+
+FLUSH_SIZE = 500
+FLUSH_SECONDS = 5
+ROLLUP_BATCH = 50000
+# số id mỗi câu UPDATE đánh dấu đã cộng (giới hạn tham số của SQLite)
+MARK_BATCH = 900
+# hằng số thời gian τ của bộ đếm giảm dần (giây)
+DECAY = {"trend_24h": 24 * 3600, "trend_7d": 7 * 24 * 3600}
+# exp((t - mốc) / τ) lớn quá thì dời mốc (float64 tràn ở khoảng e^709)
+REBASE_EXPONENT = 50
+RETENTION_DAYS = 30
+# token trong URL ghi lượt nghe: sống lâu hơn trang / fragment cache (≤ 1 giờ)
+TOKEN_SALT = "musicapp.plays"
+TOKEN_MAX_AGE = 24 * 3600
+# cùng một bài chỉ tính một lượt mỗi PLAY_REPEAT_SECONDS, tối đa PLAY_RATE_LIMIT
+# lượt mỗi PLAY_RATE_WINDOW cho một user / IP
+PLAY_REPEAT_SECONDS = 30
+PLAY_RATE_LIMIT = 60
+PLAY_RATE_WINDOW = 3600
+
+
+# =========================
+# Ghi lượt nghe theo lô
+# =========================
+class PlayBuffer:
+    """
+    Gom lượt nghe trong bộ nhớ của process rồi ghi một lần bằng bulk_create.
+
+    Ghi khi đủ FLUSH_SIZE lượt hoặc lượt cũ nhất đã chờ quá FLUSH_SECONDS
+    (kiểm tra lúc có lượt mới) và khi process thoát. Process bị kill thì
+    mất tối đa một lô chưa ghi - chấp nhận được với số liệu thống kê.
+    """
+
+    def __init__(self, flush_size=FLUSH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.lock = threading.Lock()
+        self.events = []
+        self.first_at = None
+
+    def _append(self, song_id, user_id, source):
+        from .models import PlayEvent
+
+        event = PlayEvent(song_id=song_id, user_id=user_id, source=source, played_at=timezone.now())
+        with self.lock:
+            if not self.events:
+                self.first_at = time.monotonic()
+            self.events.append(event)
+            return (len(self.events) >= self.flush_size
+                    or time.monotonic() - self.first_at >= self.flush_seconds)
+
+    def add(self, song_id, user_id=None, source="player"):
+        if self._append(song_id, user_id, source):
+            self.flush()
+
+    async def aadd(self, song_id, user_id=None, source="player"):
+        # view async: chỉ lượt làm đầy lô mới phải ghi DB (qua thread của ORM)
+        if self._append(song_id, user_id, source):
+            await sync_to_async(self.flush)()
+
+    def flush(self):
+        from .models import PlayEvent
+
+        with self.lock:
+            events, self.events = self.events, []
+        if events:
+            PlayEvent.objects.bulk_create(events, batch_size=self.flush_size)
+        return len(events)
+
+
+buffer = PlayBuffer()
+atexit.register(buffer.flush)
+
+
+def _user_id(user):
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def record(song_id, user=None, source="player"):
+    buffer.add(song_id, _user_id(user), source)
+
+
+async def arecord(song_id, user=None, source="player"):
+    await buffer.aadd(song_id, _user_id(user), source)
+
+
+# =========================
+# Chống spam endpoint ghi lượt nghe
+# =========================
+def _signer():
+    return signing.TimestampSigner(salt=TOKEN_SALT)
+
+
+def play_token(song_id):
+    """
+    Token ký cho URL ghi lượt nghe của một bài (nhúng vào trang, không gắn với
+    session nên trang cache dùng chung vẫn dùng được).
+    """
+    return _signer().sign(str(song_id))
+
+
+def check_token(song_id, token):
+    try:
+        return _signer().unsign(token or "", max_age=TOKEN_MAX_AGE) == str(song_id)
+    except signing.BadSignature:  # gồm cả SignatureExpired
+        return False
+
+
+def client_key(request, user=None):
+    # view async truyền user đã đọc bằng request.auser()
+    user = request.user if user is None else user
+    if user.is_authenticated:
+        return f"u{user.pk}"
+    return f"ip{request.META.get('REMOTE_ADDR', '')}"
+
+
+def allow(who, song_id):
+    """
+    Có tính lượt nghe này không: bỏ lượt lặp lại cùng bài trong
+    PLAY_REPEAT_SECONDS và lượt vượt PLAY_RATE_LIMIT / PLAY_RATE_WINDOW.
+    """
+    if not cache.add(f"plays:repeat:{who}:{song_id}", 1, PLAY_REPEAT_SECONDS):
+        return False
+    key = f"plays:rate:{who}"
+    cache.add(key, 0, PLAY_RATE_WINDOW)
+    try:
+        count = cache.incr(key)
+    except ValueError:  # key vừa hết hạn
+        cache.set(key, 1, PLAY_RATE_WINDOW)
+        count = 1
+    return count <= PLAY_RATE_LIMIT
+
+
+async def aallow(who, song_id):
+    if not await cache.aadd(f"plays:repeat:{who}:{song_id}", 1, PLAY_REPEAT_SECONDS):
+        return False
+    key = f"plays:rate:{who}"
+    await cache.aadd(key, 0, PLAY_RATE_WINDOW)
+    try:
+        count = await cache.aincr(key)
+    except ValueError:  # key vừa hết hạn
+        await cache.aset(key, 1, PLAY_RATE_WINDOW)
+        count = 1
+    return count <= PLAY_RATE_LIMIT
+
+
+# =========================
+# Cộng dồn vào SongStats
+# =========================
+def _rebase(state, now):
+    from .models import SongStats
+
+    shift = (now - state.epoch).total_seconds()
+    SongStats.objects.update(**{
+        field: F(field) * math.exp(-shift / tau) for field, tau in DECAY.items()
+    })
+    state.epoch = now
+
+
+def rollup(batch=ROLLUP_BATCH):
+    """
+    Cộng các PlayEvent chưa cộng (rolled_up=False) vào SongStats rồi đánh dấu
+    chúng; chỉ chạm các bài có lượt nghe mới.
+
+    Dùng cờ thay vì mốc id: lô bulk_create của process khác có thể commit sau
+    khi đã cộng các id lớn hơn, mốc id sẽ bỏ qua các lượt đó mãi mãi.
+    Khóa dòng PlayRollup nên hai job chạy cùng lúc không cộng trùng.
+    Trả về số lượt nghe đã xử lý.
+    """
+    from .models import PlayEvent, PlayRollup, Song, SongStats
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            state, _ = PlayRollup.objects.select_for_update().get_or_create(pk=1)
+            now = timezone.now()
+            if (now - state.epoch).total_seconds() / min(DECAY.values()) > REBASE_EXPONENT:
+                _rebase(state, now)
+
+            rows = list(PlayEvent.objects.filter(rolled_up=False)
+                        .order_by("id").values_list("id", "song_id", "played_at")[:batch])
+            if not rows:
+                state.save()
+                break
+
+            counts = defaultdict(lambda: {"plays": 0, "last": None, **{f: 0.0 for f in DECAY}})
+            for _, song_id, played_at in rows:
+                entry = counts[song_id]
+                entry["plays"] += 1
+                offset = (played_at - state.epoch).total_seconds()
+                for field, tau in DECAY.items():
+                    entry[field] += math.exp(offset / tau)
+                if entry["last"] is None or played_at > entry["last"]:
+                    entry["last"] = played_at
+
+            existing = SongStats.objects.in_bulk(list(counts))
+            missing = set(counts) - set(existing)
+            if missing:
+                # bỏ lượt nghe của bài không còn tồn tại
+                missing &= set(Song.objects.filter(id__in=missing).values_list("id", flat=True))
+            created = [SongStats(song_id=song_id) for song_id in missing]
+            for stats in [*existing.values(), *created]:
+                entry = counts[stats.song_id]
+                stats.plays += entry["plays"]
+                for field in DECAY:
+                    setattr(stats, field, getattr(stats, field) + entry[field])
+                if stats.last_played_at is None or entry["last"] > stats.last_played_at:
+                    stats.last_played_at = entry["last"]
+            SongStats.objects.bulk_update(
+                existing.values(), ["plays", *DECAY, "last_played_at"], batch_size=1000)
+            SongStats.objects.bulk_create(created, batch_size=1000)
+            # cột sắp "phổ biến" của Song: ghi giá trị tuyệt đối
+            Song.objects.bulk_update(
+                [Song(id=stats.song_id, play_count=stats.plays) for stats in [*existing.values(), *created]],
+                ["play_count"], batch_size=1000)
+
+            ids = [row[0] for row in rows]
+            for start in range(0, len(ids), MARK_BATCH):
+                PlayEvent.objects.filter(id__in=ids[start:start + MARK_BATCH]).update(rolled_up=True)
+            state.save()
+            total += len(rows)
+
+    if total:
+        pagecache.bump("stats")
+
+    # log thô chỉ cần cho tới khi đã cộng dồn
+    cutoff = timezone.now() - timedelta(days=RETENTION_DAYS)
+    PlayEvent.objects.filter(rolled_up=True, played_at__lt=cutoff).delete()
+    return total
+
+
+# =========================
+# Đọc bộ đếm
+# =========================
+def decayed(stats, field="trend_24h", now=None):
+    """
+    Số lượt nghe (đã giảm dần theo thời gian) của bộ đếm field ở thời điểm now.
+    """
+    from .models import PlayRollup
+
+    state = PlayRollup.objects.filter(pk=1).first()
+    if state is None:
+        return 0.0
+    now = now or timezone.now()
+    return getattr(stats, field) * math.exp(-(now - state.epoch).total_seconds() / DECAY[field])
+
+
+def trending(limit=10, field="trend_24h"):
+    """
+    Bài đang thịnh hành: đọc theo index của field, không group-by trên log.
+    """
+    from .models import SongStats
+
+    stats = (SongStats.objects.filter(**{f"{field}__gt": 0}).select_related("song__artist")
+             .order_by(f"-{field}")[:limit])
+    return [s.song for s in stats]
@@ -0,0 +1,314 @@
+import os
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+
+TOP_K = 50
+FAVORITE_WEIGHT = 1.0
+PLAYLIST_WEIGHT = 0.5
+# số phần tử khác 0 tối đa của một khối ma trận tương đồng (giới hạn bộ nhớ)
+BLOCK_NNZ = 20_000_000
+# người dùng có quá nhiều tương tác chỉ lấy mẫu chừng này (số cặp đồng xuất hiện tăng theo bình phương)
+MAX_USER_ITEMS = 500
+RELOAD_CHECK_SECONDS = 30
+# chỉ dùng chừng này bài yêu thích gần nhất để gợi ý cho người dùng
+HISTORY_LIMIT = 50
+
+# gợi ý theo tâm trạng khi chưa có lịch sử nghe (cold start)
+MOOD_GENRES = {
+    "vui": ("Pop", "EDM", "Dance"),
+    "buồn": ("Lofi", "Ballad", "Acoustic"),
+    "cô đơn": ("Lofi", "Indie", "Sad Chill"),
+    "tức giận": ("Rock", "Metal", "Rap"),
+    "thư giãn": ("Chill", "Jazz", "Ambient"),
+    "yêu": ("Love songs", "R&B", "Acoustic"),
+    "mệt": ("Chill", "Lofi", "Ambient"),
+}
+
+
+def detect_mood(text):
+    """
+    Tâm trạng đầu tiên trong MOOD_GENRES xuất hiện trong câu của người dùng.
+    """
+    text = (text or "").lower()
+    for mood in MOOD_GENRES:
+        if mood in text:
+            return mood
+    return None
+
+
+# =========================
+# Bảng hàng xóm gần nhất
+# =========================
+class NeighborTable:
+    """
+    Top-K bài hát tương tự của mỗi bài, lưu bằng mảng NumPy.
+
+    song_ids: id bài hát đã sắp xếp (n,); neighbors: chỉ số trong song_ids
+    (n, K), -1 ở chỗ trống; scores: cosine tương ứng (n, K), giảm dần.
+    Tra một bài là bisect trên song_ids rồi đọc một hàng K phần tử.
+    """
+
+    def __init__(self, song_ids, neighbors, scores):
+        self.song_ids = song_ids
+        self.neighbors = neighbors
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    def _row(self, song_id):
+        i = int(np.searchsorted(self.song_ids, song_id))
+        if i < len(self.song_ids) and self.song_ids[i] == song_id:
+            return i
+        return None
+
+    def similar(self, song_id, limit=10):
+        """
+        [(song_id, score)] của các bài giống song_id nhất.
+        """
+        i = self._row(song_id)
+        if i is None:
+            return []
+        cols = self.neighbors[i, :limit]
+        cols = cols[cols >= 0]
+        return list(zip(self.song_ids[cols].tolist(), self.scores[i, :len(cols)].tolist()))
+
+    def for_history(self, song_ids, limit=10):
+        """
+        Cộng điểm hàng xóm của các bài trong lịch sử; bỏ các bài đã có.
+        """
+        song_ids = np.asarray(song_ids, dtype=self.song_ids.dtype)
+        rows = np.searchsorted(self.song_ids, song_ids)
+        found = rows < len(self.song_ids)
+        found[found] = self.song_ids[rows[found]] == song_ids[found]
+        rows = rows[found]
+        if not len(rows):
+            return []
+        cols = self.neighbors[rows].ravel()
+        weights = self.scores[rows].ravel()
+        keep = (cols >= 0) & ~np.isin(cols, rows)
+        cols, weights = cols[keep], weights[keep]
+        if not len(cols):
+            return []
+        # chỉ cộng trên F*K ứng viên, không đụng tới cả bảng
+        candidates, inverse = np.unique(cols, return_inverse=True)
+        totals = np.bincount(inverse, weights=weights)
+        top = np.argsort(-totals, kind="stable")[:limit]
+        return [(int(self.song_ids[candidates[i]]), float(totals[i])) for i in top]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(tmp, song_ids=self.song_ids, neighbors=self.neighbors, scores=self.scores)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["song_ids"], data["neighbors"], data["scores"])
+
+
+def _cap_per_user(users, cols, weights, cap, seed=0):
+    # lấy mẫu ngẫu nhiên (cố định theo seed) cap tương tác của mỗi người dùng
+    order = np.lexsort((np.random.default_rng(seed).random(len(users)), users))
+    sorted_users = users[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_users, sorted_users, side="left")
+    keep = order[rank < cap]
+    return users[keep], cols[keep], weights[keep]
+
+
+def build_table(user_ids, song_ids, weights, k=TOP_K, block_nnz=BLOCK_NNZ, max_user_items=MAX_USER_ITEMS):
+    """
+    Tính top-K cosine item-item từ các tương tác (user, song, trọng số).
+
+    Ma trận user x song thưa (CSR), chuẩn hóa cột theo L2 rồi nhân Xᵀ·X theo
+    từng khối bài hát; kích thước khối chọn theo số phần tử khác 0 ước lượng
+    để không vượt block_nnz. Không dùng ORM (dùng được trong benchmark).
+    """
+    user_ids = np.asarray(user_ids)
+    song_ids = np.asarray(song_ids)
+    weights = np.asarray(weights, dtype=np.float32)
+    user_keys, users = np.unique(user_ids, return_inverse=True)
+    items, cols = np.unique(song_ids, return_inverse=True)
+    n_users, n_items = len(user_keys), len(items)
+    neighbors = np.full((n_items, k), -1, dtype=np.int32)
+    scores = np.zeros((n_items, k), dtype=np.float32)
+    if not n_items:
+        return NeighborTable(items, neighbors, scores)
+
+    if np.bincount(users).max() > max_user_items:
+        users, cols, weights = _cap_per_user(users, cols, weights, max_user_items)
+    matrix = sparse.csr_matrix((weights, (users, cols)), shape=(n_users, n_items))
+    matrix.sum_duplicates()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    normalized = (matrix @ sparse.diags(1 / norms).astype(np.float32)).tocsr()
+    item_major = normalized.T.tocsr()
+
+    # ước lượng số phần tử khác 0 của mỗi hàng kết quả để chia khối
+    user_degree = np.diff(normalized.indptr)
+    binary = item_major.copy()
+    binary.data[:] = 1
+    cumulative = np.cumsum(np.minimum(binary @ user_degree, n_items))
+
+    start = 0
+    while start < n_items:
+        done = cumulative[start - 1] if start else 0
+        end = max(start + 1, int(np.searchsorted(cumulative, done + block_nnz, side="right")))
+        _top_k_block(item_major[start:end] @ normalized, start, k, neighbors, scores)
+        start = end
+    return NeighborTable(items, neighbors, scores)
+
+
+def _top_k_block(block, start, k, neighbors, scores):
+    block = block.tocsr()
+    rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+    cols, data = block.indices, block.data
+    keep = (cols != rows + start) & (data > 0)  # bỏ chính nó
+    rows, cols, data = rows[keep], cols[keep], data[keep]
+    if not len(rows):
+        return
+    # sắp theo (hàng, điểm giảm dần) rồi lấy K phần tử đầu mỗi hàng, không lặp Python;
+    # cosine nằm trong (0, 1] nên một khóa float thay được lexsort (nhanh hơn nhiều)
+    order = np.argsort(rows + (1 - data.astype(np.float64)) * 0.5)
+    rows, cols, data = rows[order], cols[order], data[order]
+    first = np.searchsorted(rows, rows, side="left")
+    rank = np.arange(len(rows)) - first
+    top = rank < k
+    neighbors[rows[top] + start, rank[top]] = cols[top]
+    scores[rows[top] + start, rank[top]] = data[top]
+
+
+# =========================
+# Dữ liệu từ DB
+# =========================
+def load_interactions():
+    """
+    (user_ids, song_ids, weights) từ Favorite và bài hát trong playlist.
+    """
+    from .models import Favorite, PlaylistItem
+
+    def pairs(queryset):
+        values = (v for row in queryset.iterator(chunk_size=20000) for v in row)
+        return np.fromiter(values, dtype=np.int64).reshape(-1, 2)
+
+    fav = pairs(Favorite.objects.values_list("user_id", "song_id"))
+    items = pairs(PlaylistItem.objects.values_list("playlist__user_id", "song_id"))
+    weights = np.concatenate([
+        np.full(len(fav), FAVORITE_WEIGHT, dtype=np.float32),
+        np.full(len(items), PLAYLIST_WEIGHT, dtype=np.float32),
+    ])
+    both = np.concatenate([fav, items])
+    return both[:, 0], both[:, 1], weights
+
+
+def table_path():
+    return str(getattr(settings, "RECOMMEND_TABLE_PATH",
+                       os.path.join(settings.BASE_DIR, "var", "recommend.npz")))
+
+
+def rebuild(k=TOP_K):
+    """
+    Tính lại bảng hàng xóm từ DB và ghi đè file (thay thế nguyên tử).
+    """
+    table = build_table(*load_interactions(), k=k)
+    table.save(table_path())
+    store.reset()
+    return table
+
+
+# =========================
+# Bảng dùng trong process
+# =========================
+class TableStore:
+    """
+    Nạp bảng từ file lần đầu cần dùng; nạp lại khi file đổi (kiểm tra mỗi 30 giây).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.table = None
+        self.mtime = None
+        self.checked_at = 0.0
+
+    def reset(self):
+        with self.lock:
+            self.table, self.mtime, self.checked_at = None, None, 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if self.table is not None and now - self.checked_at < RELOAD_CHECK_SECONDS:
+            return self.table
+        with self.lock:
+            self.checked_at = now
+            path = table_path()
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                self.table = None
+                return None
+            if mtime != self.mtime:
+                self.table, self.mtime = NeighborTable.load(path), mtime
+            return self.table
+
+
+store = TableStore()
+
+
+# =========================
+# Gợi ý
+# =========================
+def _songs(ids):
+    from .models import Song
+
+    by_id = Song.objects.select_related("artist").in_bulk(ids)
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def because_you_liked(song_id, limit=10):
+    """
+    Các bài giống song_id nhất (một hàng của bảng, O(K)).
+    """
+    table = store.get()
+    if table is None:
+        return []
+    return _songs([sid for sid, _ in table.similar(song_id, limit)])
+
+
+def for_user(user, mood=None, limit=10):
+    """
+    Gợi ý cho người dùng: hàng xóm của các bài đã thích, bài hợp tâm trạng
+    lên trước; thiếu thì bù bằng bài được nghe nhiều thuộc thể loại của
+    tâm trạng (cold start).
+    """
+    from .facets import genre_key
+    from .models import Favorite, Song
+
+    genres = MOOD_GENRES.get(mood, ())
+    picked, history = [], []
+    table = store.get()
+    if table is not None and user.is_authenticated:
+        history = list(Favorite.objects.filter(user=user).order_by("-added_at")
+                       .values_list("song_id", flat=True)[:HISTORY_LIMIT])
+        ranked = [sid for sid, _ in table.for_history(history, limit * 3)]
+        songs = _songs(ranked)
+        if genres:
+            # hợp tâm trạng lên trước, thứ tự trong mỗi nhóm giữ theo điểm
+            lowered = {g.lower() for g in genres}
+            songs.sort(key=lambda s: (s.genre or "").lower() not in lowered)
+        picked = songs[:limit]
+
+    # chưa có lịch sử và không rõ tâm trạng -> không đoán
+    if len(picked) < limit and (genres or picked):
+        prior = Song.objects.select_related("artist").exclude(id__in=[s.id for s in picked] + history)
+        if genres:
+            prior = prior.filter(genre_ref__key__in=[genre_key(g) for g in genres])
+        # bộ đếm lượt nghe đã cộng dồn sẵn (Song.play_count) -> không group-by
+        prior = prior.order_by("-play_count", "id")
+        picked += list(prior[:limit - len(picked)])
+    return picked
@@ -0,0 +1,127 @@
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Song, SongToken
+from .text import fold_text, search_tokens
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+SORT_NEWEST = "new"
+SORT_POPULAR = "popular"
+# số bài ghi lại từ khóa trong một lượt (index_songs)
+INDEX_BATCH = 2000
+
+
+# =========================
+# Chỉ mục từ khóa (SongToken)
+# =========================
+def index_songs(rows):
+    """
+    Ghi lại SongToken cho các bài hát; rows là các cặp (id, search_key).
+
+    Signal gọi hàm này khi lưu từng bài. Sau bulk_create / bulk_update (không
+    qua signal) thì người gọi tự gọi.
+    """
+    iterator = iter(rows)
+    while batch := list(islice(iterator, INDEX_BATCH)):
+        with transaction.atomic():
+            SongToken.objects.filter(song_id__in=[pk for pk, _ in batch]).delete()
+            SongToken.objects.bulk_create(
+                [SongToken(song_id=pk, token=token) for pk, key in batch for token in search_tokens(key)],
+                batch_size=INDEX_BATCH,
+            )
+
+
+def reindex():
+    """
+    Dựng lại toàn bộ chỉ mục từ khóa từ Song.search_key; trả về số bài hát.
+    """
+    SongToken.objects.all().delete()
+    count = 0
+
+    def rows():
+        nonlocal count
+        for row in Song.objects.order_by('id').values_list('id', 'search_key').iterator(chunk_size=INDEX_BATCH):
+            count += 1
+            yield row
+
+    index_songs(rows())
+    return count
+
+
+def token_prefix(prefix):
+    """
+    Điều kiện "token bắt đầu bằng prefix" dạng khoảng [prefix, prefix tăng ký tự cuối).
+
+    LIKE 'abc%' chỉ dùng được index trên SQLite khi cột có collation NOCASE, trên
+    PostgreSQL khi index có varchar_pattern_ops. So sánh khoảng thì mọi B-tree đều
+    dùng được. Từ chỉ gồm chữ / số đã bỏ dấu nên thứ tự byte và thứ tự collation
+    trùng nhau ở phần tiền tố.
+    """
+    upper = prefix[:-1] + chr(min(ord(prefix[-1]) + 1, 0x10FFFF))
+    return Q(token__gte=prefix, token__lt=upper)
+
+
+# =========================
+# Tìm kiếm bài hát (phân trang theo con trỏ)
+# =========================
+def filter_songs(query="", genre="", songs=None):
+    """
+    Bài hát khớp query (tên / nghệ sĩ, không phân biệt dấu) và thể loại.
+
+    Mỗi từ của query phải là tiền tố của một từ trong tên bài / nghệ sĩ
+    ("kich ca" khớp "Đoạn Kịch Câm"): mỗi từ một truy vấn con quét khoảng
+    trên index (token, song) của SongToken. genre là tên hoặc key của Genre;
+    lọc theo khóa ngoại genre_ref (có index).
+    """
+    songs = Song.objects.all() if songs is None else songs
+    for token in search_tokens(query):
+        songs = songs.filter(id__in=SongToken.objects.filter(token_prefix(token)).values('song_id'))
+    if genre:
+        songs = songs.filter(genre_ref__key=fold_text(genre))
+    return songs
+
+
+def search_songs(query="", genre="", cursor=None, page_size=PAGE_SIZE, sort=SORT_NEWEST):
+    """
+    Tìm bài hát theo tên / nghệ sĩ (không phân biệt dấu) và thể loại.
+
+    Mặc định sắp theo id, cursor là id của bài cuối trang trước; sort=
+    SORT_POPULAR sắp theo tổng lượt nghe (Song.play_count, có index) giảm dần,
+    cursor là (play_count, id). Trả về (songs, next_cursor), next_cursor là None khi đã hết.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    songs = filter_songs(query, genre, Song.objects.select_related('artist'))
+
+    if sort == SORT_POPULAR:
+        if cursor is not None:
+            plays, last_id = cursor
+            songs = songs.filter(Q(play_count__lt=plays) | Q(play_count=plays, id__gt=last_id))
+        songs = songs.order_by('-play_count', 'id')
+    else:
+        if cursor is not None:
+            songs = songs.filter(id__gt=cursor)
+        songs = songs.order_by('id')
+
+    songs = list(songs[:page_size + 1])
+    next_cursor = None
+    if len(songs) > page_size:
+        songs = songs[:page_size]
+        last = songs[-1]
+        next_cursor = f"{last.play_count}.{last.id}" if sort == SORT_POPULAR else last.id
+    return songs, next_cursor
+
+
+def parse_cursor(value, sort=SORT_NEWEST):
+    """
+    Đọc tham số cursor từ query string; giá trị sai được coi như trang đầu.
+    """
+    try:
+        if sort == SORT_POPULAR:
+            plays, last_id = value.split(".")
+            return int(plays), int(last_id)
+        return int(value) if value else None
+    except (AttributeError, TypeError, ValueError):
+        return None
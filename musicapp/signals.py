@@ -0,0 +1,168 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import entitlements, facets, pagecache, perf, search, tasks, typeahead
+from .models import Artist, Favorite, Playlist, PlaylistItem, Song, Subscription
+
+
+# =========================
+# Chỉ mục gợi ý tìm kiếm
+# =========================
+@receiver(post_save, sender=Song)
+def typeahead_song_saved(sender, instance, **kwargs):
+    typeahead.index.update_song(instance.id, instance.title, instance.artist_id)
+
+
+@receiver(post_delete, sender=Song)
+def typeahead_song_deleted(sender, instance, **kwargs):
+    typeahead.index.remove_song(instance.id)
+
+
+@receiver(post_save, sender=Artist)
+def typeahead_artist_saved(sender, instance, **kwargs):
+    typeahead.index.update_artist(instance.id, instance.name)
+
+
+@receiver(post_delete, sender=Artist)
+def typeahead_artist_deleted(sender, instance, **kwargs):
+    typeahead.index.remove_artist(instance.id)
+
+
+@receiver(post_save, sender=Favorite)
+def typeahead_favorite_added(sender, instance, created, **kwargs):
+    if created:
+        typeahead.index.add_favorite(instance.song_id, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def typeahead_favorite_removed(sender, instance, **kwargs):
+    typeahead.index.add_favorite(instance.song_id, -1)
+
+
+# =========================
+# Chỉ mục từ khóa tìm kiếm (musicapp.search)
+# =========================
+@receiver(post_save, sender=Song)
+def search_song_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.search_key != getattr(instance, "_indexed_key", None):
+        search.index_songs([(instance.pk, instance.search_key)])
+        instance._indexed_key = instance.search_key
+
+
+# =========================
+# Bộ đếm thể loại / nghệ sĩ (musicapp.facets)
+# =========================
+@receiver(post_save, sender=Song)
+def facets_song_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        facets.song_saved(instance, created)
+
+
+@receiver(post_delete, sender=Song)
+def facets_song_deleted(sender, instance, **kwargs):
+    facets.song_deleted(instance)
+
+
+@receiver(post_save, sender=Favorite)
+def facets_favorite_added(sender, instance, created, **kwargs):
+    if created:
+        facets.favorite_changed(instance.song_id, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def facets_favorite_removed(sender, instance, **kwargs):
+    facets.favorite_changed(instance.song_id, -1)
+
+
+# =========================
+# Ảnh thu nhỏ, metadata, bản HLS: chạy nền qua hàng đợi job
+# =========================
+@receiver(post_save, sender=Song)
+def song_files_saved(sender, instance, **kwargs):
+    tasks.enqueue_song_processing(instance)
+
+
+# =========================
+# File theo hash nội dung
+# =========================
+@receiver(post_delete, sender=Song)
+def media_song_deleted(sender, instance, **kwargs):
+    instance.release_media({f: getattr(instance, f).name for f in Song.MEDIA_FIELDS})
+
+
+# =========================
+# Phiên bản cache trang / fragment (musicapp.pagecache)
+# =========================
+@receiver(post_save, sender=Song)
+@receiver(post_delete, sender=Song)
+def pagecache_song_changed(sender, instance, **kwargs):
+    pagecache.bump("song")
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_delete, sender=Artist)
+def pagecache_artist_changed(sender, instance, **kwargs):
+    pagecache.bump("artist")
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def pagecache_favorite_changed(sender, instance, **kwargs):
+    pagecache.bump("favorite", instance.user_id)
+
+
+@receiver(post_save, sender=Playlist)
+@receiver(post_delete, sender=Playlist)
+def pagecache_playlist_changed(sender, instance, **kwargs):
+    pagecache.bump("playlist", instance.user_id)
+
+
+@receiver(post_save, sender=PlaylistItem)
+@receiver(post_delete, sender=PlaylistItem)
+def pagecache_playlist_item_changed(sender, instance, **kwargs):
+    if PlaylistItem.playlist.is_cached(instance):
+        user_id = instance.playlist.user_id
+    else:
+        user_id = Playlist.objects.filter(pk=instance.playlist_id).values_list("user_id", flat=True).first()
+    if user_id is not None:
+        pagecache.bump("playlist", user_id)
+
+
+# =========================
+# Quyền Premium đã cache
+# =========================
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def entitlement_changed(sender, instance, **kwargs):
+    entitlements.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def entitlement_new_user(sender, instance, created, **kwargs):
+    if created:
+        entitlements.invalidate(instance.pk)
+
+
+# =========================
+# Tinh chỉnh SQLite trên mỗi kết nối
+# =========================
+@receiver(connection_created)
+def sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+        connection.connection.execute(f"PRAGMA {name}={value}")
+
+
+# =========================
+# Đo query cho musicapp.perf
+# =========================
+@receiver(connection_created)
+def perf_db_wrapper(sender, connection, **kwargs):
+    if getattr(settings, "PERF_ENABLED", True):
+        perf.install_db_wrapper(connection)
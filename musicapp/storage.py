@@ -0,0 +1,170 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def blob_name(directory, digest, ext):
+    """
+    Tên file theo hash: <thư mục upload_to>/<2 ký tự đầu>/<sha256><đuôi file>.
+    """
+    return posixpath.join(directory, digest[:2], f"{digest}{ext.lower()}")
+
+
+def file_digest(path):
+    """
+    SHA-256 của file trên đĩa, đọc theo từng chunk (dùng trong process pool).
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# =========================
+# Storage theo hash nội dung
+# =========================
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Lưu mỗi nội dung file đúng một lần, đặt tên theo SHA-256.
+
+    File tải lên được băm trong cùng lượt ghi ra file tạm; nếu blob đã tồn tại
+    thì bỏ file tạm. MediaBlob.refs đếm số lần blob được lưu/tham chiếu, và
+    delete() chỉ xóa file thật khi không còn ai dùng.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # tên thật do _save quyết định từ hash, không cần thêm hậu tố chống trùng
+        return name
+
+    def _save(self, name, content):
+        if hasattr(content, "seek"):
+            content.seek(0)
+        final, size = self._write_blob(posixpath.dirname(name), os.path.splitext(name)[1],
+                                       content.chunks(CHUNK_SIZE))
+        self.add_ref(final, size)
+        if not self.exists(final):
+            # delete() đồng thời xóa blob giữa lúc ghi (thấy file đã có) và lúc giữ
+            # tham chiếu; giờ đã giữ tham chiếu nên ghi lại là an toàn
+            if hasattr(content, "seek"):
+                content.seek(0)
+            self._write_blob(posixpath.dirname(name), os.path.splitext(name)[1], content.chunks(CHUNK_SIZE))
+        return final
+
+    def _write_blob(self, directory, ext, chunks):
+        tmp_dir = self.path(directory)
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+
+            final = blob_name(directory, digest.hexdigest(), ext)
+            final_path = self.path(final)
+            if os.path.exists(final_path):
+                os.unlink(tmp_path)  # đã có nội dung này
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return final, size
+
+    def copy_file(self, path, directory):
+        """
+        Chép file trên đĩa vào storage, trả về (tên blob, kích thước); chưa tăng refs.
+
+        Không chạm DB nên gọi được từ thread pool; gọi add_refs sau khi lưu bản ghi.
+        """
+        with open(path, "rb") as f:
+            return self._write_blob(directory, os.path.splitext(path)[1],
+                                    iter(lambda: f.read(CHUNK_SIZE), b""))
+
+    def add_ref(self, name, size=None, count=1):
+        MediaBlob = apps.get_model("musicapp", "MediaBlob")
+        with transaction.atomic():
+            blob, created = MediaBlob.objects.select_for_update().get_or_create(
+                name=name, defaults={"size": size or 0, "refs": count})
+            if not created:
+                MediaBlob.objects.filter(pk=blob.pk).update(refs=F("refs") + count)
+
+    def add_refs(self, blobs):
+        """
+        add_ref cho nhiều blob một lượt: blobs là {tên: (kích thước, số tham chiếu)}.
+        """
+        MediaBlob = apps.get_model("musicapp", "MediaBlob")
+        with transaction.atomic():
+            existing = set(MediaBlob.objects.select_for_update().filter(name__in=list(blobs))
+                           .values_list("name", flat=True))
+            for name in existing:
+                MediaBlob.objects.filter(name=name).update(refs=F("refs") + blobs[name][1])
+            MediaBlob.objects.bulk_create([
+                MediaBlob(name=name, size=size, refs=count)
+                for name, (size, count) in blobs.items() if name not in existing
+            ], batch_size=500)
+
+    def delete(self, name):
+        """
+        Bỏ một tham chiếu; chỉ xóa file khi không còn bản ghi nào dùng blob.
+
+        File không có MediaBlob (chưa được theo dõi, có thể đang dùng chung) thì
+        giữ nguyên: dedupe_media đếm lại tham chiếu và dọn file thừa.
+        """
+        MediaBlob = apps.get_model("musicapp", "MediaBlob")
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return
+            if blob.refs > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(refs=F("refs") - 1)
+                return
+            blob.delete()
+            # xóa file khi còn giữ khóa dòng: add_ref đồng thời phải chờ tới sau đó
+            super().delete(name)
+
+
+content_storage = ContentAddressedStorage()
+
+
+def get_content_storage():
+    return content_storage
+
+
+# =========================
+# File tĩnh: tên có hash + bản nén sẵn
+# =========================
+class StaticStorage(CompressedManifestStaticFilesStorage):
+    """
+    collectstatic ghi file tĩnh với tên có hash nội dung (staticfiles.json) kèm
+    bản .br (cần gói Brotli) và .gz nén sẵn; WhiteNoise trả thẳng bản nén theo
+    Accept-Encoding và gắn Cache-Control immutable cho file có hash.
+
+    Chưa có manifest (máy dev, test chưa chạy collectstatic) thì {% static %}
+    trả tên gốc thay vì ValueError.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
@@ -0,0 +1,142 @@
+import re
+
+from asgiref.sync import sync_to_async
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+# người dùng chưa có Premium chỉ nghe được đoạn đầu (~30 giây MP3 128 kbps)
+PREVIEW_SECONDS = 30
+PREVIEW_BYTES = PREVIEW_SECONDS * 128 * 1000 // 8
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+# =========================
+# Đọc header Range
+# =========================
+def parse_range(header, size):
+    """
+    Đọc header "Range: bytes=..." (một đoạn) và trả về (start, end) tính cả end.
+
+    Trả về None nếu không có / không hỗ trợ (phục vụ cả file), hoặc
+    False nếu đoạn yêu cầu nằm ngoài file (416).
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # bytes=-N: N byte cuối
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(file, start, end, chunk_size=CHUNK_SIZE):
+    try:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = file.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+# =========================
+# Stream dưới ASGI
+# =========================
+def iter_for(request, chunks):
+    """
+    Nội dung cho StreamingHttpResponse từ generator sync chunks.
+
+    Dưới ASGI, Django gom hết iterator sync vào list trước khi gửi -> bọc thành
+    generator async lấy từng chunk trong thread của sync_to_async. WSGI giữ nguyên.
+    """
+    if isinstance(request, ASGIRequest):
+        return _async_chunks(chunks)
+    return chunks
+
+
+async def _async_chunks(chunks):
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+# =========================
+# Response hỗ trợ Range + ETag
+# =========================
+def ranged_file_response(request, file, size, etag, last_modified=None, content_type="audio/mpeg"):
+    """
+    Trả file theo từng chunk, hỗ trợ Range (206), If-Range và các request có điều kiện (304).
+
+    size có thể nhỏ hơn kích thước thật của file để chỉ cho nghe một đoạn
+    đầu. file được đóng khi response kết thúc.
+    """
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        file.close()
+        return conditional
+
+    byte_range = parse_range(request.headers.get("Range"), size)
+    if_range = request.headers.get("If-Range")
+    if byte_range and if_range and not _if_range_matches(if_range, etag, last_modified):
+        byte_range = None
+
+    if byte_range is False:
+        file.close()
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    elif byte_range is None:
+        if size == _file_size(file) and not isinstance(request, ASGIRequest):
+            # cả file: FileResponse dùng wsgi.file_wrapper (sendfile) nếu server hỗ trợ;
+            # dưới ASGI iterator sync của nó bị gom hết vào bộ nhớ nên đi nhánh dưới
+            response = FileResponse(file, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(iter_for(request, _read_range(file, 0, size - 1)),
+                                             content_type=content_type)
+        response["Content-Length"] = str(size)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(iter_for(request, _read_range(file, start, end)),
+                                         status=206, content_type=content_type)
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def _if_range_matches(if_range, etag, last_modified):
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and last_modified is not None and int(last_modified) <= since
+
+
+def _file_size(file):
+    try:
+        return file.size
+    except (AttributeError, OSError):
+        return None
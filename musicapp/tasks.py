@@ -0,0 +1,82 @@
+import logging
+
+from . import audiometa, jobs, plays, recommend, thumbnails, transcode
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# Xử lý file của bài hát
+# =========================
+@jobs.task(max_attempts=3, release_key=True)
+def generate_thumbnails(song_id):
+    from .models import Song
+
+    song = Song.objects.filter(pk=song_id).first()
+    if song is not None:
+        thumbnails.generate_for_song(song)
+
+
+@jobs.task(max_attempts=3, release_key=True)
+def process_audio(song_id):
+    """
+    Đọc metadata file nhạc rồi tạo các bản HLS.
+    """
+    from .models import Song
+
+    song = Song.objects.filter(pk=song_id).first()
+    if song is None or not song.audio_file:
+        return
+    try:
+        audiometa.ingest_song(song)
+    except audiometa.AudioMetadataError as exc:
+        # file không phải MP3 hợp lệ -> chạy lại cũng không khác
+        logger.warning("Không đọc được metadata của %s: %s", song.audio_file.name, exc)
+        return
+    transcode.transcode_song(song)
+
+
+def enqueue_song_processing(song):
+    """
+    Tạo job cho ảnh bìa / file nhạc vừa thay đổi của song (gọi sau khi lưu).
+
+    Idempotency key gồm tên file (theo hash nội dung) nên lưu lại cùng file
+    không tạo thêm job khi job trước còn chờ; job xong thì key được nhả, tải
+    lên lại file cũ (A -> B -> A) vẫn được xử lý lại.
+    """
+    if getattr(song, "cover_changed", False):
+        jobs.enqueue(generate_thumbnails, priority=10,
+                     key=f"thumbnails:{song.pk}:{song.cover_image.name}", song_id=song.pk)
+    if getattr(song, "audio_changed", False):
+        jobs.enqueue(process_audio, priority=5,
+                     key=f"audio:{song.pk}:{song.audio_file.name}", song_id=song.pk)
+
+
+def enqueue_imported(songs):
+    """
+    Như enqueue_song_processing cho các bài tạo bằng bulk_create (không có signal).
+    """
+    jobs.enqueue_many(generate_thumbnails, [
+        (f"thumbnails:{song.pk}:{song.cover_image.name}", {"song_id": song.pk})
+        for song in songs if song.cover_image
+    ], priority=10)
+    jobs.enqueue_many(process_audio, [
+        (f"audio:{song.pk}:{song.audio_file.name}", {"song_id": song.pk})
+        for song in songs if song.audio_file
+    ], priority=5)
+
+
+# =========================
+# Gợi ý bài hát
+# =========================
+@jobs.task(max_attempts=2)
+def rebuild_recommendations():
+    recommend.rebuild()
+
+
+# =========================
+# Lượt nghe
+# =========================
+@jobs.task(max_attempts=2)
+def rollup_plays():
+    plays.rollup()
@@ -0,0 +1,34 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from musicapp.thumbnails import WIDTHS, thumb_name
+
+register = template.Library()
+
+
+def _srcset(storage, cover_hash, ext):
+    return ", ".join(f"{storage.url(thumb_name(cover_hash, w, ext))} {w}w" for w in WIDTHS)
+
+
+# =========================
+# Ảnh bìa responsive
+# =========================
+@register.inclusion_tag("cover_picture.html")
+def cover_picture(song, sizes="300px", css_class=""):
+    """
+    <picture> với srcset WebP/JPEG của ảnh bìa; chưa có ảnh thu nhỏ thì dùng ảnh gốc.
+
+        {% cover_picture song "(max-width: 768px) 100vw, 33vw" "card-img-top" %}
+    """
+    context = {"song": song, "sizes": sizes, "css_class": css_class}
+    cover = song.cover_image
+    if cover and song.cover_hash:
+        storage = default_storage
+        context.update({
+            "webp_srcset": _srcset(storage, song.cover_hash, "webp"),
+            "jpeg_srcset": _srcset(storage, song.cover_hash, "jpg"),
+            "src": storage.url(thumb_name(song.cover_hash, WIDTHS[1], "jpg")),
+        })
+    elif cover:
+        context["src"] = cover.url
+    return context
@@ -0,0 +1,22 @@
+from urllib.parse import urlencode
+
+from django import template
+from django.urls import reverse
+
+from musicapp import plays
+
+register = template.Library()
+
+
+# =========================
+# URL ghi lượt nghe
+# =========================
+@register.simple_tag
+def play_url(song_id):
+    """
+    URL ghi lượt nghe của bài kèm token ký (musicapp.plays.play_token).
+
+        <audio data-play-url="{% play_url song.id %}">
+    """
+    url = reverse("record_play", args=[song_id])
+    return f"{url}?{urlencode({'t': plays.play_token(song_id)})}"
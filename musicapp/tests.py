@@ -1,3 +1,1776 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from PIL import Image
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.template import Context, Template
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import audiometa, audius, downloads, entitlements, facets, favorites, jobs, pagecache, perf, plays, recommend, tasks, thumbnails, transcode, typeahead
+from .audius import AudiusClient, AudiusError
+from .models import (Artist, Favorite, Genre, Job, MediaBlob, PlayEvent, Song, SongStats, Playlist,
+                     Rendition, SongToken, Subscription)
+from .playlists import PAGE_SIZE, aadd_song, add_song, playlist_page
+from .search import SORT_POPULAR, filter_songs, parse_cursor, search_songs
+from .storage import ContentAddressedStorage, content_storage
+from .streaming import PREVIEW_BYTES
+from .text import song_search_key
+
+
+# =========================
+# PLAYLIST
+# =========================
+class PlaylistListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="listener", password="secret-pass-123")
+        self.artist = Artist.objects.create(name="Sơn Tùng")
+        self.songs = [
+            Song.objects.create(title=f"Song {i}", artist=self.artist, audio_file=f"audio/song_{i}.mp3")
+            for i in range(10)
+        ]
+        self.client.force_login(self.user)
+
+    def make_playlist(self, songs, name="Mix"):
+        playlist = Playlist.objects.create(user=self.user, name=name)
+        for song in songs:
+            add_song(playlist, song)
+        return playlist
+
+    def test_playlist_songs_keep_stored_order(self):
+        songs = [self.songs[3], self.songs[0], self.songs[7]]
+        self.make_playlist(songs)
+
+        response = self.client.get(reverse("playlist_list"))
+
+        playlist = response.context["playlists"][0]
+        self.assertEqual(playlist.songs, songs)
+
+    def test_add_song_rejects_duplicates(self):
+        playlist = self.make_playlist(self.songs[:2])
+
+        self.assertFalse(add_song(playlist, self.songs[0]))
+        self.assertTrue(add_song(playlist, self.songs[5]))
+        self.assertEqual(
+            list(playlist.items.values_list("song_id", "position")),
+            [(self.songs[0].id, 0), (self.songs[1].id, 1), (self.songs[5].id, 2)],
+        )
+
+    async def test_async_add_song_is_atomic(self):
+        playlist = await Playlist.objects.acreate(user=self.user, name="Mix")
+        # hai request cùng thêm một bài: chỉ một lượt thành công
+        results = await asyncio.gather(aadd_song(playlist, self.songs[0]), aadd_song(playlist, self.songs[0]))
+        self.assertEqual(sorted(results), [False, True])
+        self.assertTrue(await aadd_song(playlist, self.songs[1]))
+        self.assertEqual([item async for item in playlist.items.values_list("song_id", "position")],
+                         [(self.songs[0].id, 0), (self.songs[1].id, 1)])
+
+        self.assertTrue(await favorites.atoggle(self.user, self.songs[0]))
+        self.assertFalse(await favorites.atoggle(self.user, self.songs[0]))
+        self.assertFalse(await Favorite.objects.filter(user=self.user).aexists())
+
+    def test_remove_song(self):
+        playlist = self.make_playlist(self.songs[:3])
+
+        response = self.client.post(reverse("remove_from_playlist", args=[playlist.id, self.songs[1].id]))
+
+        self.assertRedirects(response, reverse("playlist_list"))
+        self.assertEqual(list(playlist.items.values_list("song_id", flat=True)),
+                         [self.songs[0].id, self.songs[2].id])
+
+    def test_playlist_page_uses_position_cursor(self):
+        playlist = self.make_playlist(self.songs)
+
+        items, next_after = playlist_page(playlist, limit=4)
+        self.assertEqual([i.song for i in items], self.songs[:4])
+        items, next_after = playlist_page(playlist, after=next_after, limit=4)
+        self.assertEqual([i.song for i in items], self.songs[4:8])
+        items, next_after = playlist_page(playlist, after=next_after, limit=4)
+        self.assertEqual([i.song for i in items], self.songs[8:])
+        self.assertIsNone(next_after)
+
+        response = self.client.get(reverse("playlist_songs", args=[playlist.id]), {"limit": 3, "after": 2})
+        data = response.json()
+        self.assertEqual([s["id"] for s in data["songs"]], [s.id for s in self.songs[3:6]])
+        self.assertEqual(data["next"], 5)
+
+    def test_large_playlist_renders_first_page_only(self):
+        songs = self.songs + [Song.objects.create(title=f"Extra {i}", artist=self.artist) for i in range(PAGE_SIZE)]
+        playlist = self.make_playlist(songs)
+
+        response = self.client.get(reverse("playlist_list"))
+        shown = response.context["playlists"][0]
+        self.assertEqual(shown.songs, songs[:PAGE_SIZE])
+        self.assertEqual(shown.song_count, len(songs))
+        self.assertContains(response, f'data-after="{shown.next_after}"')
+
+        # nút "Xem thêm" lấy phần còn lại
+        data = self.client.get(reverse("playlist_songs", args=[playlist.id]),
+                               {"after": shown.next_after, "format": "html"}).json()
+        self.assertEqual([s["id"] for s in data["songs"]], [s.id for s in songs[PAGE_SIZE:]])
+        self.assertIsNone(data["next"])
+        self.assertEqual(data["html"].count("<li"), len(songs) - PAGE_SIZE)
+        self.assertIn(reverse("remove_from_playlist", args=[playlist.id, songs[-1].id]), data["html"])
+
+    def test_query_count_does_not_grow_with_playlists(self):
+        self.make_playlist(self.songs)
+        # session đọc từ cache (cached_db), không tính vào số query
+        with self.assertNumQueries(4):
+            self.client.get(reverse("playlist_list"))
+
+        for n in range(20):
+            self.make_playlist(self.songs, name=f"Playlist {n}")
+        with self.assertNumQueries(4):
+            self.client.get(reverse("playlist_list"))
+
+
+# =========================
+# SEARCH
+# =========================
+class SongSearchTests(TestCase):
+    def setUp(self):
+        self.artist = Artist.objects.create(name="Ngô Lan Hương")
+        self.song = Song.objects.create(title="ĐOẠN KỊCH CÂM", artist=self.artist, genre="Ballad")
+        self.other = Song.objects.create(title="Hơn Là Bạn", artist=Artist.objects.create(name="Min"), genre="Pop")
+
+    def test_accent_folded_title_and_artist(self):
+        self.assertEqual(search_songs("doan kich cam")[0], [self.song])
+        self.assertEqual(search_songs("ngo lan huong")[0], [self.song])
+        self.assertEqual(search_songs("HON LA")[0], [self.other])
+
+    def test_search_key_follows_artist_rename(self):
+        self.artist.name = "Đức Phúc"
+        self.artist.save()
+
+        self.assertEqual(search_songs("duc phuc")[0], [self.song])
+        self.assertEqual(search_songs("ngo lan")[0], [])
+
+    def test_artist_save_without_rename_skips_reindex(self):
+        artist = Artist.objects.get(pk=self.artist.pk)
+        artist.country = "Việt Nam"
+        with CaptureQueriesContext(connection) as queries:
+            artist.save()
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "musicapp_song"' in q["sql"]])
+
+        artist.name = "Đức Phúc"
+        artist.save(update_fields=["name"])
+        self.assertEqual(search_songs("duc phuc")[0], [self.song])
+
+    def test_word_prefix_match(self):
+        self.assertEqual(search_songs("kich ca")[0], [self.song])
+        self.assertEqual(search_songs("huong doan")[0], [self.song])
+        # chỉ khớp đầu từ, không khớp giữa từ
+        self.assertEqual(search_songs("oan")[0], [])
+
+    def test_search_scans_token_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("kế hoạch truy vấn của SQLite")
+        plan = filter_songs("doan kich", "ballad").explain()
+        self.assertIn("USING COVERING INDEX songtoken_token_song_idx (token>? AND token<?)", plan)
+        self.assertNotIn("SCAN", plan)
+
+    def test_rebuild_search_command(self):
+        SongToken.objects.all().delete()
+        self.assertEqual(search_songs("doan")[0], [])
+        call_command("rebuild_search", stdout=StringIO())
+        self.assertEqual(search_songs("doan")[0], [self.song])
+
+    def test_cursor_pagination(self):
+        songs = [self.song, self.other] + [
+            Song.objects.create(title=f"Pop {i}", artist=self.artist, genre="pop") for i in range(5)
+        ]
+
+        page, cursor = search_songs(page_size=3)
+        self.assertEqual(page, songs[:3])
+        page, cursor = search_songs(cursor=cursor, page_size=3)
+        self.assertEqual(page, songs[3:6])
+        page, cursor = search_songs(cursor=cursor, page_size=3)
+        self.assertEqual(page, songs[6:])
+        self.assertIsNone(cursor)
+
+    def test_home_keeps_q_and_genre(self):
+        response = self.client.get(reverse("home"), {"q": "doan", "genre": "ballad"})
+        self.assertEqual(list(response.context["songs"]), [self.song])
+        self.assertIsNone(response.context["next_cursor"])
+
+        response = self.client.get(reverse("home"), {"genre": "pop"})
+        self.assertEqual(list(response.context["songs"]), [self.other])
+
+
+# =========================
+# TYPEAHEAD
+# =========================
+class TypeaheadTests(TestCase):
+    def setUp(self):
+        self.artist = Artist.objects.create(name="Đức Phúc")
+        self.quiet = Song.objects.create(title="Hơn Cả Yêu", artist=self.artist)
+        self.popular = Song.objects.create(title="Hẹn Hò", artist=self.artist)
+        user = User.objects.create_user(username="fan", password="secret-pass-123")
+        Favorite.objects.create(user=user, song=self.popular)
+        typeahead.index.rebuild()
+
+    def search(self, q):
+        return self.client.get(reverse("typeahead"), {"q": q}).json()
+
+    def test_prefix_match_ranked_by_favorites(self):
+        data = self.search("H")
+        self.assertEqual([s["id"] for s in data["songs"]], [self.popular.id, self.quiet.id])
+        self.assertEqual(self.search("hon ca")["songs"][0]["title"], "Hơn Cả Yêu")
+        self.assertEqual(self.search("duc p")["artists"], [{"id": self.artist.id, "name": "Đức Phúc"}])
+
+    def test_signals_keep_index_fresh(self):
+        song = Song.objects.create(title="Ngày Đầu Tiên", artist=self.artist)
+        self.assertEqual([s["id"] for s in self.search("ngay dau")["songs"]], [song.id])
+
+        song.title = "Ánh Nắng Của Anh"
+        song.save()
+        self.assertEqual(self.search("ngay")["songs"], [])
+        self.assertEqual([s["id"] for s in self.search("anh nang")["songs"]], [song.id])
+
+        song.delete()
+        self.assertEqual(self.search("anh nang")["songs"], [])
+
+    def test_other_process_replays_changes(self):
+        # chỉ mục của một worker khác: cùng cache, không nhận signal của process này
+        peer = typeahead.TypeaheadIndex()
+        peer.rebuild()
+        songs = peer.songs
+
+        def search(q):
+            peer.checked_at = 0  # bỏ qua khoảng chờ GENERATION_CHECK_SECONDS
+            return peer.search(q)
+
+        song = Song.objects.create(title="Ngày Đầu Tiên", artist=self.artist)
+        self.assertEqual([s["id"] for s in search("ngay dau")["songs"]], [song.id])
+        self.artist.name = "Vũ"
+        self.artist.save()
+        self.assertEqual(search("vu")["artists"], [{"id": self.artist.id, "name": "Vũ"}])
+        user = User.objects.create_user(username="peer", password="secret-pass-123")
+        Favorite.objects.create(user=user, song=self.quiet)
+        Favorite.objects.create(user=User.objects.create_user(username="peer2", password="x-pass-123"),
+                                song=self.quiet)
+        self.assertEqual([s["id"] for s in search("H")["songs"]][:2], [self.quiet.id, self.popular.id])
+        song.delete()
+        self.assertEqual(search("ngay")["songs"], [])
+        # phát lại từng thay đổi, không nạp lại toàn bộ
+        self.assertIs(peer.songs, songs)
+
+        # nhật ký thiếu (cache bị cull) -> nạp lại từ DB
+        Song.objects.create(title="Mưa Tháng Sáu", artist=self.artist)
+        cache.delete(typeahead.CHANGE_KEY % cache.get(typeahead.CHANGES_KEY))
+        self.assertEqual(len(search("mua thang")["songs"]), 1)
+        self.assertIsNot(peer.songs, songs)
+
+    def test_updates_keep_postings_ordered(self):
+        index = typeahead.PrefixIndex()
+        index.bulk_load([(1, "Mưa Hồng", 5), (2, "Mưa Rơi", 3), (3, "Hồng Nhan", 1)])
+        index.set_score(3, 9)
+        index.add(4, "Mưa Bay", 4)
+        index.remove(1)
+        for ranks, ids in index.postings.values():
+            pairs = list(zip(ranks, ids))
+            self.assertEqual(pairs, sorted(pairs))
+        self.assertEqual(index.search("mua"), [4, 2])
+        self.assertEqual(index.search("hong"), [3])
+
+        # tổ hợp hiếm nằm sau phần duyệt thử -> giao mảng id, kết quả vẫn đầy đủ
+        index.bulk_load([(n, "mua hong" if n % 2 else "mua roi", n) for n in range(1, 5001)])
+        index.add(9999, "mua roi hong", 0)
+        self.assertEqual(index.search("mua roi h"), [9999])
+
+    def test_concurrent_first_queries_rebuild_once(self):
+        index = typeahead.TypeaheadIndex()
+        rebuilds = []
+
+        def rebuild():
+            rebuilds.append(1)
+            time.sleep(0.05)
+            index.loaded = True
+            index.checked_at = time.monotonic()
+
+        index.rebuild = rebuild
+        threads = [threading.Thread(target=index.ensure_fresh) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(rebuilds), 1)
+
+
+# =========================
+# STREAM
+# =========================
+class StreamSongTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.data = bytes(range(256)) * 4096  # 1 MiB
+        self.song = Song.objects.create(title="Bài hát", artist=Artist.objects.create(name="Ca sĩ"))
+        self.song.audio_file.save("song.mp3", ContentFile(self.data))
+        self.url = reverse("stream_song", args=[self.song.id])
+
+        self.user = User.objects.create_user(username="premium", password="secret-pass-123")
+        Subscription.objects.create(user=self.user, plan="PREMIUM", is_active=True,
+                                    end_date=timezone.now() + timedelta(days=30))
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_range_request_returns_partial_content(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, HTTP_RANGE="bytes=1000-1999")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 1000-1999/{len(self.data)}")
+        self.assertEqual(self.body(response), self.data[1000:2000])
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-10")
+        self.assertEqual(self.body(response), self.data[-10:])
+
+    def test_full_file_and_conditional_request(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(self.body(response), self.data)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_preview_for_free_users(self):
+        response = self.client.get(self.url)
+        self.assertEqual(int(response["Content-Length"]), PREVIEW_BYTES)
+        self.assertEqual(self.body(response), self.data[:PREVIEW_BYTES])
+
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={PREVIEW_BYTES}-")
+        self.assertEqual(response.status_code, 416)
+
+    def test_expired_subscription_gets_preview(self):
+        Subscription.objects.filter(user=self.user).update(end_date=timezone.now() - timedelta(days=1))
+        self.client.force_login(self.user)
+
+        response = self.client.get(self.url)
+        self.assertEqual(int(response["Content-Length"]), PREVIEW_BYTES)
+
+    async def test_streams_chunks_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        for headers, expected in (({}, self.data), ({"Range": "bytes=1000-199999"}, self.data[1000:200000])):
+            response = await self.async_client.get(self.url, headers=headers)
+            # iterator async: handler ASGI gửi từng chunk thay vì gom cả file vào bộ nhớ
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual(b"".join(chunks), expected)
+
+
+# =========================
+# AUDIUS
+# =========================
+class StubAudiusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.calls += 1
+        time.sleep(server.delay)
+        if server.fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = json.dumps({"data": [{"id": "abc", "title": "Stub track", "user": {"name": "Stub"}}]})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class AudiusClientTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubAudiusHandler)
+        self.server.calls, self.server.delay, self.server.fail = 0, 0, False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        override = override_settings(AUDIUS_API_URL=f"http://127.0.0.1:{self.server.server_port}/v1")
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_repeat_lookups_hit_cache(self):
+        client = AudiusClient()
+        self.assertEqual(client.get_track("abc")["title"], "Stub track")
+        self.assertEqual(client.get_track("abc")["title"], "Stub track")
+        self.assertEqual(self.server.calls, 1)
+
+    def test_concurrent_lookups_are_coalesced(self):
+        client = AudiusClient()
+        self.server.delay = 0.2
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.get_track("abc"))) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(self.server.calls, 1)
+
+    def test_stale_entry_served_when_upstream_fails(self):
+        client = AudiusClient(ttl=0)
+        client.get_track("abc")
+        self.server.fail = True
+
+        self.assertEqual(client.get_track("abc")["title"], "Stub track")
+        self.assertRaises(AudiusError, client.get_track, "other")
+
+    def test_async_lookups_are_coalesced(self):
+        client = AudiusClient()
+        self.server.delay = 0.2
+
+        async def lookups():
+            return await asyncio.gather(*(client.aget_track("abc") for _ in range(10)))
+
+        results = asyncio.run(lookups())
+        self.assertEqual([r["title"] for r in results], ["Stub track"] * 10)
+        self.assertEqual(self.server.calls, 1)
+
+    def test_async_stale_entry_served_when_upstream_fails(self):
+        client = AudiusClient(ttl=0)
+        client.get_track("abc")
+        self.server.fail = True
+
+        self.assertEqual(asyncio.run(client.aget_track("abc"))["title"], "Stub track")
+        with self.assertRaises(AudiusError):
+            asyncio.run(client.aget_track("other"))
+
+    async def test_play_track_view_runs_async(self):
+        user = await User.objects.acreate(username="async-listener")
+        await self.async_client.aforce_login(user)
+        self.addCleanup(plays.buffer.events.clear)
+
+        response = await self.async_client.get(reverse("play_track", args=[7]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "ads.html")
+        self.assertEqual(response.context["track"]["title"], "Stub track")
+        self.assertEqual([e.song_id for e in plays.buffer.events], [7])
+
+        # tải lại trang ngay không tính thêm lượt nghe
+        await self.async_client.get(reverse("play_track", args=[7]))
+        self.assertEqual([e.song_id for e in plays.buffer.events], [7])
+
+    def test_play_track_under_wsgi_uses_pooled_session(self):
+        audius.client.clear()
+        self.addCleanup(audius.client.clear)
+        self.client.force_login(User.objects.create_user(username="wsgi-listener"))
+        self.addCleanup(plays.buffer.events.clear)
+        sessions = len(audius.client._async_sessions)
+
+        for _ in range(2):
+            response = self.client.get(reverse("play_track", args=[8]))
+            self.assertEqual(response.context["track"]["title"], "Stub track")
+        # không tạo client httpx cho event loop dùng một lần của async_to_sync
+        self.assertEqual(len(audius.client._async_sessions), sessions)
+        self.assertEqual(self.server.calls, 1)
+
+    def test_asgi_shutdown_closes_async_client(self):
+        from music_website.asgi import application
+
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        async def lifespan():
+            session = audius.client.async_session()
+            await application({"type": "lifespan"}, receive, send)
+            return session
+
+        self.assertTrue(asyncio.run(lifespan()).is_closed)
+        self.assertEqual([m["type"] for m in sent], ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+
+
+# =========================
+# FAVORITE
+# =========================
+class FavoriteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="fan", password="secret-pass-123")
+        artist = Artist.objects.create(name="Hoàng Dũng")
+        self.song = Song.objects.create(title="Nàng Thơ", artist=artist)
+        self.other = Song.objects.create(title="Yêu Em 2 Ngày", artist=artist)
+        self.client.force_login(self.user)
+
+    def toggle(self, song):
+        return self.client.post(reverse("add_favorite"), {"song_id": song.id},
+                                HTTP_X_REQUESTED_WITH="XMLHttpRequest").json()
+
+    def test_toggle_adds_then_removes(self):
+        self.assertTrue(self.toggle(self.song)["is_favorite"])
+        self.assertTrue(Favorite.objects.filter(user=self.user, song=self.song).exists())
+
+        self.assertFalse(self.toggle(self.song)["is_favorite"])
+        self.assertFalse(Favorite.objects.filter(user=self.user, song=self.song).exists())
+
+    def test_home_reads_favorites_from_cache(self):
+        Favorite.objects.create(user=self.user, song=self.song)
+        self.client.get(reverse("home"))  # nạp cache
+
+        self.toggle(self.other)
+        response = self.client.get(reverse("home"))  # đọc lại sau khi đổi
+        self.assertEqual(response.context["favorite_song_ids"], {self.song.id, self.other.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("home"))
+
+        self.assertEqual(response.context["favorite_song_ids"], {self.song.id, self.other.id})
+        self.assertFalse([q for q in queries.captured_queries if "musicapp_favorite" in q["sql"]])
+
+    def test_stale_set_from_other_process_not_served(self):
+        stale = favorites.favorite_ids(self.user)
+        stale_key = favorites._key(self.user.id)
+        favorites.toggle(self.user, self.song)
+        # process khác đọc DB trước khi ghi rồi cache lại tập cũ
+        cache.set(stale_key, stale, favorites.CACHE_TTL)
+
+        self.assertEqual(favorites.favorite_ids(self.user), {self.song.id})
+        favorites.toggle(self.user, self.song)
+        self.assertEqual(favorites.favorite_ids(self.user), frozenset())
+
+
+# =========================
+# THUMBNAILS
+# =========================
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.artist = Artist.objects.create(name="Vũ")
+
+    def jpeg(self, color="red", size=(800, 800)):
+        out = BytesIO()
+        Image.new("RGB", size, color).save(out, "JPEG")
+        return ContentFile(out.getvalue(), name="cover.jpg")
+
+    def test_upload_generates_hashed_derivatives(self):
+        song = Song.objects.create(title="Lạ Lùng", artist=self.artist, cover_image=self.jpeg())
+        self.assertEqual(jobs.run_pending(), 1)
+        song.refresh_from_db()
+
+        self.assertTrue(song.cover_hash)
+        for width in thumbnails.WIDTHS:
+            for ext, _ in thumbnails.FORMATS:
+                name = thumbnails.thumb_name(song.cover_hash, width, ext)
+                self.assertTrue(default_storage.exists(name), name)
+        with default_storage.open(thumbnails.thumb_name(song.cover_hash, 96, "webp")) as f:
+            self.assertEqual(Image.open(f).size, (96, 96))
+
+        html = Template("{% load covers %}{% cover_picture song '50px' 'song-avatar' %}").render(
+            Context({"song": song}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(f"{song.cover_hash}-600.webp 600w", html)
+
+    def test_same_image_shares_derivatives_and_new_upload_rehashes(self):
+        first = Song.objects.create(title="A", artist=self.artist, cover_image=self.jpeg())
+        second = Song.objects.create(title="B", artist=self.artist, cover_image=self.jpeg())
+        jobs.run_pending()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.cover_hash, second.cover_hash)
+
+        second.cover_image = self.jpeg(color="blue")
+        second.save()
+        jobs.run_pending()
+        second.refresh_from_db()
+        self.assertNotEqual(second.cover_hash, first.cover_hash)
+
+        second.title = "B2"
+        second.save()
+        second.refresh_from_db()
+        self.assertTrue(second.cover_hash)
+
+
+# =========================
+# AUDIO METADATA
+# =========================
+def fake_mp3(frames, title="Test", bitrate=128):
+    """
+    File MP3 tối giản: tag ID3v2.3 (TIT2) + các frame MPEG-1 Layer III 44.1 kHz (128 hoặc 320 kbps).
+    """
+    text = b"\x03" + title.encode()
+    tit2 = b"TIT2" + len(text).to_bytes(4, "big") + b"\x00\x00" + text
+    id3 = b"ID3\x03\x00\x00" + bytes([0, 0, 0, len(tit2)]) + tit2
+    if bitrate == 320:
+        frame = b"\xff\xfb\xe0\x64" + bytes(1040)  # 1044 byte mỗi frame
+    else:
+        frame = b"\xff\xfb\x90\x64" + bytes(413)  # 417 byte mỗi frame
+    return id3 + frame * frames
+
+
+class AudioMetadataTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_probe_counts_frames(self):
+        data = fake_mp3(1000, title="Lạc Trôi")
+        meta = audiometa.probe_file(BytesIO(data), len(data))
+
+        self.assertEqual(meta["frames"], 1000)
+        self.assertAlmostEqual(meta["duration"], 1000 * 1152 / 44100)
+        self.assertEqual(meta["sample_rate"], 44100)
+        self.assertEqual(round(meta["bitrate"] / 1000), 128)
+        self.assertEqual(meta["tags"]["title"], "Lạc Trôi")
+
+    def test_upload_fills_song_fields(self):
+        song = Song.objects.create(title="Lạc Trôi", artist=Artist.objects.create(name="Sơn Tùng"),
+                                   audio_file=ContentFile(fake_mp3(500), name="lac_troi.mp3"))
+        jobs.run_pending()
+        song.refresh_from_db()
+
+        self.assertAlmostEqual(song.duration_seconds, 500 * 1152 / 44100, places=2)
+        self.assertEqual(song.bitrate, 128)
+        self.assertEqual(song.duration, round(song.duration_seconds / 60, 2))
+
+    def test_not_an_mp3(self):
+        data = b"not audio at all" * 100
+        with self.assertRaises(audiometa.AudioMetadataError):
+            audiometa.probe_file(BytesIO(data), len(data))
+
+
+class ContentStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.artist = Artist.objects.create(name="Sơn Tùng")
+        self.data = fake_mp3(50)
+
+    def make_song(self, title, data, name="song.mp3"):
+        return Song.objects.create(title=title, artist=self.artist,
+                                   audio_file=ContentFile(data, name=name))
+
+    def test_same_content_stored_once(self):
+        first = self.make_song("Một", self.data, "a.mp3")
+        second = self.make_song("Hai", self.data, "b.mp3")
+
+        self.assertEqual(first.audio_file.name, second.audio_file.name)
+        self.assertTrue(first.audio_file.name.startswith("audio/"))
+        self.assertEqual(MediaBlob.objects.get(name=first.audio_file.name).refs, 2)
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(self.media_root)), 1)
+
+    def test_delete_keeps_shared_blob(self):
+        first = self.make_song("Một", self.data)
+        second = self.make_song("Hai", self.data)
+        name = first.audio_file.name
+
+        first.delete()
+        self.assertTrue(content_storage.exists(name))
+        second.delete()
+        self.assertFalse(content_storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_untracked_shared_file_survives_delete(self):
+        # file có từ trước MediaBlob (chưa chạy dedupe_media), hai bài cùng dùng
+        name = default_storage.save("audio/legacy.mp3", ContentFile(self.data))
+        first = Song.objects.create(title="Một", artist=self.artist)
+        second = Song.objects.create(title="Hai", artist=self.artist)
+        Song.objects.filter(pk__in=[first.pk, second.pk]).update(audio_file=name)
+
+        Song.objects.get(pk=first.pk).delete()
+        self.assertTrue(content_storage.exists(name))
+
+        # migration 0008 đếm tham chiếu của các file đã có
+        migration = importlib.import_module("musicapp.migrations.0008_content_addressed_media")
+        migration.track_existing_files(django_apps, None)
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 1)
+        Song.objects.get(pk=second.pk).delete()
+        self.assertFalse(content_storage.exists(name))
+
+    def test_save_racing_last_delete_keeps_file(self):
+        storage = ContentAddressedStorage()
+        name = storage.save("audio/a.mp3", ContentFile(self.data))
+        add_ref = storage.add_ref
+
+        def delete_then_add_ref(blob, size=None):
+            # bài cuối dùng blob bị xóa sau khi lượt tải lên thấy file đã có
+            storage.delete(blob)
+            self.assertFalse(storage.exists(blob))
+            add_ref(blob, size)
+
+        storage.add_ref = delete_then_add_ref
+        self.assertEqual(storage.save("audio/b.mp3", ContentFile(self.data)), name)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 1)
+
+    def test_replacing_file_releases_old_blob(self):
+        song = self.make_song("Một", self.data)
+        song = Song.objects.get(pk=song.pk)
+        old = song.audio_file.name
+
+        song.audio_file = ContentFile(fake_mp3(60), name="new.mp3")
+        song.save()
+
+        self.assertNotEqual(song.audio_file.name, old)
+        self.assertFalse(content_storage.exists(old))
+
+    def test_dedupe_media_command(self):
+        for name in ("audio/x.mp3", "audio/y.mp3", "audio/orphan.mp3"):
+            default_storage.save(name, ContentFile(self.data))
+        first = Song.objects.create(title="Một", artist=self.artist)
+        second = Song.objects.create(title="Hai", artist=self.artist)
+        Song.objects.filter(pk=first.pk).update(audio_file="audio/x.mp3")
+        Song.objects.filter(pk=second.pk).update(audio_file="audio/y.mp3")
+
+        out = StringIO()
+        call_command("dedupe_media", workers=1, stdout=out)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.audio_file.name, second.audio_file.name)
+        self.assertEqual(MediaBlob.objects.get(name=first.audio_file.name).refs, 2)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "audio")),
+                         [first.audio_file.name.split("/")[1]])
+        self.assertIn(f"({2 * len(self.data)} byte)", out.getvalue())
+
+
+@override_settings(FFMPEG_BINARY="")
+class TranscodeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        # ~52 giây ở 128 kbps
+        self.song = Song.objects.create(title="Lạc Trôi", artist=Artist.objects.create(name="Sơn Tùng"),
+                                        audio_file=ContentFile(fake_mp3(2000), name="lac_troi.mp3"))
+        self.song.refresh_from_db()
+        transcode.transcode_song(self.song)
+        # bậc cao chỉ dành cho Premium (giả lập kết quả có ffmpeg)
+        Rendition.objects.create(song=self.song, bitrate=320, codecs=transcode.AAC_CODEC,
+                                 segment_ext="ts", path="hls/none/320", durations=[6.0] * 9)
+
+    def test_split_without_ffmpeg(self):
+        rendition = Rendition.objects.get(song=self.song, bitrate=128)
+        self.assertAlmostEqual(sum(rendition.durations), 2000 * 1152 / 44100, places=1)
+        self.assertTrue(all(d <= transcode.SEGMENT_SECONDS + 0.03 for d in rendition.durations))
+
+        with default_storage.open(rendition.segment_path(1), "rb") as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b"ID3"))
+        self.assertIn(b"com.apple.streaming.transportStreamTimestamp", data[:80])
+        self.assertIsNotNone(audiometa.parse_frame_header(data[data.index(b"\xff\xfb"):][:4]))
+
+    def test_free_user_gets_low_rungs_and_preview(self):
+        master = self.client.get(reverse("hls_master", args=[self.song.id]))
+        self.assertEqual(master["Content-Type"], "application/vnd.apple.mpegurl")
+        self.assertIn("BANDWIDTH=128000", master.content.decode())
+        self.assertNotIn("BANDWIDTH=320000", master.content.decode())
+
+        playlist = self.client.get(reverse("hls_playlist", args=[self.song.id, 128])).content.decode()
+        self.assertEqual(playlist.count("#EXTINF"), 5)  # các segment bắt đầu trong 30 giây đầu
+        self.assertTrue(playlist.rstrip().endswith("#EXT-X-ENDLIST"))
+
+        self.assertEqual(self.client.get(reverse("hls_segment", args=[self.song.id, 128, 0])).status_code, 200)
+        self.assertEqual(self.client.get(reverse("hls_segment", args=[self.song.id, 128, 5])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("hls_playlist", args=[self.song.id, 320])).status_code, 404)
+
+    @override_settings(FFMPEG_BINARY="")
+    def test_free_user_falls_back_when_source_above_free_bitrate(self):
+        song = Song.objects.create(title="Nơi Này Có Anh", artist=self.song.artist,
+                                   audio_file=ContentFile(fake_mp3(300, bitrate=320), name="noi_nay.mp3"))
+        tasks.process_audio(song.id)  # đọc metadata rồi cắt HLS như job nền
+        song.refresh_from_db()
+        self.assertEqual(song.bitrate, 320)
+        self.assertEqual(list(song.renditions.values_list("bitrate", flat=True)), [320])
+
+        response = self.client.get(reverse("hls_master", args=[song.id]))
+        self.assertRedirects(response, reverse("stream_song", args=[song.id]), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse("hls_playlist", args=[song.id, 320])).status_code, 404)
+
+        user = User.objects.create_user(username="vip", password="secret-pass-123")
+        Subscription.objects.create(user=user, plan="PREMIUM", is_active=True,
+                                    end_date=timezone.now() + timedelta(days=30))
+        self.client.force_login(user)
+        master = self.client.get(reverse("hls_master", args=[song.id])).content.decode()
+        self.assertIn("BANDWIDTH=320000", master)
+
+    def test_premium_gets_all_rungs(self):
+        user = User.objects.create_user(username="vip", password="pw")
+        Subscription.objects.create(user=user, plan="PREMIUM", is_active=True,
+                                    end_date=timezone.now() + timedelta(days=30))
+        self.client.force_login(user)
+
+        master = self.client.get(reverse("hls_master", args=[self.song.id])).content.decode()
+        self.assertIn("BANDWIDTH=320000", master)
+        playlist = self.client.get(reverse("hls_playlist", args=[self.song.id, 128])).content.decode()
+        self.assertEqual(playlist.count("#EXTINF"), len(Rendition.objects.get(song=self.song, bitrate=128).durations))
+        response = self.client.get(reverse("hls_segment", args=[self.song.id, 128, 8]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "audio/mpeg")
+
+
+@jobs.task(max_attempts=2)
+def flaky_task(marker):
+    flaky_task.calls.append(marker)
+    if len(flaky_task.calls) == 1:
+        raise RuntimeError("lỗi tạm thời")
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        flaky_task.calls = []
+
+    def test_song_save_enqueues_processing_once(self):
+        song = Song.objects.create(title="Lạc Trôi", artist=Artist.objects.create(name="Sơn Tùng"),
+                                   audio_file=ContentFile(fake_mp3(50), name="a.mp3"))
+        job = Job.objects.get()
+        self.assertEqual(job.task, "musicapp.tasks.process_audio")
+        self.assertEqual(job.kwargs, {"song_id": song.id})
+
+        # lưu lại (không đổi file) và cùng idempotency key -> không có job mới
+        song.title = "Lạc Trôi (Remix)"
+        song.save()
+        jobs.enqueue(tasks.process_audio, key=job.idempotency_key, song_id=song.id)
+        self.assertEqual(Job.objects.count(), 1)
+
+    @override_settings(FFMPEG_BINARY="")
+    def test_reupload_of_earlier_file_is_processed_again(self):
+        song = Song.objects.create(title="Lạc Trôi", artist=Artist.objects.create(name="Sơn Tùng"),
+                                   audio_file=ContentFile(fake_mp3(50), name="a.mp3"))
+        jobs.run_pending()
+        first = Song.objects.get(pk=song.pk).duration_seconds
+
+        for frames, name in ((100, "b.mp3"), (50, "a.mp3")):  # A -> B -> A
+            song.audio_file = ContentFile(fake_mp3(frames), name=name)
+            song.save()
+            self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(Song.objects.get(pk=song.pk).duration_seconds, first)
+
+    def test_priority_order(self):
+        low = jobs.enqueue(flaky_task, priority=0, marker="low")
+        high = jobs.enqueue(flaky_task, priority=10, marker="high")
+        self.assertEqual(jobs.claim("w").id, high.id)
+        self.assertEqual(jobs.claim("w").id, low.id)
+        self.assertIsNone(jobs.claim("w"))
+
+    def test_retry_with_backoff_then_success(self):
+        job = jobs.enqueue(flaky_task, marker="x")
+        with self.assertLogs("musicapp.jobs", "WARNING"):
+            self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn("lỗi tạm thời", job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(jobs.run_pending(), 0)  # chưa tới hạn chạy lại
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(flaky_task.calls, ["x", "x"])
+
+    def test_gives_up_after_max_attempts(self):
+        job = jobs.enqueue(flaky_task, unexpected=1)  # sai tham số -> lần nào cũng lỗi
+        with self.assertLogs("musicapp.jobs", "WARNING"):
+            for _ in range(flaky_task.max_attempts):
+                Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+                jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("TypeError", job.last_error)
+
+
+class RecommendTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        override = override_settings(RECOMMEND_TABLE_PATH=os.path.join(self.tmp, "recommend.npz"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(recommend.store.reset)
+
+        artist = Artist.objects.create(name="Nhiều ca sĩ")
+        self.songs = {name: Song.objects.create(title=name, artist=artist, genre=genre)
+                      for name, genre in [("Ballad 1", "Ballad"), ("Ballad 2", "Ballad"),
+                                          ("Rock 1", "Rock"), ("Rock 2", "Rock"), ("Pop 1", "Pop")]}
+        self.users = [User.objects.create_user(username=f"u{i}", password="pw") for i in range(4)]
+        likes = {0: ["Ballad 1", "Ballad 2"], 1: ["Ballad 1", "Ballad 2", "Pop 1"],
+                 2: ["Rock 1", "Rock 2"], 3: ["Rock 1"]}
+        for i, names in likes.items():
+            for name in names:
+                Favorite.objects.create(user=self.users[i], song=self.songs[name])
+        # playlist cũng được tính (trọng số thấp hơn)
+        playlist = Playlist.objects.create(user=self.users[3], name="Rock")
+        add_song(playlist, self.songs["Rock 2"])
+        recommend.rebuild()
+
+    def test_build_table_cosine(self):
+        table = recommend.build_table([1, 1, 2, 2, 3], [10, 20, 10, 20, 30], [1, 1, 1, 1, 1], k=2)
+        [(song_id, score)] = table.similar(10)
+        self.assertEqual(song_id, 20)
+        self.assertAlmostEqual(score, 1.0, places=5)
+        self.assertEqual(table.similar(30), [])
+        self.assertEqual(table.similar(99), [])
+
+    def test_because_you_liked(self):
+        url = reverse("because_you_liked", args=[self.songs["Ballad 1"].id])
+        data = self.client.get(url).json()
+
+        self.assertEqual(data["song"]["title"], "Ballad 1")
+        self.assertEqual(data["songs"][0]["title"], "Ballad 2")
+        self.assertNotIn("Rock 1", [s["title"] for s in data["songs"]])
+
+    def test_chat_ai_uses_history(self):
+        listener = User.objects.create_user(username="new", password="pw")
+        Favorite.objects.create(user=listener, song=self.songs["Rock 1"])
+        self.client.force_login(listener)
+
+        data = self.client.get(reverse("chat_ai"), {"mood": "gợi ý gì đó"}).json()
+        self.assertEqual(data["songs"][0]["title"], "Rock 2")
+        self.assertNotIn("Rock 1", [s["title"] for s in data["songs"]])
+
+    def test_chat_ai_cold_start_uses_mood(self):
+        data = self.client.get(reverse("chat_ai"), {"mood": "hôm nay tôi buồn"}).json()
+
+        self.assertIn("Ballad", data["reply"])
+        self.assertEqual({s["genre"] for s in data["songs"]}, {"Ballad"})
+
+
+# =========================
+# LƯỢT NGHE / THỊNH HÀNH
+# =========================
+class PlayStatsTests(TestCase):
+    def setUp(self):
+        plays.buffer.flush()
+        cache.clear()
+        self.artist = Artist.objects.create(name="Đen")
+        self.songs = [Song.objects.create(title=f"Bài {i}", artist=self.artist) for i in range(4)]
+
+    def play(self, song, count=1, ago=timedelta(0)):
+        at = timezone.now() - ago
+        PlayEvent.objects.bulk_create(PlayEvent(song=song, played_at=at) for _ in range(count))
+
+    def test_buffer_flushes_in_batches(self):
+        buffer = plays.PlayBuffer(flush_size=3, flush_seconds=60)
+        buffer.add(self.songs[0].id)
+        buffer.add(self.songs[1].id)
+        self.assertEqual(PlayEvent.objects.count(), 0)
+
+        buffer.add(self.songs[0].id, source="audius")
+        self.assertEqual(PlayEvent.objects.count(), 3)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_rollup_is_incremental_and_decays(self):
+        self.play(self.songs[0], ago=timedelta(days=1))
+        self.play(self.songs[0])
+        self.assertEqual(plays.rollup(), 2)
+        self.assertEqual(plays.rollup(), 0)
+
+        stats = SongStats.objects.get(song=self.songs[0])
+        self.assertEqual(stats.plays, 2)
+        # lượt nghe hôm qua còn e^-1 ở bộ đếm 24 giờ, e^(-1/7) ở bộ đếm 7 ngày
+        self.assertAlmostEqual(plays.decayed(stats, "trend_24h"), 1 + 1 / 2.718281828, places=2)
+        self.assertAlmostEqual(plays.decayed(stats, "trend_7d"), 1 + 0.866878, places=2)
+
+        self.play(self.songs[0])
+        self.assertEqual(plays.rollup(batch=1), 1)
+        self.assertEqual(SongStats.objects.get(song=self.songs[0]).plays, 3)
+
+    def test_rollup_counts_late_committed_events(self):
+        self.play(self.songs[0], 2)
+        # lô có id nhỏ hơn commit sau khi job đã cộng lô id lớn hơn
+        late = PlayEvent.objects.order_by("id").first()
+        late.delete()
+        self.assertEqual(plays.rollup(), 1)
+
+        late.save(force_insert=True)
+        self.assertEqual(plays.rollup(), 1)
+        self.assertEqual(SongStats.objects.get(song=self.songs[0]).plays, 2)
+        self.assertFalse(PlayEvent.objects.filter(rolled_up=False).exists())
+
+    def test_rollup_skips_deleted_songs(self):
+        gone = Song.objects.create(title="Đã xóa", artist=self.artist)
+        self.play(gone)
+        gone.delete()
+
+        self.assertEqual(plays.rollup(), 1)
+        self.assertFalse(SongStats.objects.exists())
+
+    def test_trending_shelf_and_popular_sort(self):
+        self.play(self.songs[1], 5, ago=timedelta(days=20))  # nghe nhiều nhưng đã cũ
+        self.play(self.songs[2], 3)
+        self.play(self.songs[3], 1)
+        plays.rollup()
+
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.context["trending"][:2], [self.songs[2], self.songs[3]])
+
+        page, cursor = search_songs(sort=SORT_POPULAR, page_size=2)
+        self.assertEqual(page, [self.songs[1], self.songs[2]])
+        page, cursor = search_songs(sort=SORT_POPULAR, cursor=parse_cursor(cursor, SORT_POPULAR), page_size=2)
+        self.assertEqual(page, [self.songs[3], self.songs[0]])  # bài chưa ai nghe xếp cuối
+        self.assertIsNone(cursor)
+
+        response = self.client.get(reverse("home"), {"sort": "popular"})
+        self.assertEqual(response.context["songs"][0], self.songs[1])
+        self.assertEqual(parse_cursor("rác", SORT_POPULAR), None)
+
+    def test_popular_sort_uses_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("kế hoạch truy vấn của SQLite")
+        plan = Song.objects.order_by("-play_count", "id")[:24].explain()
+        self.assertIn("song_popular_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_record_play_endpoint(self):
+        url = Template("{% load player %}{% play_url song_id %}").render(Context({"song_id": self.songs[0].id}))
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(url).status_code, 204)
+
+        plays.buffer.flush()
+        event = PlayEvent.objects.get()
+        self.assertEqual((event.song_id, event.user_id, event.source), (self.songs[0].id, None, "player"))
+
+    def test_record_play_requires_token(self):
+        path = reverse("record_play", args=[self.songs[0].id])
+        self.assertEqual(self.client.post(path).status_code, 403)
+        # token của bài khác
+        token = plays.play_token(self.songs[1].id)
+        self.assertEqual(self.client.post(path, QUERY_STRING=f"t={token}").status_code, 403)
+        plays.buffer.flush()
+        self.assertFalse(PlayEvent.objects.exists())
+
+    def test_record_play_rate_limited(self):
+        def post(song_id):
+            return self.client.post(reverse("record_play", args=[song_id]), QUERY_STRING=f"t={plays.play_token(song_id)}")
+
+        self.assertEqual(post(self.songs[0].id).status_code, 204)
+        self.assertEqual(post(self.songs[0].id).status_code, 429)  # nghe lại ngay
+        for song_id in range(1000, 1000 + plays.PLAY_RATE_LIMIT - 1):
+            self.assertEqual(post(song_id).status_code, 204)
+        self.assertEqual(post(self.songs[1].id).status_code, 429)
+
+        # IP khác vẫn ghi được
+        response = self.client.post(reverse("record_play", args=[self.songs[1].id]),
+                                    QUERY_STRING=f"t={plays.play_token(self.songs[1].id)}", REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(response.status_code, 204)
+        plays.buffer.flush()
+
+
+# =========================
+# CACHE TRANG / FRAGMENT
+# =========================
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.artist = Artist.objects.create(name="Hoàng Thùy Linh")
+        self.song = Song.objects.create(title="See Tình", artist=self.artist, genre="Pop")
+        self.user = User.objects.create_user(username="fan", password="secret-pass-123")
+
+    def test_anonymous_home_served_from_cache_until_catalog_changes(self):
+        self.client.get(reverse("home"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, "See Tình")
+
+        Song.objects.create(title="Bo Xì Bo", artist=self.artist, genre="Pop")
+        self.assertContains(self.client.get(reverse("home")), "Bo Xì Bo")
+
+        self.artist.name = "HTL"
+        self.artist.save()
+        self.assertContains(self.client.get(reverse("home")), "HTL")
+
+    def test_shared_page_has_no_csrf_token(self):
+        first = Client(enforce_csrf_checks=True)
+        first.get(reverse("home"))
+        second = Client(enforce_csrf_checks=True)
+        response = second.get(reverse("home"))  # từ cache dùng chung
+
+        token = second.cookies["csrftoken"].value
+        self.assertNotIn(first.cookies["csrftoken"].value, response.content.decode())
+        self.assertNotIn(token, response.content.decode())
+
+        # JS gửi token đọc từ cookie
+        url = Template("{% load player %}{% play_url song_id %}").render(Context({"song_id": self.song.id}))
+        self.assertEqual(second.post(url).status_code, 403)
+        self.assertEqual(second.post(url, HTTP_X_CSRFTOKEN=token).status_code, 204)
+        plays.buffer.events.clear()
+
+    def test_etag_not_modified(self):
+        response = self.client.get(reverse("home"))
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        response = self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Song.objects.create(title="Kẻ Cắp Gặp Bà Già", artist=self.artist)
+        self.assertEqual(self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_user_state_overlaid_on_shared_grid(self):
+        self.client.get(reverse("home"))  # lưới được cache bởi khách
+        Favorite.objects.create(user=self.user, song=self.song)
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, "💔 Bỏ yêu thích")
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "musicapp_song"' in q["sql"]])
+
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        favorites.toggle(self.user, self.song)
+        response = self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "❤️ Thêm yêu thích")
+
+    def test_playlist_list_etag_follows_playlist_changes(self):
+        self.client.force_login(self.user)
+        playlist = Playlist.objects.create(user=self.user, name="Chill")
+        etag = self.client.get(reverse("playlist_list"))["ETag"]
+        self.assertEqual(self.client.get(reverse("playlist_list"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        add_song(playlist, self.song)
+        response = self.client.get(reverse("playlist_list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "See Tình")
+
+    def test_versions_are_scoped(self):
+        before = pagecache.versions(("favorite", 1), ("favorite", 2))
+        pagecache.bump("favorite", 1)
+        after = pagecache.versions(("favorite", 1), ("favorite", 2))
+        self.assertNotEqual(before.split(".")[0], after.split(".")[0])
+        self.assertEqual(before.split(".")[1], after.split(".")[1])
+
+
+# =========================
+# DATABASE
+# =========================
+class DatabaseTuningTests(TestCase):
+    def test_sqlite_pragmas_applied_on_connect(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("chỉ áp dụng cho SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], -64 * 1024)
+            cursor.execute("PRAGMA temp_store")
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+
+    def test_genre_filter_uses_index(self):
+        Song.objects.create(title="Nàng Thơ", artist=Artist.objects.create(name="Hoàng Dũng"), genre="Ballad")
+        songs = filter_songs(genre="BALLAD")
+        self.assertEqual(songs.count(), 1)
+        if connection.vendor == "sqlite":
+            plan = songs.explain()
+            self.assertIn("musicapp_song_genre_ref_id", plan)
+            self.assertNotIn("SCAN musicapp_song", plan)
+
+
+# =========================
+# IMPORT CATALOG
+# =========================
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.addCleanup(shutil.rmtree, self.source)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        Artist.objects.create(name="Sơn Tùng")
+        with open(os.path.join(self.source, "a.mp3"), "wb") as f:
+            f.write(fake_mp3(50))
+        self.manifest = os.path.join(self.source, "catalog.csv")
+        with open(self.manifest, "w", encoding="utf-8") as f:
+            f.write("title,artist,genre,duration,release_date,audio\n"
+                    "Lạc Trôi,Sơn Tùng,Pop,4.2,2017-01-01,a.mp3\n"
+                    ",Không tên,Pop,,,\n"
+                    "Nàng Thơ,Hoàng Dũng,Ballad,,,a.mp3\n"
+                    "Yêu Em 2 Ngày,Dương Domic,Pop,,,\n")
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command("import_catalog", self.manifest, "--batch-size", "2", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_creates_songs_artists_and_blobs(self):
+        out, err = self.run_import()
+
+        self.assertIn("3 bài mới", out)
+        self.assertIn("Bản ghi 2", err)
+        self.assertEqual(Artist.objects.filter(name="Sơn Tùng").count(), 1)
+        song = Song.objects.get(title="Lạc Trôi")
+        self.assertEqual(song.artist.name, "Sơn Tùng")
+        self.assertEqual(song.search_key, "lac troi son tung")
+        self.assertEqual(search_songs("lac tr")[0], [song])
+        self.assertEqual(song.release_date.isoformat(), "2017-01-01")
+        # cùng một file -> một blob, hai tham chiếu
+        self.assertEqual(Song.objects.get(title="Nàng Thơ").audio_file.name, song.audio_file.name)
+        self.assertEqual(MediaBlob.objects.get().refs, 2)
+        self.assertEqual(Job.objects.filter(task="musicapp.tasks.process_audio").count(), 2)
+        self.assertEqual(dict(Genre.objects.values_list("key", "song_count")), {"pop": 2, "ballad": 1})
+        self.assertEqual(song.artist.song_count, 1)
+
+    def test_rerun_is_idempotent(self):
+        self.run_import()
+        out, _ = self.run_import()
+
+        self.assertIn("0 bài mới, 3 bài đã có", out)
+        self.assertEqual(Song.objects.count(), 3)
+        self.assertEqual(MediaBlob.objects.get().refs, 2)
+
+    def test_resumes_from_checkpoint(self):
+        with open(f"{self.manifest}.checkpoint", "w") as f:
+            json.dump({"manifest": self.manifest, "row": 2}, f)
+
+        out, _ = self.run_import("--no-process")
+
+        self.assertEqual(set(Song.objects.values_list("title", flat=True)), {"Nàng Thơ", "Yêu Em 2 Ngày"})
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(os.path.exists(f"{self.manifest}.checkpoint"))
+
+
+# =========================
+# FACET
+# =========================
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="fan", password="secret-pass-123")
+        self.son = Artist.objects.create(name="Sơn Tùng")
+        self.den = Artist.objects.create(name="Đen")
+        self.a = Song.objects.create(title="Lạc Trôi", artist=self.son, genre="Pop")
+        self.b = Song.objects.create(title="Nơi Này Có Anh", artist=self.son, genre="pop ")
+        self.c = Song.objects.create(title="Mang Tiền Về Cho Mẹ", artist=self.den, genre="Rap")
+
+    def counts(self):
+        return (dict(Genre.objects.values_list("key", "song_count")),
+                dict(Artist.objects.values_list("name", "song_count")))
+
+    def test_genres_are_normalized_and_counted(self):
+        self.assertEqual(Genre.objects.get(key="pop").name, "Pop")
+        self.assertEqual(self.a.genre_ref_id, self.b.genre_ref_id)
+        self.assertEqual(self.counts(), ({"pop": 2, "rap": 1}, {"Sơn Tùng": 2, "Đen": 1}))
+
+    def test_counts_follow_updates_and_deletes(self):
+        song = Song.objects.get(pk=self.b.pk)
+        song.genre, song.artist = "Rap", self.den
+        song.save()
+        self.assertEqual(self.counts(), ({"pop": 1, "rap": 2}, {"Sơn Tùng": 1, "Đen": 2}))
+
+        self.c.delete()
+        self.assertEqual(self.counts(), ({"pop": 1, "rap": 1}, {"Sơn Tùng": 1, "Đen": 1}))
+
+    def test_favorites_counted_per_artist(self):
+        fav = Favorite.objects.create(user=self.user, song=self.a)
+        self.assertEqual(Artist.objects.get(pk=self.son.pk).favorite_count, 1)
+        fav.delete()
+        self.assertEqual(Artist.objects.get(pk=self.son.pk).favorite_count, 0)
+
+    def test_recount_repairs_drift(self):
+        Genre.objects.update(song_count=0)
+        Artist.objects.update(song_count=7, favorite_count=3)
+        facets.recount()
+        self.assertEqual(self.counts(), ({"pop": 2, "rap": 1}, {"Sơn Tùng": 2, "Đen": 1}))
+        self.assertEqual(Artist.objects.get(pk=self.son.pk).favorite_count, 0)
+
+    def test_unfiltered_facets_read_counters_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            genres = facets.genre_counts()
+        self.assertEqual([(g["key"], g["count"]) for g in genres], [("pop", 2), ("rap", 1)])
+        self.assertFalse([q for q in queries.captured_queries if "musicapp_song" in q["sql"]])
+
+    def test_facet_endpoint_respects_filters(self):
+        data = self.client.get(reverse("facets"), {"q": "noi nay"}).json()
+        self.assertEqual(data["genres"], [{"key": "pop", "name": "Pop", "count": 1}])
+        self.assertEqual([(a["name"], a["count"]) for a in data["artists"]], [("Sơn Tùng", 1)])
+
+        data = self.client.get(reverse("facets"), {"genre": "Rap"}).json()
+        self.assertEqual([(a["name"], a["count"]) for a in data["artists"]], [("Đen", 1)])
+
+    def test_home_lists_genres_with_counts(self):
+        response = self.client.get(reverse("home"), {"genre": "POP"})
+        self.assertEqual([(g["name"], g["count"]) for g in response.context["genres"]], [("Pop", 2), ("Rap", 1)])
+        self.assertEqual({s.id for s in response.context["songs"]}, {self.a.id, self.b.id})
+
+
+# =========================
+# ĐO HIỆU NĂNG
+# =========================
+class PerfTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        perf.registry.reset()
+        artist = Artist.objects.create(name="Sơn Tùng")
+        for title in ("Lạc Trôi", "Nơi Này Có Anh"):
+            Song.objects.create(title=title, artist=artist, genre="Pop")
+
+    def test_records_per_view_metrics(self):
+        self.client.get(reverse("home"))
+        self.client.get(reverse("home"))
+
+        rows = {row["view"]: row for row in perf.registry.summary()[0]}
+        home = rows["home"]
+        self.assertEqual(home["count"], 2)
+        self.assertGreater(home["avg_queries"], 0)
+        # lần 2 trúng cache trang
+        self.assertGreater(home["cache_hit_ratio"], 0)
+
+        with self.settings(PERF_METRICS_TOKEN="s3cret"):
+            text = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret").content.decode()
+        self.assertIn('musicapp_request_duration_seconds_count{view="home"} 2', text)
+        self.assertIn('musicapp_responses_total{view="home",status="200"} 2', text)
+        self.assertIn('musicapp_cache_lookups_total{view="home",result="hit"}', text)
+
+    def test_outbound_time_counted(self):
+        stats = perf.RequestStats()
+        token = perf.current.set(stats)
+        with perf.outbound():
+            time.sleep(0.01)
+        perf.current.reset(token)
+        self.assertEqual(stats.http_calls, 1)
+        self.assertGreaterEqual(stats.http_time, 0.01)
+
+    @override_settings(PERF_SLOW_QUERY_COUNT=1)
+    def test_slow_requests_sampled_with_fingerprints(self):
+        with self.assertLogs("musicapp.perf", "WARNING") as logs:
+            self.client.get(reverse("home"))
+        self.assertIn("Request chậm GET /", logs.output[0])
+        sample = perf.registry.summary()[1][0]
+        self.assertEqual(sample["view"], "home")
+        self.assertGreaterEqual(sample["queries"], 1)
+        self.assertTrue(sample["fingerprints"])
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(perf.fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s)'),
+                         perf.fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s)'))
+        self.assertEqual(perf.fingerprint('SELECT 1 FROM "t" WHERE "id" IN (%s, %s) LIMIT 5'),
+                         'SELECT ? FROM "t" WHERE "id" IN (...) LIMIT ?')
+
+    def test_duplicate_queries_counted(self):
+        stats = perf.RequestStats()
+        stats.queries = [("SELECT %s", (1,), 0.001), ("SELECT %s", (1,), 0.001), ("SELECT %s", (2,), 0.001)]
+        sample = perf.slow_sample("GET", "/", "home", 200, 1.0, stats)
+        self.assertEqual(sample["duplicates"], 1)
+        self.assertEqual([(f["sql"], f["count"]) for f in sample["fingerprints"]], [("SELECT %s", 3)])
+
+    def test_pending_entries_drop_query_list(self):
+        registry = perf.Registry(flush_at=10)
+        stats = perf.RequestStats()
+        stats.queries = [("SELECT %s", (i,), 0.001) for i in range(3)]
+        stats.query_count = 1500  # vượt MAX_RECORDED_QUERIES: vẫn đếm đủ
+        registry.record("home", 200, 0.1, stats)
+        # hàng chờ chỉ giữ số, không giữ danh sách query
+        self.assertFalse([value for value in registry.pending[0] if isinstance(value, (list, perf.RequestStats))])
+        self.assertEqual(registry.summary()[0][0]["avg_queries"], 1500)
+
+    @override_settings(PERF_METRICS_TOKEN="s3cret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_hidden_without_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+    def test_summary_page_is_staff_only(self):
+        user = User.objects.create_user(username="fan", password="secret-pass-123")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse("perf_summary")).status_code, 302)
+
+        user.is_staff = True
+        user.save()
+        self.client.get(reverse("home"))
+        response = self.client.get(reverse("perf_summary"))
+        self.assertContains(response, "<code>home</code>", html=False)
+
+
+# =========================
+# QUYỀN PREMIUM ĐÃ CACHE
+# =========================
+class EntitlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        entitlements.clear_local()
+        self.user = User.objects.create_user(username="fan", password="secret-pass-123")
+
+    def subscribe(self, days=30):
+        return Subscription.objects.create(user=self.user, plan="PREMIUM", is_active=True,
+                                           end_date=timezone.now() + timedelta(days=days))
+
+    def test_cached_check_reads_no_db(self):
+        self.subscribe()
+        self.assertTrue(entitlements.is_premium(self.user))
+        with self.assertNumQueries(0):
+            self.assertTrue(entitlements.is_premium(self.user))
+
+        # process khác: chỉ còn cache dùng chung
+        entitlements.clear_local()
+        with self.assertNumQueries(0):
+            self.assertTrue(entitlements.is_premium(self.user))
+
+    def test_subscription_change_invalidates(self):
+        self.assertFalse(entitlements.is_premium(self.user))
+        sub = self.subscribe()
+        self.assertTrue(entitlements.is_premium(self.user))
+
+        sub.is_active = False
+        sub.save()
+        self.assertFalse(entitlements.is_premium(self.user))
+        sub.delete()
+        self.assertFalse(entitlements.is_premium(self.user))
+
+    def test_expires_at_end_date(self):
+        entitlements._store(self.user.pk, entitlements.Entitlement(entitlements.PREMIUM, time.time() - 1))
+        with self.assertNumQueries(0):
+            self.assertFalse(entitlements.is_premium(self.user))
+
+        self.subscribe(days=-1)
+        self.assertEqual(entitlements.for_user(self.user), entitlements.FREE_ENTITLEMENT)
+
+    def test_async_check(self):
+        self.subscribe()
+        self.assertTrue(entitlements.is_premium(self.user))
+        entitlements.clear_local()
+        with self.assertNumQueries(0):
+            self.assertTrue(asyncio.run(entitlements.ais_premium(self.user)))
+
+    def test_reused_user_id_starts_free(self):
+        self.subscribe()
+        self.assertTrue(entitlements.is_premium(self.user))
+        pk = self.user.pk
+        self.user.delete()
+        other = User.objects.create_user(id=pk, username="other", password="secret-pass-123")
+        self.assertFalse(entitlements.is_premium(other))
+
+    def test_session_not_rewritten_per_request(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("home"))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("home"))
+            self.client.get(reverse("playlist_list"))
+        self.assertFalse([q for q in queries if "django_session" in q["sql"]])
+
+
+# =========================
+# XUẤT / NHẬP PLAYLIST VÀ YÊU THÍCH
+# =========================
+class LibraryTransferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="fan", password="secret-pass-123")
+        self.client.force_login(self.user)
+        son_tung = Artist.objects.create(name="Sơn Tùng M-TP")
+        den = Artist.objects.create(name="Đen")
+        self.songs = [
+            Song.objects.create(title="Lạc Trôi", artist=son_tung, duration=4),
+            Song.objects.create(title="Nơi Này Có Anh", artist=son_tung),
+            Song.objects.create(title="Đi Về Nhà", artist=den),
+        ]
+        self.playlist = Playlist.objects.create(user=self.user, name="Nhạc Việt")
+        for song in (self.songs[2], self.songs[0]):
+            add_song(self.playlist, song)
+
+    def body(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def post_lines(self, url, lines, content_type, **params):
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        return self.client.post(f"{url}?{query}", data="\n".join(lines).encode(), content_type=content_type)
+
+    def test_export_m3u8_streams_in_order(self):
+        response = self.client.get(reverse("export_playlist", args=[self.playlist.id, "m3u8"]))
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment", response["Content-Disposition"])
+        lines = self.body(response).splitlines()
+        self.assertEqual(lines[0], "#EXTM3U")
+        self.assertEqual(lines[1], "#EXTINF:-1,Đen - Đi Về Nhà")
+        self.assertEqual(lines[2], f"http://testserver/stream/{self.songs[2].id}/")
+        self.assertEqual(lines[3], "#EXTINF:240,Sơn Tùng M-TP - Lạc Trôi")
+
+        other = User.objects.create_user(username="other", password="secret-pass-123")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse("export_playlist", args=[self.playlist.id, "m3u8"])).status_code, 404)
+
+    def test_export_favorites_jsonl(self):
+        Favorite.objects.create(user=self.user, song=self.songs[1])
+        response = self.client.get(reverse("export_favorites", args=["jsonl"]))
+        rows = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual(rows, [{"id": self.songs[1].id, "title": "Nơi Này Có Anh", "artist": "Sơn Tùng M-TP",
+                                 "duration": None}])
+        self.assertEqual(self.client.get(reverse("export_favorites", args=["xml"])).status_code, 404)
+
+    async def test_export_under_asgi_streams_async(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("export_playlist", args=[self.playlist.id, "jsonl"]))
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([json.loads(line)["title"] for line in body.splitlines()], ["Đi Về Nhà", "Lạc Trôi"])
+
+    def test_import_jsonl_into_new_playlist(self):
+        lines = [json.dumps({"title": "lac troi", "artist": "son tung m-tp"}),
+                 json.dumps({"title": "NƠI NÀY CÓ ANH", "artist": "Sơn Tùng M-TP"}),
+                 json.dumps({"title": "Không có", "artist": "Ai đó"}),
+                 "hỏng"]
+        response = self.post_lines(reverse("import_playlist"), lines, "application/x-ndjson", name="Mới")
+        data = response.json()
+        self.assertEqual((data["matched"], data["added"], data["missing"]), (2, 2, 1))
+        playlist = Playlist.objects.get(id=data["playlist_id"], user=self.user, name="Mới")
+        self.assertEqual([i.song for i in playlist.items.order_by("position")], self.songs[:2])
+
+    def test_import_appends_once_and_query_count_is_batched(self):
+        lines = [f"#EXTINF:200,{s.artist.name} - {s.title}\nhttp://example.com/{i}.mp3" for i, s in enumerate(self.songs)]
+        url = reverse("import_playlist")
+        with CaptureQueriesContext(connection) as small:
+            data = self.post_lines(url, lines, "audio/x-mpegurl", playlist_id=self.playlist.id).json()
+        self.assertEqual((data["matched"], data["added"]), (3, 1))
+        items = list(self.playlist.items.order_by("position").values_list("song_id", flat=True))
+        self.assertEqual(items, [self.songs[2].id, self.songs[0].id, self.songs[1].id])
+
+        # số query không tăng theo số dòng
+        with CaptureQueriesContext(connection) as large:
+            self.post_lines(url, lines * 100, "audio/x-mpegurl", playlist_id=self.playlist.id)
+        self.assertLessEqual(len(large), len(small))
+
+    def test_import_favorites_updates_caches_and_counters(self):
+        self.assertEqual(favorites.favorite_ids(self.user), frozenset())
+        upload = ContentFile("#EXTM3U\n#EXTINF:1,Đen - Đi Về Nhà\n/x.mp3\nSơn Tùng M-TP - Lạc Trôi.mp3\n".encode(),
+                             name="fav.m3u")
+        response = self.client.post(reverse("import_favorites"), {"file": upload})
+        self.assertRedirects(response, reverse("favorite_list"), fetch_redirect_response=False)
+
+        self.assertEqual(favorites.favorite_ids(self.user), {self.songs[0].id, self.songs[2].id})
+        self.assertEqual(Artist.objects.get(name="Đen").favorite_count, 1)
+        self.assertEqual(Artist.objects.get(name="Sơn Tùng M-TP").favorite_count, 1)
+
+    def test_round_trip(self):
+        exported = self.body(self.client.get(reverse("export_playlist", args=[self.playlist.id, "m3u8"])))
+        data = self.post_lines(reverse("import_playlist"), exported.splitlines(), "audio/x-mpegurl").json()
+        copy = Playlist.objects.get(id=data["playlist_id"])
+        self.assertEqual(list(copy.items.order_by("position").values_list("song_id", flat=True)),
+                         [self.songs[2].id, self.songs[0].id])
+
+
+# =========================
+# TẢI PLAYLIST (ZIP)
+# =========================
+class PlaylistDownloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        entitlements.clear_local()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username="premium", password="secret-pass-123")
+        Subscription.objects.create(user=self.user, plan="PREMIUM", is_active=True,
+                                    end_date=timezone.now() + timedelta(days=30))
+        self.client.force_login(self.user)
+        artist = Artist.objects.create(name="Sơn Tùng M-TP")
+        self.playlist = Playlist.objects.create(user=self.user, name="Đi làm")
+        self.data = {}
+        for i, title in enumerate(["Lạc Trôi", "Chạy Ngay Đi/Remix"]):
+            song = Song.objects.create(title=title, artist=artist)
+            self.data[title] = os.urandom(100_000 + i)
+            song.audio_file.save(f"{i}.mp3", ContentFile(self.data[title]))
+            add_song(self.playlist, song)
+        add_song(self.playlist, Song.objects.create(title="Chưa có file", artist=artist))
+        self.url = reverse("download_playlist", args=[self.playlist.id])
+
+    def test_streams_valid_stored_zip(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        body = b"".join(response.streaming_content)
+        response.close()
+        self.assertEqual(int(response["Content-Length"]), len(body))
+
+        archive = zipfile.ZipFile(BytesIO(body))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ["001 - Sơn Tùng M-TP - Lạc Trôi.mp3",
+                                              "002 - Sơn Tùng M-TP - Chạy Ngay Đi_Remix.mp3"])
+        self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist()))
+        self.assertEqual(archive.read(archive.namelist()[1]), self.data["Chạy Ngay Đi/Remix"])
+
+    def test_requires_valid_subscription(self):
+        Subscription.objects.filter(user=self.user).update(end_date=timezone.now() - timedelta(days=1))
+        entitlements.invalidate(self.user.pk)
+        self.assertRedirects(self.client.get(self.url), reverse("upgrade_page"), fetch_redirect_response=False)
+
+        other = User.objects.create_user(username="other", password="secret-pass-123")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_concurrent_download_limit(self):
+        slots = [downloads.acquire(self.user.pk) for _ in range(downloads.CONCURRENT_DOWNLOADS)]
+        self.assertEqual(self.client.get(self.url).status_code, 429)
+
+        slots[0]()
+        slots[0]()  # trả hai lần vẫn chỉ tính một
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(downloads.acquire(self.user.pk))
+        response.close()
+        self.assertIsNotNone(downloads.acquire(self.user.pk))
+
+    async def test_streams_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url)
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(int(response["Content-Length"]), len(body))
+        self.assertIsNone(zipfile.ZipFile(BytesIO(body)).testzip())
+        # lượt tải được trả khi response đóng
+        self.assertEqual(await cache.aget(downloads._key(self.user.pk)), 0)
+
+
+# =========================
+# DỮ LIỆU GIẢ LẬP (generate_catalog)
+# =========================
+class GenerateCatalogTests(TestCase):
+    def generate(self, *args):
+        out = StringIO()
+        call_command("generate_catalog", "--songs", "500", "--users", "40", "--batch-size", "100", *args, stdout=out)
+        return out.getvalue()
+
+    def test_generates_consistent_data(self):
+        output = self.generate()
+        self.assertIn("Đã sinh 25 nghệ sĩ, 500 bài hát, 40 người dùng", output)
+        self.assertEqual(Song.objects.count(), 500)
+        self.assertEqual(Playlist.objects.count(), 120)
+        self.assertTrue(Subscription.objects.exists())
+
+        # bộ đếm khớp dữ liệu dù bulk_create không qua signal
+        self.assertEqual(sum(Genre.objects.values_list("song_count", flat=True)), 500)
+        self.assertEqual(sum(Artist.objects.values_list("favorite_count", flat=True)), Favorite.objects.count())
+        song = Song.objects.select_related("artist").first()
+        self.assertEqual(song.search_key, song_search_key(song.title, song.artist.name))
+        self.assertIn(song, search_songs(song.title, page_size=100)[0])
+        user = User.objects.get(username="synth0")
+        self.assertTrue(user.check_password("synth-pass-123"))
+
+    def test_favorites_follow_zipf(self):
+        self.generate("--favorites", "40")
+        counts = sorted(Song.objects.annotate(n=Count("favorite")).values_list("n", flat=True), reverse=True)
+        # vài bài nổi tiếng chiếm phần lớn lượt yêu thích
+        self.assertGreater(sum(counts[:25]), sum(counts) / 3)
+        self.assertGreater(counts[0], 10 * max(1, counts[250]))
+
+    def test_refuses_existing_prefix(self):
+        self.generate()
+        with self.assertRaises(CommandError):
+            self.generate()
+        self.generate("--prefix", "more")
+        self.assertEqual(User.objects.count(), 80)
+
+
+# =========================
+# FILE TĨNH (tên có hash, nén sẵn, immutable)
+# =========================
+class StaticPipelineTests(TestCase):
+    CSS = b"body { color: #222; background: #fafafa; }\n" * 200
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = override_settings(STATIC_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def collect(self, name, content):
+        """
+        Như collectstatic cho một file: lưu rồi post_process (hash, manifest, nén).
+        """
+        staticfiles_storage.save(name, ContentFile(content))
+        processed = list(staticfiles_storage.post_process({name: (staticfiles_storage, name)}))
+        self.assertFalse([error for _, _, error in processed if isinstance(error, Exception)])
+        return staticfiles_storage.url(name)
+
+    def test_hashed_file_is_immutable_and_precompressed(self):
+        url = self.collect("css/site.css", self.CSS)
+        self.assertRegex(url, r"^/static/css/site\.[0-9a-f]{12}\.css$")
+        self.assertTrue(os.path.exists(os.path.join(self.root, url[len("/static/"):] + ".gz")))
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertLess(int(response["Content-Length"]), len(self.CSS))
+
+        # tên gốc vẫn phục vụ được nhưng không cache vĩnh viễn
+        response = self.client.get("/static/css/site.css")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("immutable", response["Cache-Control"])
+
+    def test_served_before_session_and_auth(self):
+        url = self.collect("css/site.css", self.CSS)
+        user = User.objects.create_user(username="static", password="secret-pass-123")
+        self.client.force_login(user)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Cookie", response.get("Vary", ""))
+        self.assertFalse(response.cookies)
+
+        middleware = settings.MIDDLEWARE
+        whitenoise = middleware.index("musicapp.middleware.AsyncWhiteNoiseMiddleware")
+        self.assertLess(whitenoise, middleware.index("django.contrib.sessions.middleware.SessionMiddleware"))
+        self.assertLess(whitenoise, middleware.index("django.contrib.auth.middleware.AuthenticationMiddleware"))
+
+    def test_static_tag_without_manifest_uses_plain_name(self):
+        html = Template("{% load static %}{% static 'default_cover.jpg' %}").render(Context())
+        self.assertEqual(html, "/static/default_cover.jpg")
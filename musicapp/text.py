@@ -0,0 +1,40 @@
+import re
+import unicodedata
+
+_SPACES = re.compile(r"\s+")
+_WORDS = re.compile(r"\w+")
+# độ dài tối đa của một từ trong chỉ mục tìm kiếm (SongToken.token)
+TOKEN_MAX_LENGTH = 50
+
+
+# =========================
+# Chuẩn hóa chuỗi tìm kiếm
+# =========================
+def fold_text(value):
+    """
+    Bỏ dấu tiếng Việt, chuyển về chữ thường và gộp khoảng trắng.
+
+    "ĐOẠN KỊCH CÂM" -> "doan kich cam".
+    """
+    if not value:
+        return ""
+    value = str(value).replace("đ", "d").replace("Đ", "D")
+    value = unicodedata.normalize("NFD", value)
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return _SPACES.sub(" ", value.replace("_", " ")).strip().lower()
+
+
+def song_search_key(title, artist_name):
+    """
+    Khóa tìm kiếm của bài hát: tên bài hát và tên nghệ sĩ đã chuẩn hóa.
+    """
+    return fold_text(f"{title or ''} {artist_name or ''}")
+
+
+def search_tokens(value):
+    """
+    Các từ không trùng của chuỗi đã chuẩn hóa (chỉ mục SongToken, từ trong câu tìm kiếm).
+
+    "Đoạn kịch câm - Ngô Lan Hương" -> ["cam", "doan", "huong", "kich", "lan", "ngo"].
+    """
+    return sorted({word[:TOKEN_MAX_LENGTH] for word in _WORDS.findall(fold_text(value))})
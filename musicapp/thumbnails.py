@@ -0,0 +1,74 @@
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from . import pagecache
+
+WIDTHS = (96, 300, 600)
+FORMATS = (("webp", "WEBP"), ("jpg", "JPEG"))
+THUMB_DIR = "song_covers/thumbs"
+QUALITY = 80
+
+
+# =========================
+# Tên file ảnh thu nhỏ
+# =========================
+def thumb_name(cover_hash, width, ext):
+    """
+    Tên theo hash nội dung ảnh gốc: cùng ảnh -> cùng tên, có thể cache vĩnh viễn.
+    """
+    return f"{THUMB_DIR}/{cover_hash[:2]}/{cover_hash}-{width}.{ext}"
+
+
+# =========================
+# Tạo ảnh thu nhỏ
+# =========================
+def build_derivatives(data):
+    """
+    Tạo ảnh thu nhỏ WebP/JPEG cho mọi WIDTHS từ bytes ảnh gốc.
+
+    Trả về (cover_hash, {tên file: bytes}). Không dùng Django nên chạy được
+    trong process pool của lệnh generate_thumbnails.
+    """
+    cover_hash = hashlib.sha256(data).hexdigest()[:32]
+    with Image.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source).convert("RGB")
+
+    files = {}
+    for width in WIDTHS:
+        resized = image
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+        for ext, fmt in FORMATS:
+            out = BytesIO()
+            resized.save(out, fmt, quality=QUALITY, optimize=True)
+            files[thumb_name(cover_hash, width, ext)] = out.getvalue()
+    return cover_hash, files
+
+
+def save_derivatives(storage, files):
+    # tên theo hash -> file đã có thì nội dung giống hệt, bỏ qua
+    for name, content in files.items():
+        if not storage.exists(name):
+            storage.save(name, ContentFile(content))
+
+
+def generate_for_song(song):
+    """
+    Tạo ảnh thu nhỏ cho ảnh bìa của song và lưu song.cover_hash.
+    """
+    if not song.cover_image:
+        return None
+    with song.cover_image.open("rb") as f:
+        data = f.read()
+    cover_hash, files = build_derivatives(data)
+    # tên đã theo hash ảnh gốc -> không qua storage của cover_image (sẽ đặt lại tên)
+    save_derivatives(default_storage, files)
+    type(song).objects.filter(pk=song.pk).update(cover_hash=cover_hash)
+    pagecache.bump("song")
+    song.cover_hash = cover_hash
+    return cover_hash
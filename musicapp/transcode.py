@@ -0,0 +1,203 @@
+import math
+import os
+import re
+import shutil
+import subprocess
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .audiometa import audio_frames
+
+# các bậc bitrate (kbps) của HLS; người dùng miễn phí chỉ được tới FREE_MAX_BITRATE
+LADDER = (64, 128, 320)
+FREE_MAX_BITRATE = 128
+SEGMENT_SECONDS = 6
+HLS_DIR = "hls"
+
+AAC_CODEC = "mp4a.40.2"
+MP3_CODEC = "mp4a.40.34"
+CONTENT_TYPES = {"ts": "video/mp2t", "mp3": "audio/mpeg"}
+
+_EXTINF = re.compile(r"^#EXTINF:([\d.]+)", re.MULTILINE)
+_PRIV_OWNER = b"com.apple.streaming.transportStreamTimestamp\x00"
+
+
+class TranscodeError(Exception):
+    """
+    ffmpeg lỗi hoặc file nguồn không cắt được thành segment.
+    """
+
+
+# =========================
+# ffmpeg
+# =========================
+def ffmpeg_binary():
+    """
+    Đường dẫn ffmpeg (settings.FFMPEG_BINARY, tìm trong PATH); None nếu không có / để trống.
+    """
+    binary = getattr(settings, "FFMPEG_BINARY", "ffmpeg")
+    return shutil.which(binary) if binary else None
+
+
+def _encode_rung(ffmpeg, src, out_dir, bitrate):
+    index = os.path.join(out_dir, "index.m3u8")
+    cmd = [
+        ffmpeg, "-nostdin", "-loglevel", "error", "-y", "-i", src, "-vn",
+        "-c:a", "aac", "-b:a", f"{bitrate}k", "-ac", "2",
+        "-f", "hls", "-hls_time", str(SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(out_dir, "%05d.ts"), index,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise TranscodeError(result.stderr.strip()[-500:] or f"ffmpeg thoát với mã {result.returncode}")
+    with open(index) as f:
+        durations = [float(d) for d in _EXTINF.findall(f.read())]
+    os.remove(index)  # playlist do view dựng lại theo gói của người dùng
+    return durations
+
+
+# =========================
+# Cắt MP3 không mã hóa lại (khi không có ffmpeg)
+# =========================
+def _timestamp_tag(seconds):
+    """
+    Tag ID3 PRIV bắt buộc ở đầu mỗi segment "packed audio" của HLS (RFC 8216 3.4).
+    """
+    ticks = round(seconds * 90000) & 0x1FFFFFFFF  # đồng hồ 90 kHz, 33 bit
+    frame = _PRIV_OWNER + ticks.to_bytes(8, "big")
+    frame = b"PRIV" + len(frame).to_bytes(4, "big") + b"\x00\x00" + frame
+    size = len(frame)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x04\x00\x00" + syncsafe + frame
+
+
+def _split_mp3(src, out_dir):
+    durations = []
+    with open(src, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        frames = list(audio_frames(f, size))
+        elapsed = 0.0
+        chunk, chunk_seconds = [], 0.0
+        for i, (pos, info) in enumerate(frames):
+            chunk.append((pos, info["length"]))
+            chunk_seconds += info["samples"] / info["sample_rate"]
+            if chunk_seconds >= SEGMENT_SECONDS or i == len(frames) - 1:
+                with open(os.path.join(out_dir, f"{len(durations):05d}.mp3"), "wb") as out:
+                    out.write(_timestamp_tag(elapsed))
+                    for start, length in chunk:
+                        f.seek(start)
+                        out.write(f.read(length))
+                durations.append(round(chunk_seconds, 3))
+                elapsed += chunk_seconds
+                chunk, chunk_seconds = [], 0.0
+    return durations
+
+
+# =========================
+# Tạo các bản HLS
+# =========================
+def transcode_file(src, out_root, source_bitrate=None, ffmpeg=None):
+    """
+    Tạo các bậc HLS cho file nhạc src trong out_root/<bitrate>/.
+
+    Có ffmpeg: mã hóa AAC cho từng bậc trong LADDER không vượt bitrate gốc.
+    Không có: cắt chính file MP3 theo ranh giới frame thành một bậc duy nhất
+    bằng bitrate gốc; gốc trên FREE_MAX_BITRATE thì người dùng miễn phí không
+    có bậc HLS nào và views.hls_master chuyển họ sang stream_song.
+    Trả về list dict (bitrate, codecs, ext, durations).
+    Không dùng ORM nên chạy được trong process pool của lệnh transcode_songs.
+    """
+    if source_bitrate:
+        rungs = [b for b in LADDER if b <= source_bitrate] or [LADDER[0]]
+    else:
+        rungs = list(LADDER)
+    if not ffmpeg:
+        rungs = [source_bitrate or FREE_MAX_BITRATE]
+
+    results = []
+    for bitrate in rungs:
+        out_dir = os.path.join(out_root, str(bitrate))
+        tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            if ffmpeg:
+                durations, codecs, ext = _encode_rung(ffmpeg, src, tmp_dir, bitrate), AAC_CODEC, "ts"
+            else:
+                durations, codecs, ext = _split_mp3(src, tmp_dir), MP3_CODEC, "mp3"
+            if not durations:
+                raise TranscodeError(f"Không tạo được segment nào cho {src}")
+            shutil.rmtree(out_dir, ignore_errors=True)
+            os.replace(tmp_dir, out_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        results.append({"bitrate": bitrate, "codecs": codecs, "ext": ext, "durations": durations})
+    return results
+
+
+def rendition_dir(song):
+    # file nhạc đặt tên theo hash (musicapp.storage) -> cùng nội dung dùng chung segment
+    stem = os.path.splitext(os.path.basename(song.audio_file.name))[0]
+    return f"{HLS_DIR}/{stem}"
+
+
+def save_renditions(song, path, results):
+    from .models import Rendition
+
+    with transaction.atomic():
+        Rendition.objects.filter(song=song).exclude(bitrate__in=[r["bitrate"] for r in results]).delete()
+        for r in results:
+            Rendition.objects.update_or_create(song=song, bitrate=r["bitrate"], defaults={
+                "codecs": r["codecs"],
+                "segment_ext": r["ext"],
+                "path": f"{path}/{r['bitrate']}",
+                "durations": r["durations"],
+            })
+
+
+def transcode_song(song):
+    """
+    Tạo (lại) các bản HLS cho file nhạc của song và lưu Rendition.
+    """
+    if not song.audio_file:
+        return []
+    path = rendition_dir(song)
+    results = transcode_file(song.audio_file.path, default_storage.path(path),
+                             song.bitrate, ffmpeg_binary())
+    save_renditions(song, path, results)
+    return results
+
+
+# =========================
+# Playlist HLS
+# =========================
+def allowed_renditions(renditions, premium):
+    return [r for r in renditions if premium or r.bitrate <= FREE_MAX_BITRATE]
+
+
+def master_playlist(renditions, url_for):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for r in sorted(renditions, key=lambda r: r.bitrate):
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={r.bitrate * 1000},CODECS="{r.codecs}"')
+        lines.append(url_for(r))
+    return "\n".join(lines) + "\n"
+
+
+def media_playlist(rendition, url_for, max_seconds=None):
+    """
+    Playlist VOD của một bậc; max_seconds giới hạn số segment (nghe thử).
+    """
+    durations = rendition.durations
+    if max_seconds is not None:
+        durations = rendition.preview_durations(max_seconds)
+    target = max((math.ceil(d) for d in durations), default=SEGMENT_SECONDS)
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{target}",
+             "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:VOD"]
+    for index, duration in enumerate(durations):
+        lines.append(f"#EXTINF:{duration:.3f},")
+        lines.append(url_for(index))
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
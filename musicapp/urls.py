@@ -4,19 +4,36 @@ from . import views
 urlpatterns = [
     # Trang chủ
     path("", views.home, name="home"),
+    path("typeahead/", views.typeahead_search, name="typeahead"),
+    path("facets/", views.facet_counts, name="facets"),
     path("register/", views.register, name="register"),
     path("login/", views.login_views, name="login"),
     path("logout/", views.logout_views, name="logout"),
     path("track/<int:track_id>/", views.play_track, name="play_track"),
+    path("stream/<int:song_id>/", views.stream_song, name="stream_song"),
+    path("play/<int:song_id>/", views.record_play, name="record_play"),
+    path("hls/<int:song_id>/master.m3u8", views.hls_master, name="hls_master"),
+    path("hls/<int:song_id>/<int:bitrate>/index.m3u8", views.hls_playlist, name="hls_playlist"),
+    path("hls/<int:song_id>/<int:bitrate>/<int:index>", views.hls_segment, name="hls_segment"),
     path("favorite/add/", views.add_favorite, name="add_favorite"),
     path("favorite/", views.favorite_list, name="favorite_list"),
     path("chat-ai/", views.chat_ai, name="chat_ai"),
+    path("recommend/because/<int:song_id>/", views.because_you_liked, name="because_you_liked"),
     path("upgrade/", views.upgrade_page, name="upgrade_page"),
     path("playlist/add/<int:playlist_id>/<int:song_id>/",views.add_to_playlist,name="add_to_playlist"),
     path("playlist/", views.playlist_list, name="playlist_list"),
+    path("playlist/remove/<int:playlist_id>/<int:song_id>/", views.remove_from_playlist, name="remove_from_playlist"),
+    path("playlist/<int:playlist_id>/songs/", views.playlist_songs, name="playlist_songs"),
 path('playlist/create-and-add/', views.create_and_add_playlist, name='create-and-add-playlist'),
 path("playlist/delete/<int:playlist_id>/", views.delete_playlist, name="delete_playlist"),
+    path("playlist/<int:playlist_id>/export.<str:fmt>", views.export_playlist, name="export_playlist"),
+    path("playlist/<int:playlist_id>/download/", views.download_playlist, name="download_playlist"),
+    path("playlist/import/", views.import_playlist, name="import_playlist"),
+    path("favorite/export.<str:fmt>", views.export_favorites, name="export_favorites"),
+    path("favorite/import/", views.import_favorites, name="import_favorites"),
     path("upgrade/start/", views.start_payment, name="start_payment"),
     path("upgrade/confirm/", views.confirm_payment, name="confirm_payment"),
+    path("metrics", views.metrics, name="metrics"),
+    path("perf/", views.perf_summary, name="perf_summary"),
 
 ]
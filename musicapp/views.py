@@ -6,19 +6,31 @@ import uuid
 import urllib.parse
 import pytz
 from datetime import datetime
-from django.views.decorators.csrf import csrf_exempt
-from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from django.template.response import TemplateResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import AuthenticationForm
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
 from django.utils import timezone
-from django.http import HttpResponseRedirect, JsonResponse
-import requests
+from django.utils.http import content_disposition_header
+from django.utils.safestring import mark_safe
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from dotenv import load_dotenv
 
-from .forms import CustomUserCreationForm, FavoriteForm
-from .models import Song, Favorite, Playlist, Subscription
+from . import audius, downloads, entitlements, facets, favorites, library, pagecache, perf, plays, recommend, transcode, typeahead
+from .forms import CustomUserCreationForm
+from .models import Song, Favorite, Playlist, Rendition
+from .playlists import PAGE_SIZE, aadd_song, aplaylist_page, aremove_song, resolve_playlists
+from .search import SORT_NEWEST, SORT_POPULAR, parse_cursor, search_songs
+from .streaming import PREVIEW_BYTES, PREVIEW_SECONDS, iter_for, ranged_file_response
 
 # =======================
 # Load env
@@ -31,37 +43,98 @@ VNP_RETURN_URL = os.getenv("VNP_RETURN_URL", "http://127.0.0.1:8000/upgrade/conf
 
 # =======================
 # Home page + search + filter genre
+ACTIONS_SLOT = "<!--song-actions-->"
+
+
+def _catalog_page(query, genre, sort, cursor):
+    # phần danh mục giống nhau với mọi người dùng -> cache theo phiên bản Song/Artist/lượt nghe
+    def build():
+        songs, next_cursor = search_songs(query, genre, cursor=cursor, sort=sort)
+        html = render_to_string('catalog_grid.html', {'songs': songs})
+        return {'songs': songs, 'next_cursor': next_cursor, 'parts': html.split(ACTIONS_SLOT)}
+
+    return pagecache.fragment('catalog', (query, facets.genre_key(genre), sort, cursor), build)
+
+
+def _overlay_actions(request, page, favorite_song_ids):
+    # chèn nút theo người dùng (yêu thích / playlist) vào lưới đã cache; một lần render cho cả trang
+    actions = render_to_string('song_actions.html', {
+        'songs': page['songs'],
+        'user': request.user,
+        'favorite_song_ids': favorite_song_ids,
+    }).split(ACTIONS_SLOT)
+    parts = page['parts']
+    html = [parts[0]]
+    for action, part in zip(actions, parts[1:]):
+        html.append(action)
+        html.append(part)
+    return mark_safe(''.join(html))
+
+
+# trang của khách nằm trong cache dùng chung nên không chứa token CSRF; JS đọc token
+# từ cookie, ensure_csrf_cookie đặt cookie cả khi trang lấy từ cache
+@ensure_csrf_cookie
 def home(request):
+    specs = pagecache.CATALOG + pagecache.user_scopes(request.user, 'favorite', 'playlist')
+    return pagecache.cached_page(request, lambda: _render_home(request), specs)
+
+
+def _render_home(request):
     query = request.GET.get('q', '').strip()
     selected_genre = request.GET.get('genre', '')
+    sort = SORT_POPULAR if request.GET.get('sort') == SORT_POPULAR else SORT_NEWEST
+    cursor = parse_cursor(request.GET.get('cursor'), sort)
 
-    songs = Song.objects.all()
-    if query:
-        songs = songs.filter(title__icontains=query) | songs.filter(artist__name__icontains=query)
-    if selected_genre:
-        songs = songs.filter(genre__iexact=selected_genre)
+    page = _catalog_page(query, selected_genre, sort, cursor)
+    # kệ "Thịnh hành" chỉ ở trang đầu, không lọc
+    trending = pagecache.fragment('trending', (), plays.trending) if not (query or selected_genre or cursor) else []
 
-    genres = Song.objects.values_list('genre', flat=True).distinct()
-    favorite_song_ids = []
+    # bộ lọc thể loại kèm số bài: không có query thì chỉ đọc bảng Genre
+    genres = facets.cached_genres(query)
+    favorite_song_ids = favorites.favorite_ids(request.user)
 
     if request.user.is_authenticated:
-        favorite_song_ids = Favorite.objects.filter(user=request.user).values_list('song_id', flat=True)
         user_playlists = Playlist.objects.filter(user=request.user)
     else:
         user_playlists = []   # <<< thêm dòng này
 
-    favorite_forms = {song.id: FavoriteForm(initial={'song': song.id}) for song in songs}
-
     return render(request, 'home.html', {
-        'songs': songs,
+        'songs': page['songs'],
+        'catalog_grid': _overlay_actions(request, page, favorite_song_ids),
+        'next_cursor': page['next_cursor'],
+        'sort': sort,
+        'trending': trending,
         'query': query,
         'genres': genres,
         'selected_genre': selected_genre,
+        'selected_genre_key': facets.genre_key(selected_genre),
         'favorite_song_ids': favorite_song_ids,
-        'favorite_forms': favorite_forms,
         'user_playlists': user_playlists,
     })
 
+# =======================
+# Facet: số bài theo thể loại / nghệ sĩ cho bộ lọc hiện tại (?q=&genre=)
+def facet_counts(request):
+    query = request.GET.get('q', '').strip()
+    genre = request.GET.get('genre', '')
+    return JsonResponse({
+        "genres": facets.cached_genres(query),
+        "artists": facets.cached_artists(query, genre),
+    })
+
+# =======================
+# Gợi ý tìm kiếm khi gõ (typeahead)
+def typeahead_search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+
+    if not query:
+        return JsonResponse({"songs": [], "artists": []})
+    return JsonResponse(typeahead.index.search(query, limit))
+
 # =======================
 # Authentication
 def login_views(request):
@@ -100,24 +173,28 @@ def logout_views(request):
 
 # =======================
 # Play music
+# (async: chờ Audius không chiếm thread của worker)
 @login_required
-def play_track(request, track_id):
-    sub = Subscription.objects.filter(user=request.user).first()
-    is_premium = sub and sub.is_active
+async def play_track(request, track_id):
+    user = await request.auser()
+    # quyền Premium đọc từ cache (musicapp.entitlements), tính cả hạn end_date
+    is_premium = await entitlements.ais_premium(user)
 
-    api_url = f"https://discoveryprovider.audius.co/v1/tracks?id={track_id}&app_name=musicapp"
     try:
-        resp = requests.get(api_url, timeout=8)
-        data_json = resp.json()
+        data = await audius.client.aget_track_for(request, track_id)
 
-        if "data" not in data_json or not data_json["data"]:
-            return render(request, "error.html", {"message": "Không tìm thấy bài hát này."})
+        if not data:
+            return TemplateResponse(request, "error.html", {"message": "Không tìm thấy bài hát này."})
+
+        # trang chủ mở play_track theo id bài hát -> tính là một lượt nghe của bài đó,
+        # cùng giới hạn với record_play (tải lại trang không cộng thêm lượt)
+        if await plays.aallow(plays.client_key(request, user), track_id):
+            await plays.arecord(track_id, user, source="audius")
 
-        data = data_json["data"][0]
         art = data.get("artwork") or {}
         artwork = art.get("1000x1000") or art.get("480x480") or ""
         artist = (data.get("user") or {}).get("name", "Unknown Artist")
-        stream_url = f"https://discoveryprovider.audius.co/v1/tracks/{track_id}/stream"
+        stream_url = audius.client.stream_url(track_id)
 
         track = {
             "title": data.get("title", "Unknown"),
@@ -127,33 +204,132 @@ def play_track(request, track_id):
             "is_premium": is_premium,
         }
 
+        # TemplateResponse: handler ASGI render template trong thread riêng
         if not is_premium:
-            return render(request, "ads.html", {"track": track})
+            return TemplateResponse(request, "ads.html", {"track": track})
 
-        return render(request, "play_track.html", {"track": track})
+        return TemplateResponse(request, "play_track.html", {"track": track})
 
     except Exception as e:
         print("Audius API error:", e)
-        return render(request, "error.html", {"message": "Không thể kết nối API."})
+        return TemplateResponse(request, "error.html", {"message": "Không thể kết nối API."})
+
+# =======================
+# Stream audio (hỗ trợ tua bằng Range)
+def _has_premium(user):
+    return entitlements.is_premium(user)
+
+
+def stream_song(request, song_id):
+    song = get_object_or_404(Song, id=song_id)
+    if not song.audio_file:
+        raise Http404("Bài hát chưa có file nhạc.")
+
+    storage = song.audio_file.storage
+    name = song.audio_file.name
+    try:
+        size = storage.size(name)
+        last_modified = storage.get_modified_time(name).timestamp()
+        audio = storage.open(name, "rb")
+    except (OSError, NotImplementedError):
+        raise Http404("Không tìm thấy file nhạc.")
+
+    # chưa có Premium còn hạn -> chỉ nghe đoạn đầu
+    full = _has_premium(request.user)
+    if not full:
+        size = min(size, PREVIEW_BYTES)
+
+    etag = f'"{size:x}-{int(last_modified):x}{"" if full else "-preview"}"'
+    response = ranged_file_response(request, audio, size, etag, last_modified)
+    response["Cache-Control"] = "private, max-age=3600"
+    response["Vary"] = "Cookie"
+    return response
+
+# =======================
+# Ghi lượt nghe từ trình phát
+# ngoài CSRF (JS đọc từ cookie), URL mang token ký theo bài ({% play_url %}) và mỗi
+# user / IP bị giới hạn lượt
+@require_POST
+def record_play(request, song_id):
+    if not plays.check_token(song_id, request.GET.get("t")):
+        return HttpResponse(status=403)
+    if not plays.allow(plays.client_key(request), song_id):
+        return HttpResponse(status=429)
+    plays.record(song_id, request.user)
+    return HttpResponse(status=204)
+
+# =======================
+# HLS: bậc bitrate theo gói của người dùng
+HLS_CONTENT_TYPE = "application/vnd.apple.mpegurl"
+
+
+def _hls_response(body):
+    response = HttpResponse(body, content_type=HLS_CONTENT_TYPE)
+    response["Cache-Control"] = "private, max-age=60"
+    response["Vary"] = "Cookie"
+    return response
+
+
+def _rendition(request, song_id, bitrate):
+    rendition = get_object_or_404(Rendition, song_id=song_id, bitrate=bitrate)
+    premium = _has_premium(request.user)
+    if not transcode.allowed_renditions([rendition], premium):
+        raise Http404("Bậc bitrate này chỉ dành cho Premium.")
+    return rendition, premium
+
+
+def hls_master(request, song_id):
+    renditions = list(Rendition.objects.filter(song_id=song_id).only("bitrate", "codecs"))
+    if not renditions:
+        raise Http404("Bài hát chưa có bản HLS.")
+    renditions = transcode.allowed_renditions(renditions, _has_premium(request.user))
+    if not renditions:
+        # chỉ có bậc trên FREE_MAX_BITRATE (MP3 gốc bitrate cao cắt khi không có ffmpeg):
+        # người dùng miễn phí nghe bản thử qua luồng thường
+        response = redirect("stream_song", song_id)
+        response["Cache-Control"] = "private, max-age=60"
+        response["Vary"] = "Cookie"
+        return response
+    return _hls_response(transcode.master_playlist(
+        renditions, lambda r: reverse("hls_playlist", args=[song_id, r.bitrate]),
+    ))
+
+
+def hls_playlist(request, song_id, bitrate):
+    rendition, premium = _rendition(request, song_id, bitrate)
+    return _hls_response(transcode.media_playlist(
+        rendition,
+        lambda index: reverse("hls_segment", args=[song_id, bitrate, index]),
+        max_seconds=None if premium else PREVIEW_SECONDS,
+    ))
+
+
+def hls_segment(request, song_id, bitrate, index):
+    rendition, premium = _rendition(request, song_id, bitrate)
+    durations = rendition.durations if premium else rendition.preview_durations(PREVIEW_SECONDS)
+    if index >= len(durations):
+        raise Http404("Không có segment này.")
+    try:
+        segment = default_storage.open(rendition.segment_path(index), "rb")
+    except OSError:
+        raise Http404("Không tìm thấy segment.")
+    response = FileResponse(segment, content_type=transcode.CONTENT_TYPES[rendition.segment_ext])
+    # segment không đổi nội dung (thư mục theo hash file gốc)
+    response["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
 
 # =======================
 # Toggle favorite
 @login_required
-def add_favorite(request):
+async def add_favorite(request):
     if request.method != "POST":
         return JsonResponse({"success": False}, status=405)
 
     data = json.loads(request.body) if request.content_type == "application/json" else request.POST
     song_id = data.get('song_id') or data.get('song')
-    song = get_object_or_404(Song, id=song_id)
+    song = await aget_object_or_404(Song.objects.only('id', 'title'), id=song_id)
 
-    favorite_qs = Favorite.objects.filter(user=request.user, song=song)
-    if favorite_qs.exists():
-        favorite_qs.delete()
-        is_favorite = False
-    else:
-        Favorite.objects.create(user=request.user, song=song)
-        is_favorite = True
+    is_favorite = await favorites.atoggle(await request.auser(), song)
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({"success": True, "song_id": song.id, "is_favorite": is_favorite})
@@ -166,35 +342,39 @@ def add_favorite(request):
 # Favorite list
 @login_required
 def favorite_list(request):
-    favorite_songs = Favorite.objects.filter(user=request.user).select_related('song')
-    return render(request, "favorite.html", {"favorite_songs": favorite_songs})
+    def render_page():
+        favorite_songs = (Favorite.objects.filter(user=request.user).select_related('song__artist')
+                          .order_by('-added_at'))
+        return render(request, "favorite.html", {"favorite_songs": favorite_songs})
+
+    specs = (("song", None), ("artist", None), ("favorite", request.user.pk), ("playlist", request.user.pk))
+    return pagecache.cached_page(request, render_page, specs)
 #=======
 @login_required
-def create_and_add_playlist(request):
+async def create_and_add_playlist(request):
     if request.method == "POST" and request.headers.get('x-requested-with') == 'XMLHttpRequest':
         data = json.loads(request.body)
         song_id = data.get('song')
         playlist_name = data.get('name')
         playlist_id = data.get('playlist_id')
+        user = await request.auser()
 
         try:
-            song = Song.objects.get(id=song_id)
+            song = await Song.objects.aget(id=song_id)
         except Song.DoesNotExist:
             return JsonResponse({'success': False, 'message': 'Bài hát không tồn tại!'})
 
         if playlist_id:  # thêm vào playlist cũ
             try:
-                playlist = Playlist.objects.get(id=playlist_id, user=request.user)
+                playlist = await Playlist.objects.aget(id=playlist_id, user=user)
             except Playlist.DoesNotExist:
                 return JsonResponse({'success': False, 'message': 'Playlist không tồn tại!'})
         elif playlist_name:  # tạo playlist mới
-            playlist = Playlist.objects.create(user=request.user, name=playlist_name)
+            playlist = await Playlist.objects.acreate(user=user, name=playlist_name)
         else:
             return JsonResponse({'success': False, 'message': 'Playlist không hợp lệ!'})
 
-        if song.id not in playlist.songs:
-            playlist.songs.append(song.id)
-            playlist.save()
+        await aadd_song(playlist, song)
 
         return JsonResponse({'success': True, 'message': 'Đã thêm bài hát vào playlist!'})
 
@@ -202,49 +382,75 @@ def create_and_add_playlist(request):
 
 # Playlist: add song
 @login_required
-def add_to_playlist(request, playlist_id, song_id):
-    playlist = get_object_or_404(Playlist, id=playlist_id, user=request.user)
-    song = get_object_or_404(Song, id=song_id)
+async def add_to_playlist(request, playlist_id, song_id):
+    playlist = await aget_object_or_404(Playlist, id=playlist_id, user=await request.auser())
+    song = await aget_object_or_404(Song, id=song_id)
 
-    # Kiểm tra bài hát đã có trong playlist chưa
-    if any(s['id'] == song.id for s in playlist.songs):
+    # Thêm bài hát vào playlist (False nếu bài hát đã có)
+    if not await aadd_song(playlist, song):
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             return JsonResponse({"success": False, "message": "Bài hát đã có trong playlist!"})
         else:
             return redirect("playlist_list")
 
-    # Thêm bài hát vào playlist
-    playlist.songs.append({
-        "id": song.id,
-        "title": song.title,
-        "artist": song.artist.name if hasattr(song.artist, 'name') else str(song.artist),
-        "audio": song.audio_file.url,
-    })
-    playlist.save()
-
     # Nếu AJAX request → trả JSON
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({"success": True, "message": "Đã thêm bài hát vào playlist!"})
 
     # Nếu không phải AJAX → redirect
     return redirect("playlist_list")
+
+# Playlist: remove song
+@login_required
+async def remove_from_playlist(request, playlist_id, song_id):
+    if request.method != "POST":
+        return JsonResponse({"success": False}, status=405)
+
+    playlist = await aget_object_or_404(Playlist, id=playlist_id, user=await request.auser())
+    removed = await aremove_song(playlist, song_id)
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({"success": removed})
+    return redirect("playlist_list")
+
+# Playlist: songs theo trang (?after=<position>&limit=); format=html thì kèm HTML
+# các dòng (playlist_item.html) cho nút "Xem thêm" của trang playlist
+@login_required
+async def playlist_songs(request, playlist_id):
+    playlist = await aget_object_or_404(Playlist, id=playlist_id, user=await request.auser())
+    try:
+        after = int(request.GET["after"]) if request.GET.get("after") else None
+        limit = int(request.GET.get("limit", PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"success": False, "message": "Tham số không hợp lệ!"}, status=400)
+
+    items, next_after = await aplaylist_page(playlist, after=after, limit=limit)
+    data = {
+        "success": True,
+        "songs": [{
+            "id": item.song.id,
+            "title": item.song.title,
+            "artist": item.song.artist.name,
+            "audio": item.song.audio_file.url if item.song.audio_file else "",
+            "position": item.position,
+        } for item in items],
+        "next": next_after,
+    }
+    if request.GET.get("format") == "html":
+        data["html"] = "".join(
+            render_to_string("playlist_item.html", {"song": item.song, "playlist_id": playlist.id}, request)
+            for item in items)
+    return JsonResponse(data)
 # =======================
 # Playlist list
 @login_required
 def playlist_list(request):
-    playlists = Playlist.objects.filter(user=request.user)
-
-    for playlist in playlists:
-        new_songs = []
-        for song_id in playlist.songs:  # songs là list ID
-            try:
-                song_obj = Song.objects.get(id=song_id)
-                new_songs.append(song_obj)
-            except Song.DoesNotExist:
-                continue
-        playlist.songs = new_songs  # giờ playlist.songs là object Song thật
+    def render_page():
+        playlists = resolve_playlists(Playlist.objects.filter(user=request.user).order_by('created_at', 'id'))
+        return render(request, "playlist.html", {"playlists": playlists})
 
-    return render(request, "playlist.html", {"playlists": playlists})
+    specs = (("song", None), ("artist", None), ("playlist", request.user.pk))
+    return pagecache.cached_page(request, render_page, specs)
 #=====
 @login_required
 def delete_playlist(request, playlist_id):
@@ -253,6 +459,99 @@ def delete_playlist(request, playlist_id):
     messages.success(request, "Đã xóa playlist thành công!")
     return redirect("playlist_list")
 # =======================
+# Tải cả playlist (ZIP, chỉ Premium)
+@login_required
+def download_playlist(request, playlist_id):
+    playlist = get_object_or_404(Playlist, id=playlist_id, user=request.user)
+    if not _has_premium(request.user):
+        messages.info(request, "Tải xuống playlist chỉ dành cho tài khoản Premium.")
+        return redirect("upgrade_page")
+
+    storage, entries = downloads.playlist_entries(playlist)
+    if not entries:
+        raise Http404("Playlist chưa có bài hát nào có file nhạc.")
+    try:
+        size = downloads.zip_size(entries)
+    except downloads.TooLarge:
+        return HttpResponse("Playlist quá lớn để tải trong một file ZIP.", status=413)
+
+    release = downloads.acquire(request.user.pk)
+    if release is None:
+        response = HttpResponse("Bạn đang tải quá nhiều playlist cùng lúc, vui lòng thử lại sau.", status=429)
+        response["Retry-After"] = "60"
+        return response
+
+    chunks = iter_for(request, downloads.zip_chunks(storage, entries))
+    response = StreamingHttpResponse(downloads.releasing(chunks, release), content_type="application/zip")
+    response["Content-Length"] = str(size)
+    response["Content-Disposition"] = content_disposition_header(True, f"{playlist.name}.zip")
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+# =======================
+# Xuất / nhập playlist và yêu thích (M3U8, JSONL)
+@login_required
+def export_playlist(request, playlist_id, fmt):
+    if fmt not in library.FORMATS:
+        raise Http404("Định dạng không hỗ trợ.")
+    playlist = get_object_or_404(Playlist, id=playlist_id, user=request.user)
+    return library.export_response(request, library.playlist_rows(playlist), fmt, playlist.name)
+
+
+@login_required
+def export_favorites(request, fmt):
+    if fmt not in library.FORMATS:
+        raise Http404("Định dạng không hỗ trợ.")
+    return library.export_response(request, library.favorite_rows(request.user), fmt, "yeu-thich")
+
+
+def _import_pairs(request):
+    upload = request.FILES.get("file")
+    if upload is not None:
+        return library.parse_lines(upload, library.import_format(upload.name, upload.content_type))
+    # thân request chính là file: đọc từng dòng, không nạp cả vào bộ nhớ
+    fmt = request.GET.get("format")
+    if fmt not in library.FORMATS:
+        fmt = library.import_format("", request.content_type)
+    return library.parse_lines(request, fmt)
+
+
+def _import_done(request, message, data, redirect_to):
+    # form tải file -> flash message; AJAX / gửi thẳng thân request -> JSON
+    if "file" not in request.FILES or request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({"success": True, "message": message, **data})
+    messages.success(request, message)
+    return redirect(redirect_to)
+
+
+@login_required
+@require_POST
+def import_playlist(request):
+    playlist_id = request.POST.get("playlist_id") or request.GET.get("playlist_id")
+    if playlist_id:
+        playlist = get_object_or_404(Playlist, id=playlist_id, user=request.user)
+    else:
+        name = (request.POST.get("name") or request.GET.get("name") or "").strip()[:255]
+        playlist = Playlist(user=request.user, name=name or "Playlist đã nhập")
+
+    song_ids, missing = library.match_songs(_import_pairs(request))
+    if playlist.pk is None:
+        playlist.save()
+    added = library.append_to_playlist(playlist, song_ids)
+    return _import_done(request, f"Đã thêm {added} bài hát vào {playlist.name} ({missing} bài không tìm thấy).",
+                        {"playlist_id": playlist.id, "matched": len(song_ids), "added": added, "missing": missing},
+                        "playlist_list")
+
+
+@login_required
+@require_POST
+def import_favorites(request):
+    song_ids, missing = library.match_songs(_import_pairs(request))
+    added = library.add_favorites(request.user, song_ids)
+    return _import_done(request, f"Đã thêm {added} bài hát vào yêu thích ({missing} bài không tìm thấy).",
+                        {"matched": len(song_ids), "added": added, "missing": missing},
+                        "favorite_list")
+# =======================
 # Upgrade Page
 @login_required
 def upgrade_page(request):
@@ -347,22 +646,55 @@ def confirm_payment(request):
 
 # =======================
 # Chat AI by mood
-def chat_ai(request):
-    mood = request.GET.get("mood", "").lower()
-    mood_map = {
-        "vui": "Pop, EDM, Dance",
-        "buồn": "Lofi, Ballad, Acoustic",
-        "cô đơn": "Lofi, Indie, Sad Chill",
-        "tức giận": "Rock, Metal, Rap",
-        "thư giãn": "Chill, Jazz, Ambient",
-        "yêu": "Love songs, R&B, Acoustic",
-        "mệt": "Chill, Lofi, Ambient",
+def _song_json(song):
+    return {
+        "id": song.id,
+        "title": song.title,
+        "artist": song.artist.name,
+        "genre": song.genre,
+        "url": reverse("stream_song", args=[song.id]),
     }
 
-    suggestion = "Hmm... tôi chưa rõ tâm trạng bạn 😅, hãy nói 'tôi vui', 'tôi buồn' hoặc 'tôi mệt' nhé!"
-    for key, genres in mood_map.items():
-        if key in mood:
-            suggestion = f"🎧 Có vẻ bạn đang {key}, tôi gợi ý bạn nghe: {genres}"
-            break
 
-    return JsonResponse({"reply": suggestion})
+def chat_ai(request):
+    mood = recommend.detect_mood(request.GET.get("mood", ""))
+    songs = recommend.for_user(request.user, mood)
+
+    if mood:
+        genres = ", ".join(recommend.MOOD_GENRES[mood])
+        suggestion = f"🎧 Có vẻ bạn đang {mood}, tôi gợi ý bạn nghe: {genres}"
+    elif songs:
+        suggestion = "🎧 Dựa trên những bài bạn đã thích, bạn có thể nghe:"
+    else:
+        suggestion = "Hmm... tôi chưa rõ tâm trạng bạn 😅, hãy nói 'tôi vui', 'tôi buồn' hoặc 'tôi mệt' nhé!"
+
+    return JsonResponse({"reply": suggestion, "songs": [_song_json(s) for s in songs]})
+
+# =======================
+# Vì bạn đã thích X
+def because_you_liked(request, song_id):
+    song = get_object_or_404(Song.objects.select_related("artist"), id=song_id)
+    songs = recommend.because_you_liked(song.id)
+    return JsonResponse({"song": _song_json(song), "songs": [_song_json(s) for s in songs]})
+
+# =======================
+# Số liệu hiệu năng (musicapp.perf)
+# chưa đặt PERF_METRICS_TOKEN thì chỉ mở khi DEBUG (tên route, độ trễ, số query là thông tin nội bộ)
+def metrics(request):
+    token = settings.PERF_METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        raise Http404()
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(perf.registry.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@staff_member_required
+def perf_summary(request):
+    if request.method == "POST":
+        perf.registry.reset()
+        return redirect("perf_summary")
+    views, slow = perf.registry.summary()
+    return render(request, "perf.html", {"views": views, "slow": slow,
+                                         "slow_ms": settings.PERF_SLOW_REQUEST_MS,
+                                         "slow_queries": settings.PERF_SLOW_QUERY_COUNT})